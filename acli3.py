@@ -24,18 +24,40 @@
 #                                                                              #
 ################################################################################
 #!/usr/bin/env python
+import argparse
+import copy
+import io
 import pprint
 import requests
 import re
 import sys
 import datetime
-import json
+import time
 import yaml
 from requests.packages.urllib3.exceptions import InsecureRequestWarning, InsecurePlatformWarning, SNIMissingWarning
 from cmd import Cmd
+from contextlib import redirect_stdout
 from operator import attrgetter, itemgetter
 from getpass import getpass
 from prettytable import PrettyTable
+from aclilib import aio
+from aclilib import bindings
+from aclilib import daemon
+from aclilib import dn as dn_parser
+from aclilib import endpoints
+from aclilib import export
+from aclilib import faults
+from aclilib import health
+from aclilib import neighbors
+from aclilib.explain import ExplainSession, SOURCE_APIC
+from aclilib import ratelimit
+from aclilib import stats
+from aclilib import table
+from aclilib import watch
+from aclilib.client import ApicClient, ApicError, epg_query, BUNDLE_GROUP_NAME_QUERY, EPG_NAME_QUERY, \
+    NODE_BLOCK_QUERY, NODE_QUERY, PAGE_PARALLELISM, POD_QUERY, PORT_GROUP_NAME_QUERY, SHARD_STRATEGIES, SHARD_TIMEOUT
+from aclilib.mit import Mit
+from aclilib.offline import EXPORT_CLASSES, OfflineSession
 
 try:
     with open('config.yml', 'r') as fh:
@@ -44,16 +66,31 @@ try:
 except:
     sys.exit('ERROR: Missing or incorrect config.yml settings.py file.')
 
-SHOW_CMDS = ['epg', 'interface', 'vlan', 'snapshot', 'ipg']
+SHOW_CMDS = ['epg', 'interface', 'vlan', 'snapshot', 'ipg', 'faults', 'events', 'endpoint', 'health', 'neighbor',
+             'diagnostics']
 SHOW_EPG_CMDS = ['NAME', 'all|ALL']
 SHOW_VLAN_CMDS = ['pools', '<vlan_id>']
+SHOW_SNAPSHOT_CMDS = ['last', 'since']
+SHOW_FAULT_CMDS = list(faults.SEVERITIES) + ['since', 'summary']
+SHOW_EVENT_CMDS = ['since', '<dn_prefix>', 'summary']
+SHOW_ENDPOINT_CMDS = ['<mac>', '<ip>', 'epg', 'interface', 'table']
 SHOW_INTF_CMDS = ['<node>', ]
-CONFIG_CMDS = ['snapshot', ]
+# Trailing options of show interface adding a column
+SHOW_INTF_OPTIONS = ['health', 'neighbor']
+CONFIG_CMDS = ['snapshot', 'binding']
 CONFIG_SNAPSHOT = ['<snapshot_id>', 'new']
+CONFIG_BINDING = ['import']
+EXPORT_CMDS = ['fabric', 'interfaces', 'bindings', 'ipgs', 'vlans']
+WATCH_CMDS = ['show', '-n', '-c']
+EXPLAIN_CMDS = ['show']
+AUDIT_CMDS = ['encap']
+# DN of a fabric node, the node id and the DN below it
+NODE_DN = re.compile(r'^topology/pod-\d+/node-(\d+)(?:/|$)')
 
 class Apic(Cmd):
     def __init__(self):
         Cmd.__init__(self)
+        self.client = ApicClient()
         import readline
         readline.set_completer_delims(' ')
         if 'libedit' in readline.__doc__:
@@ -61,24 +98,31 @@ class Apic(Cmd):
         else:
             readline.parse_and_bind("tab: complete")
         self.can_connect = ''
-        self.cookie = None
-        self.headers = {'content-type': "application/json", 'cache-control': "no-cache"}
         self.fabric = []
-        self.snapshots = []
         self.leafs = []
         self.epg_names = []
+        self.ipg_names = []
         self.vlan_pools = []
         self.idict = {}
-        self.epgs = []
-        self.refresh_time_epoch = 0
-        self.username = ''
-        self.password = ''
-        self.address = ''
-        self.session = requests.Session()
-        self.apic_address = ''
+        # Node or list of nodes of self.idict when it holds the interfaces of those leafs only
+        self.idict_node = ''
+        # {interface key: health score} of the last interface table read with health
+        self.interface_health = {}
+        # {interface key: [neighbors.Neighbor]} of the last interface table read with neighbours
+        self.interface_neighbors = {}
+        # neighbors.NeighborIndex of interface_neighbors while self.idict is the table read with them
+        self.neighbor_index = None
+        self.epg_data = []
+        self.ipgs = {}
+        self.aeps = {}
+        self.offline = ''
 
     def do_login(self, args):
         """Usage: login [FABRIC_NAME]"""
+        if self.offline:
+            print('ERROR: login is not available in offline mode')
+            return
+
         if self.can_connect:
             try:
                 self.disconnect()
@@ -93,18 +137,21 @@ class Apic(Cmd):
             parameters = args.split()
             if parameters[0] in FABRICS.keys():
                 self.fabric = FABRICS[parameters[0]]
-                self.username = ''
-                self.password = ''
+                self.client.snapshots = {}
+                self.client.snapshot_ids = {}
+                self.client.endpoint_table = None
+                self.client.username = ''
+                self.client.password = ''
                 for apic_credentials in self.fabric:
                     if not apic_credentials['username'] or not apic_credentials['password']:
-                        if not self.username and not self.password:
-                            self.username = input('Enter username: ')
-                            self.password = getpass()
+                        if not self.client.username and not self.client.password:
+                            self.client.username = input('Enter username: ')
+                            self.client.password = getpass()
                     else:
-                        self.username = apic_credentials['username']
-                        self.password = apic_credentials['password']
+                        self.client.username = apic_credentials['username']
+                        self.client.password = apic_credentials['password']
 
-                    self.address = apic_credentials['address']
+                    self.client.address = apic_credentials['address']
                     try:
                         result = self.connect()
                         if result['rc'] == 0:
@@ -127,10 +174,18 @@ class Apic(Cmd):
         Performs basic admin configuration tasks for Cisco ACI
         Usage:
         config snapshot new | <snapshot_id>
+        config binding import <file.csv> [dry-run]
         """
         if self.can_connect:
             if len(args) == 0:
                 print("Usage: config snapshot <id>. ")
+            elif args.split()[0] == 'binding':
+                parameters = args.split()
+                if len(parameters) in (3, 4) and parameters[1] == 'import' and \
+                        parameters[3:] in ([], ['dry-run']):
+                    self.import_bindings(parameters[2], dry_run=len(parameters) == 4)
+                else:
+                    print('Usage: config binding import <file.csv> [dry-run]')
             elif 'snapshot' in args:
                 parameters = args.split()
                 if (len(parameters) == 2) and ('new' in parameters[1]):
@@ -141,16 +196,16 @@ class Apic(Cmd):
                     else:
                         print('ERROR: failed to create new snapshot')
 
-                elif (len(parameters) == 2) and (int(parameters[1]) + 1 <= len(self.snapshots)):
+                elif (len(parameters) == 2) and self.client.snapshot_dn(parameters[1]):
                     snapshot_id = parameters[1]
                     description = input('Enter new description for the snapshot: ')
-                    status = self.update_snapshot_description(snapshot_id, description)
+                    status = self.update_snapshot_description(self.client.snapshot_dn(snapshot_id), description)
                     if status[0] == 0:
                         print('Description has been successfully updated for snapshot ID', snapshot_id)
                     else:
                         print('ERROR: failed to update description for snapshot ID', snapshot_id)
                 else:
-                    print('Usage: config snapshot <id>.')
+                    print('Usage: config snapshot <id>, IDs are listed by show snapshot.')
         else:
             print('Login to a Fabric')
         return
@@ -159,16 +214,46 @@ class Apic(Cmd):
         """
         Retrieves information from Cisco ACI
         Usage:
-        show epg [<epg_name>]
+        show epg [<epg_name>] [health]
         show interface [<node>] [<leaf_interface, i.e. 1/10>]
+        show interface [<node>] [health] [neighbor]
+        show interface stats [<node>] [top <N>]
         show vlan <vlan_id> | pools
-        show snapshot
+        show snapshot [last <N>] [since <time>]
+        show faults [<severity>] [<node>] [since <time>] [summary]
+        show events [since <time>] [<dn_prefix>] [summary]
+        show endpoint <mac> | <ip> | epg <epg_name> | interface <node> <interface> | table
+        show health worst <N>
+        show neighbor <name_pattern>
+        show diagnostics
+
+        <time> is YYYY-MM-DD[THH:MM[:SS]] or a time before the newest record, e.g. 30m, 12h or 7d.
+        Faults include the more severe ones, events default to the last day.
         """
         if self.can_connect:
             if len(args) == 0:
                 print("Usage: show epg, show interfaces or show vlan.")
+            elif args.split()[0] in ('faults', 'events', 'endpoint', 'health', 'neighbor'):
+                # Event DN prefixes and endpoint options may contain the names of the other show commands
+                parameters = args.split()
+                if parameters[0] == 'faults':
+                    self.show_faults(parameters[1:])
+                elif parameters[0] == 'events':
+                    self.show_events(parameters[1:])
+                elif parameters[0] == 'endpoint':
+                    self.show_endpoint(parameters[1:])
+                elif parameters[0] == 'health':
+                    self.show_health(parameters[1:])
+                else:
+                    self.show_neighbor(parameters[1:])
+            elif 'diagnostics' in args:
+                self.print_diagnostics()
             elif 'epg'in args:
                 parameters = args.split()
+                # The scores come with the EPG and l1PhysIf queries
+                with_health = parameters[-1] == 'health'
+                if with_health:
+                    parameters.pop()
                 if len(parameters) >= 2:
                     if parameters[1] in self.epg_names:
                         epg = parameters[1]
@@ -176,30 +261,32 @@ class Apic(Cmd):
                         epg='ALL'
                 else:
                     epg='ALL'
-                self.get_epg_data(epg)
-                self.get_interface_data()
-                self.print_epgs()
+                with self.client.planned(epg_query(epg, with_health), 'interfaces'):
+                    self.get_epg_data(epg, with_health)
+                    self.get_interface_data(with_health=with_health)
+                self.print_epgs(with_health)
             elif 'interface' in args:
                 parameters = args.split()
-                if len(parameters) >= 2:
+                options = set()
+                while len(parameters) >= 2 and parameters[-1] in SHOW_INTF_OPTIONS:
+                    options.add(parameters.pop())
+                with_health = 'health' in options
+                with_neighbors = 'neighbor' in options
+                if len(parameters) >= 2 and parameters[1] == 'stats':
+                    self.show_interface_stats(parameters[2:])
+                elif len(parameters) >= 2:
                     if (len(parameters) == 2) and (parameters[1] in self.leafs):
-                        self.get_interface_data()
-                        self.print_interface(parameters[1])
+                        self.get_interface_data(with_health=with_health, with_neighbors=with_neighbors)
+                        self.print_interface(parameters[1], with_health, with_neighbors)
                     elif (len(parameters) == 3) and (parameters[1] in self.leafs):
-                        if not self.idict:
-                            self.get_interface_data()
-                        self.get_epg_data(epg='ALL')
+                        with self.client.planned('epgs', *([] if self.have_interfaces() else ['interfaces'])):
+                            if not self.have_interfaces():
+                                self.get_interface_data()
+                            self.get_epg_data(epg='ALL')
                         try:
                             node = parameters[1]
                             port = parameters[2]
-                            idx = 0
-                            if len(port.split('/')) == 3:
-                                idx = int(node) * 1000000 + int(port.split('/')[0]) * 1000 + \
-                                      int(port.split('/')[1]) * 100 + int(port.split('/')[2])
-
-                            elif len(port.split('/')) == 2:
-                                idx = int(node) * 1000000 + int(0) * 1000 + \
-                                      int(port.split('/')[0]) * 100 + int(port.split('/')[1])
+                            idx = dn_parser.parse('node-{0}/phys-[eth{1}]'.format(node, port)).key
 
                             if idx in self.idict:
                                 self.print_interface_details(idx)
@@ -211,18 +298,33 @@ class Apic(Cmd):
                     else:
                         print('ERROR: Incorrect Node or Interface')
                 else:
-                    self.get_interface_data()
-                    self.print_interface()
+                    self.get_interface_data(with_health=with_health, with_neighbors=with_neighbors)
+                    self.print_interface(with_health=with_health, with_neighbors=with_neighbors)
             elif 'snapshot' in args:
-                self.print_snapshot()
+                parameters = args.split()
+                options = dict(zip(parameters[1::2], parameters[2::2]))
+                try:
+                    if len(parameters) % 2 == 0 or not set(options).issubset(SHOW_SNAPSHOT_CMDS):
+                        raise ValueError
+                    last = int(options.get('last', 0))
+                    since = options.get('since', '')
+                    if last < 0:
+                        raise ValueError
+                    if since:
+                        faults.parse_since(since, newest='')
+                except ValueError:
+                    print('Usage: show snapshot [last <N>] [since <YYYY-MM-DD[THH:MM]> | since <N>m|h|d]')
+                else:
+                    self.print_snapshot(last, since)
             elif 'vlan' in args:
                 parameters = args.split()
                 if len(parameters) == 2 and 'pools' not in parameters[1]:
                     try:
                        vlan_id = int(parameters[1])
                        if (vlan_id >= 1) and (vlan_id <= 4096):
-                            self.get_epg_data('ALL')
-                            self.get_vlan_pool()
+                            with self.client.planned('epgs', 'vlan_pools'):
+                                self.get_epg_data('ALL')
+                                self.get_vlan_pool()
                             self.vlan_usage(vlan_id)
                        else:
                            print('VLAN needs to be 1-4096')
@@ -240,16 +342,116 @@ class Apic(Cmd):
                     self.print_ipgs()
                 elif len(parameters) == 2:
                     if parameters[1] in self.ipg_names:
-                        if not self.idict:
-                            self.get_interface_data()
-
-                        self.get_ipg_data()
+                        with self.client.planned('ipgs', *([] if self.have_interfaces() else ['interfaces'])):
+                            if not self.have_interfaces():
+                                self.get_interface_data()
+                            self.get_ipg_data()
                         self.print_ipg_details(parameters[1])
               
         else:
             print('Login to a Fabric')
         return
 
+    def do_explain(self, args):
+        """
+        Lists the APIC queries of a show command with estimated object counts and sizes, without running it
+        Usage:
+        explain show <...>
+        """
+        if self.can_connect:
+            if args.split()[:1] in ([i] for i in EXPLAIN_CMDS):
+                self.explain_command(args)
+            else:
+                print('Usage: explain show <...>')
+        else:
+            print('Login to a Fabric')
+        return
+
+    def do_export(self, args):
+        """
+        Exports data from Cisco ACI
+        Usage:
+        export fabric <file>
+        export interfaces | bindings | ipgs | vlans <file.ndjson|file.csv|file.parquet>
+        """
+        if self.can_connect:
+            parameters = args.split()
+            if len(parameters) == 2 and parameters[0] == 'fabric':
+                self.export_fabric(parameters[1])
+            elif len(parameters) == 2 and parameters[0] in EXPORT_CMDS:
+                self.export_inventory(parameters[0], parameters[1])
+            else:
+                print('Usage: export fabric <file> or export interfaces | bindings | ipgs | vlans <file>')
+        else:
+            print('Login to a Fabric')
+        return
+
+    def do_audit(self, args):
+        """
+        Validates the configuration of Cisco ACI
+        Usage:
+        audit encap
+        """
+        if self.can_connect:
+            if args.split() == ['encap']:
+                self.audit_bindings()
+            else:
+                print('Usage: audit encap')
+        else:
+            print('Login to a Fabric')
+        return
+
+    def do_watch(self, args):
+        """
+        Refreshes the interface state of a show command, printing only the interfaces that changed
+        Usage:
+        watch [-n <seconds>] [-c <count>] show interface <node>
+        watch [-n <seconds>] [-c <count>] show epg <epg_name>
+        """
+        if self.can_connect:
+            parameters = args.split()
+            interval = watch.DEFAULT_INTERVAL
+            count = 0
+            try:
+                while parameters and parameters[0] in ('-n', '-c'):
+                    if parameters[0] == '-n':
+                        interval = max(float(parameters[1]), watch.MIN_INTERVAL)
+                    else:
+                        count = int(parameters[1])
+                    parameters = parameters[2:]
+            except (IndexError, ValueError):
+                parameters = []
+
+            if len(parameters) == 3 and parameters[:2] == ['show', 'interface'] and parameters[2] in self.leafs:
+                node = parameters[2]
+                self.get_interface_data(target_node=node)
+                self.print_interface(node)
+                keys = [key for key, intf in self.idict.items() if intf['node'] == node]
+                self.watch_interfaces(keys, interval, count)
+            elif len(parameters) == 3 and parameters[:2] == ['show', 'epg'] and parameters[2] in self.epg_names:
+                self.get_epg_data(parameters[2])
+                # Only the leafs of the EPG's paths
+                nodes = set()
+                for epg in self.epg_data:
+                    for path in epg['paths']:
+                        if 'vpc' in path:
+                            nodes.update(path['protpaths'].split('-')[1:])
+                        elif 'node' in path:
+                            nodes.add(path['node'])
+                if nodes:
+                    self.get_interface_data(target_node=sorted(nodes))
+                self.print_epgs()
+                keys = set()
+                for epg in self.epg_data:
+                    for path in epg['paths']:
+                        keys.update(self.path_keys(path))
+                self.watch_interfaces(sorted(keys), interval, count)
+            else:
+                print('Usage: watch [-n <seconds>] [-c <count>] show interface <node> | show epg <epg_name>')
+        else:
+            print('Login to a Fabric')
+        return
+
     def complete_config(self, text, line, begidx, endidx):
 
         if begidx == 7:
@@ -264,6 +466,9 @@ class Apic(Cmd):
             else:
                 return CONFIG_SNAPSHOT
 
+        if begidx == 15 and 'binding' in line:
+            return [i for i in CONFIG_BINDING if i.startswith(text)]
+
     def complete_show(self, text, line, begidx, endidx):
 
         if begidx == 5:
@@ -292,9 +497,59 @@ class Apic(Cmd):
 
         if begidx == 15 and 'interface' in line:
             if text:
-                return [i for i in self.leafs if i.startswith(text)]
+                return [i for i in ['stats'] + SHOW_INTF_OPTIONS + self.leafs if i.startswith(text)]
             else:
-                return self.leafs
+                return ['stats'] + SHOW_INTF_OPTIONS + self.leafs
+
+        if begidx == 21 and line.split()[1:3] == ['interface', 'stats']:
+            return [i for i in ['top'] + self.leafs if i.startswith(text)]
+
+        if begidx == 14 and 'snapshot' in line:
+            return [i for i in SHOW_SNAPSHOT_CMDS if i.startswith(text)]
+
+        if begidx >= 12 and line.split()[1] == 'faults':
+            return [i for i in SHOW_FAULT_CMDS + self.leafs if i.startswith(text)]
+
+        if begidx >= 12 and line.split()[1] == 'events':
+            return [i for i in SHOW_EVENT_CMDS if i.startswith(text)]
+
+        if begidx == 14 and line.split()[1] == 'endpoint':
+            return [i for i in SHOW_ENDPOINT_CMDS if i.startswith(text)]
+
+        if begidx == 18 and line.split()[1:3] == ['endpoint', 'epg']:
+            return [i for i in self.epg_names if i.startswith(text)]
+
+        if begidx == 24 and line.split()[1:3] == ['endpoint', 'interface']:
+            return [i for i in self.leafs if i.startswith(text)]
+
+        if begidx == 12 and line.split()[1] == 'health':
+            return [i for i in ['worst'] if i.startswith(text)]
+
+    def complete_export(self, text, line, begidx, endidx):
+
+        if begidx == 7:
+            if text:
+                return [i for i in EXPORT_CMDS if i.startswith(text)]
+            else:
+                return EXPORT_CMDS
+
+    def complete_explain(self, text, line, begidx, endidx):
+
+        if begidx == 8:
+            return [i for i in EXPLAIN_CMDS if i.startswith(text)]
+
+    def complete_audit(self, text, line, begidx, endidx):
+
+        if begidx == 6:
+            return [i for i in AUDIT_CMDS if i.startswith(text)]
+
+    def complete_watch(self, text, line, begidx, endidx):
+
+        if begidx == 6:
+            if text:
+                return [i for i in WATCH_CMDS if i.startswith(text)]
+            else:
+                return WATCH_CMDS
 
     def complete_login(self, text, line, begidx, endidx):
         if begidx == 6 and 'login' in line:
@@ -319,105 +574,153 @@ class Apic(Cmd):
     def emptyline(self):
         pass
 
+    def onecmd(self, line):
+        """Runs a command, printing the error of an APIC query that failed instead of partial output."""
+        try:
+            return Cmd.onecmd(self, line)
+        except ApicError as error:
+            print('ERROR:', str(error))
+
     def connect(self):
         self.can_connect = ''
-        error_msg = ''
-        apic_user = self.username
-        apic_password = self.password
-        apic_address = self.address
-        uri = "https://{0}/api/aaaLogin.json".format(apic_address)
-        payload = {'aaaUser': {'attributes': {'name': apic_user, 'pwd': apic_password}}}
-        response = self.session.post(uri, data=json.dumps(payload), headers=self.headers, verify=False)
-        if response.status_code == 200:
-            self.cookie = {'APIC-cookie': response.cookies['APIC-cookie']}
-            self.apic_address = apic_address
-            self.refresh_time_epoch = int(datetime.datetime.now().strftime('%s'))
-            self.collect_epgs()
-            self.collect_leafs()
+        result = self.client.login()
+        if result['rc'] == 0:
+            with self.client.planned('epg_names', 'leafs'):
+                self.collect_epgs()
+                self.collect_leafs()
             #self.collect_ipgs()
-            
-            return {'rc': 0, 'error_msg': error_msg}
-        else:
-            error_msg = 'failed to connect to APIC {0}, Error Code {1}'.format(self.address, response.status_code)
-            return {'rc': 1, 'error_msg': error_msg}
-        
+        return result
+
     def refresh_connection(self, timeout=90):
         try:
             current_time_epoch = int(datetime.datetime.now().strftime('%s'))
 
-            if current_time_epoch - self.refresh_time_epoch >= timeout:
+            if current_time_epoch - self.client.refresh_time_epoch >= timeout:
                 self.connect()
             else:
-                self.refresh_time_epoch = current_time_epoch
+                self.client.refresh_time_epoch = current_time_epoch
 
             return [0, ]
 
         except:
             print('Lost connection to Fabric', self.can_connect)
             self.can_connect = ''
-            apic.prompt = 'ACLI()>'
+            self.prompt = 'ACLI()>'
             return [1, ]
 
+    def open_archive(self, path):
+        """Serves all queries from a fabric archive written by 'export fabric'."""
+        self.client.session = OfflineSession.from_archive(path)
+        self.offline = path
+        self.client.address = 'offline'
+        result = self.connect()
+        if result['rc'] == 0:
+            self.can_connect = 'OFFLINE'
+            self.prompt = 'ACLI({})>'.format(self.can_connect)
+            print('Loaded {0} objects from {1}'.format(len(self.client.session.mit), path))
+
     def disconnect(self):
+        self.client.close()
+        self.prompt = 'ACLI()>'
+
+    def export_fabric(self, path):
+
+        result = self.refresh_connection()
+
+        if result[0] == 1:
+            return
+
+        mit = Mit()
+        for mo_class in EXPORT_CLASSES:
+            uri = 'https://{0}/api/class/{1}.json'.format(self.client.apic_address, mo_class)
+            mit.extend(self.client.iter_query(uri))
+
+        mit.dump(path)
+        print('Exported {0} objects to {1}'.format(len(mit), path))
+
+    def explain_command(self, command):
+        """Runs a command on a copy of the shell whose session only counts the objects of each query."""
+
+        result = self.refresh_connection()
+
+        if result[0] == 1:
+            return
+
+        shell = copy.copy(self)
+        shell.client = copy.copy(self.client)
+        shell.client.session = ExplainSession(self.client.session)
+        # The queries of the command itself, not of the daemon's datasets
+        shell.client.fabric_cache = None
+        with redirect_stdout(io.StringIO()):
+            try:
+                shell.onecmd(command)
+            except Exception:
+                # Printing the empty results may fail, the queries are collected by then
+                pass
+        self.print_explain(list(shell.client.session.queries.values()))
+
+    def export_inventory(self, dataset, path):
+        """Streams a dataset to NDJSON, CSV or Parquet, the format is taken from the file extension."""
+
+        result = self.refresh_connection()
+
+        if result[0] == 1:
+            return
+
         try:
-            self.session.close()
-        except:
-            pass
-        apic.prompt = 'ACLI()>'
+            export.export_format(path)
+        except export.ExportError as error:
+            print('ERROR:', str(error))
+            return
+
+        datasets = {
+            'interfaces': (export.INTERFACE_FIELDS, self.client.iter_interface_rows),
+            'bindings': (export.BINDING_FIELDS, self.client.iter_binding_rows),
+            'ipgs': (export.IPG_FIELDS, self.client.iter_ipg_rows),
+            'vlans': (export.VLAN_POOL_FIELDS, self.client.iter_vlan_pool_rows),
+        }
+        fields, iter_rows = datasets[dataset]
+        with export.open_writer(path, fields) as writer:
+            for row in iter_rows():
+                writer.write(row)
+        print('Exported {0} {1} to {2}'.format(writer.rows, dataset, path))
 
     def collect_epgs(self):
-        uri = 'https://{0}/api/class/fvAEPg.json?'.format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
         self.epg_names = []
-        for epg in response['imdata']:
+        for epg in self.client.fetch(EPG_NAME_QUERY):
             self.epg_names.append(epg['fvAEPg']['attributes']['name'])
 
     def collect_leafs(self):
-        uri = 'https://{0}/api/class/fabricNode.json?'.format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
         self.leafs = []
-        for node in response['imdata']:
+        for node in self.client.fetch(NODE_QUERY):
             if node['fabricNode']['attributes']['role'] == 'leaf':
                 self.leafs.append(node['fabricNode']['attributes']['id'])
 
-        uri = "https://{0}/api/class/infraNodeBlk.json".format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        for mo in response['imdata']:
+        for mo in self.client.fetch(NODE_BLOCK_QUERY):
             mo_class = list(mo.keys())[0]
-            sw_sel = mo[mo_class]['attributes']['dn'].split('/')[2].replace('nprof-', '')
             from_ = int(mo[mo_class]['attributes']['from_'])
             to_ = int(mo[mo_class]['attributes']['to_']) + 1
             for node in range(from_, to_):
                 if str(node) not in self.leafs:
                     self.leafs.append(str(node))
  
-    def collect_snapshots(self):
+    def collect_snapshots(self, last=0, since=''):
 
         result = self.refresh_connection()
 
         if result[0] == 1:
-            return
-
-        self.snapshots = []
-        uri = 'https://{0}/api/class/configSnapshot.json?'.format(self.apic_address)
-        self.snapshots = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()['imdata']
-
-        self.snapshots.sort(key=lambda k: k['configSnapshot']['attributes']['createTime'])
+            return []
 
-        return    
+        return self.client.get_snapshots(last, since)
 
     def collect_ipgs(self):
         self.ipg_names = []
-        uri = 'https://{0}/api/class/infraAccPortGrp.json'.format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        for ipg in response['imdata']:
+        for ipg in self.client.fetch(PORT_GROUP_NAME_QUERY):
             self.ipg_names.append(str(ipg['infraAccPortGrp']['attributes']['name']))
 
-        uri = 'https://{0}/api/class/infraAccBndlGrp.json'.format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        for ipg in response['imdata']:
+        for ipg in self.client.fetch(BUNDLE_GROUP_NAME_QUERY):
             self.ipg_names.append(str(ipg['infraAccBndlGrp']['attributes']['name']))
-        
+
         self.ipg_names.sort()
 
     def create_snapshot(self, description):
@@ -429,518 +732,220 @@ class Apic(Cmd):
 
         config_payload = {'configExportP': {'attributes' : {'name': 'defaultOneTime', 'adminSt': 'triggered',
                                                             'snapshot': 'true', 'descr': description}}}
-        uri = 'https://{0}/api/node/mo/uni/fabric/configexp-defaultOneTime.json'.format(self.apic_address)
-
-        response = self.session.post(uri, data=json.dumps(config_payload), headers=self.headers, cookies=self.cookie,
-                                     verify=False)
+        response = self.client.post('node/mo/uni/fabric/configexp-defaultOneTime.json', config_payload)
 
         if response.status_code == 200:
             return [0, ]
         else:
             return [1, ]
 
-    def update_snapshot_description(self, snapshot_id, description):
+    def update_snapshot_description(self, snapshot_dn, description):
 
         result = self.refresh_connection()
 
         if result[0] == 1:
             return
 
-        snapshot = self.snapshots[int(snapshot_id)]
-        snapshot_dn = snapshot['configSnapshot']['attributes']['dn']
-        uri = 'https://{0}/api/mo/{1}.json'.format(self.apic_address, snapshot_dn)
-
         config_payload = {'configSnapshot': {'attributes': {'descr': description}}}
 
-        response = self.session.post(uri, data=json.dumps(config_payload), headers=self.headers, cookies=self.cookie,
-                                     verify=False)
+        response = self.client.post('mo/{0}.json'.format(snapshot_dn), config_payload)
         if response.status_code == 200:
+            self.client.snapshots[snapshot_dn]['descr'] = description
             return [0, ]
         else:
             return [1, ]
     
-    def get_epg_data(self, epg):
+    def import_bindings(self, path, dry_run=False):
+        """Validates the bindings of a CSV file, prints the changes and posts them unless dry_run."""
         result = self.refresh_connection()
 
         if result[0] == 1:
-           return
-        self.epgs = []
-        epg_paths = {}
-
-        if epg:
-            if epg == 'ALL':
-                uri = 'https://{0}/api/class/fvRsPathAtt.json'.format(self.apic_address)
+            return
 
-            else:
-                classQuery = 'fvRsPathAtt'
-                propFilter = 'wcard(fvRsPathAtt.dn, "epg-{}")'.format(epg)
-                uri = "https://{0}/api/node/class/{1}.json".format(self.apic_address, classQuery)
-                options = '?query-target-filter={0}'.format(propFilter)
-                uri += options
-
-            response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False)
-            response_data = response.json()
-
-            if response.status_code == 200:
-
-                if response_data['imdata']:
-                    for path in response_data['imdata']:
-                        path_dict = []
-                        dn = path['fvRsPathAtt']['attributes']['dn']
-                        t_dn = path['fvRsPathAtt']['attributes']['tDn']
-                        tn = dn.split('/')[1].replace('tn-', '')
-                        ap = dn.split('/')[2].replace('ap-', '')
-                        epg_name = dn.split('/')[3].replace('epg-', '')
-
-                        epg_key = '{0}/{1}/{2}'.format(tn, ap, epg_name)
-
-                        encap = path['fvRsPathAtt']['attributes']['encap'].replace('vlan-', '')
-                        match = re.findall(r'\[.*\]', t_dn)
-                        pathep = match[0].strip('[]')
-
-                        if 'protpaths' in t_dn:
-                            protpaths = t_dn.split('/')[2]
-                            vpc = t_dn.split('/')[-1].split('[')[-1][:-1]
-                            path_dict = {'vpc': vpc, 'protpaths': protpaths, 'encap': encap, 'idx': 0}
-
-                        elif '/paths' in t_dn:
-
-                            if 'eth' in pathep and not 'extpaths-' in t_dn:
-                                intf_id = pathep.replace('eth', '')
-                                node = t_dn.split('/')[2].replace('paths-', '')
-                                fex = 0
-                                idx = int(node) * 1000000 + int(fex) * 1000 + int(
-                                    str(intf_id).split('/')[0]) * 100 + \
-                                        int(str(intf_id).split('/')[-1])
-                                path_dict = {'idx': idx, 'node': node, 'intf_id': intf_id, 'encap': encap}
-
-
-                            elif 'eth' in pathep and 'extpaths-' in t_dn:
-                                intf_id = pathep.replace('eth', '')
-                                node = t_dn.split('/')[2].replace('paths-', '')
-                                fex = t_dn.split('/')[3].replace('extpaths-', '')
-                                idx = int(node) * 1000000 + int(fex) * 1000 + int(
-                                    str(intf_id).split('/')[0]) * 100 + \
-                                        int(str(intf_id).split('/')[-1])
-                                path_dict = {'idx': idx, 'node': node, 'intf_id': intf_id, 'encap': encap}
-
-                            elif not 'eth' in pathep:
-                                policy_grp = pathep
-                                node = t_dn.split('/')[2].replace('paths-', '')
-                                path_dict = {'idx': 0, 'node': node, 'pc': policy_grp, 'encap': encap}
-
-                        if path_dict:
-                            if epg_key in epg_paths:
-                                epg_paths[epg_key]['paths'].append(path_dict)
-                            else:
-                                epg_paths[epg_key] = {'paths': [path_dict]}
+        try:
+            rows = bindings.read_csv(path)
+        except (OSError, bindings.BindingError) as error:
+            print('ERROR:', str(error))
+            return
 
-            if epg == 'ALL':
+        # Interfaces, policy groups and VLAN pools from the last show commands are reused
+        datasets = [name for name, cached in (('interfaces', self.have_interfaces()), ('ipgs', self.ipgs),
+                                              ('vlan_pools', self.vlan_pools)) if not cached]
+        with self.client.planned('epgs', 'nodes', *datasets):
+            if not self.have_interfaces():
+                self.get_interface_data()
+            if not self.ipgs:
+                self.get_ipg_data()
+            if not self.vlan_pools:
+                self.get_vlan_pool()
+            self.get_epg_data('ALL')
+            changes = self.client.plan_bindings(rows, self.idict, self.ipgs, self.vlan_pools, self.epg_data)
+        self.print_binding_changes(changes)
+
+        counts = {action: 0 for action in (bindings.ADD, bindings.MODIFY, bindings.UNCHANGED, bindings.ERROR)}
+        for change in changes:
+            counts[change.action] += 1
+        print('{0} to add, {1} to modify, {2} unchanged, {3} errors'.format(
+            counts[bindings.ADD], counts[bindings.MODIFY], counts[bindings.UNCHANGED], counts[bindings.ERROR]))
+        deploy = counts[bindings.ADD] + counts[bindings.MODIFY]
+        if counts[bindings.ERROR]:
+            print('ERROR: nothing deployed, fix the rows with errors first')
+            return
+        if dry_run or not deploy:
+            return
 
-                uri = 'https://{0}/api/class/fvAEPg.json?rsp-subtree=children'\
-                      '&rsp-subtree-class=fvRsDomAtt,fvRsBd,tagInst'.format(self.apic_address)
+        if deploy > bindings.CHUNK_SIZE:
+            print('WARNING: {0} bindings are posted in chunks of {1}, each chunk is applied on its own'.format(
+                deploy, bindings.CHUNK_SIZE))
+        if input('Deploy {0} bindings? [y/N] '.format(deploy)).strip().lower() not in ('y', 'yes'):
+            return
+        posted, error_msg = self.client.post_bindings(changes)
+        if error_msg:
+            print('ERROR: failed to post bindings after {0} of {1}, {2}'.format(posted, deploy, error_msg))
+        else:
+            print('Deployed {0} bindings'.format(posted))
 
-            else:
-                uri = 'https://{0}/api/class/fvAEPg.json?rsp-subtree=children'\
-                      '&rsp-subtree-class=fvRsDomAtt,fvRsBd,tagInst'\
-                      '&query-target-filter=eq(fvAEPg.name, "{1}")'.format(self.apic_address, epg)
-
-            response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False)
-            response_data = response.json()
-
-            if response.status_code == 200:
-                for epg_data in response_data['imdata']:
-                    tags = []
-                    domains = []
-                    epg_name = epg_data['fvAEPg']['attributes']['name']
-                    tn = epg_data['fvAEPg']['attributes']['dn'].split('/')[1].replace('tn-', '')
-                    ap = epg_data['fvAEPg']['attributes']['dn'].split('/')[2].replace('ap-', '')
-
-                    epg_key = '{0}/{1}/{2}'.format(tn, ap, epg_name)
-
-                    if 'children' in epg_data['fvAEPg']:
-                        for child in epg_data['fvAEPg']['children']:
-
-                            if 'tagInst' in child:
-                                tags.append(child['tagInst']['attributes']['name'])
-
-                            elif 'fvRsBd' in child:
-                                t_dn = child['fvRsBd']['attributes']['tDn']
-                                if t_dn:
-                                    bd_tn = t_dn.split('/')[1].replace('tn-', '')
-                                    bd = t_dn.split('/')[2].replace('BD-', '')
-                                    bd_full = bd_tn + '/' + bd
-                                else:
-                                    bd_tn = ''
-                                    bd_full = child['fvRsBd']['attributes']['tnFvBDName']
-                            elif 'fvRsDomAtt' in child:
-                                domains.append(str(child['fvRsDomAtt']['attributes']['tDn'].split('/')[1])) 
-
-                    if epg_key in epg_paths:
-                        paths_sorted = sorted(epg_paths[epg_key]['paths'], key=lambda k: k['idx'])
-                    else:
-                        paths_sorted = []
+    def audit_bindings(self):
+        """Prints the static bindings whose encap is not allowed on their interface by its AEP, domains and pools."""
+        result = self.refresh_connection()
 
-                    epg_dict = {'epg_name': epg_name, 'tn': tn, 'ap': ap, 'bd': bd_full, 'domains': domains, 'paths': paths_sorted, 'tags': tags}
-                    self.epgs.append(epg_dict)
+        if result[0] == 1:
+            return
 
-    def get_ipg_data(self):
+        # Interfaces, policy groups, AEPs and VLAN pools from the last commands are reused
+        datasets = [name for name, cached in (('interfaces', self.have_interfaces()), ('ipgs', self.ipgs),
+                                              ('aeps', self.aeps), ('vlan_pools', self.vlan_pools)) if not cached]
+        with self.client.planned('epgs', *datasets):
+            if not self.have_interfaces():
+                self.get_interface_data()
+            if not self.ipgs:
+                self.get_ipg_data()
+            if not self.aeps:
+                self.get_aep_data()
+            if not self.vlan_pools:
+                self.get_vlan_pool()
+            self.get_epg_data('ALL')
+        checked, findings = self.client.audit_encap(self.idict, self.ipgs, self.aeps, self.vlan_pools, self.epg_data)
+
+        if findings:
+            y = PrettyTable(["TENANT", "AP", "EPG", "PATH", "ENCAP", "POLICY_GROUP", "AEP", "PROBLEM"])
+            y.align = "l"
+            y.vertical_char = ' '
+            y.junction_char = ' '
+            for finding in findings:
+                y.add_row(list(finding))
+            print(y)
+        print('{0} of {1} bindings with an encap that does not resolve'.format(len(findings), checked))
 
+    def get_epg_data(self, epg, with_health=False):
         result = self.refresh_connection()
 
         if result[0] == 1:
            return
-    
-        self.ipgs = {}
 
-        for ipg_type in ('interface', 'pc_vpc'):
-            if ipg_type == 'interface':
-                uri = 'https://{0}/api/class/infraAccPortGrp.json?rsp-subtree=children'.format(self.apic_address)
-            elif ipg_type == 'pc_vpc':
-                uri = 'https://{0}/api/class/infraAccBndlGrp.json?rsp-subtree=children'.format(self.apic_address)
+        if self.client.fabric_cache is not None and not with_health:
+            epgs = self.client.fabric_cache.get('epgs') if epg else []
+            self.epg_data = epgs if epg == 'ALL' else [item for item in epgs if item['epg_name'] == epg]
+            return
 
-            response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-            for ipg in response['imdata']:
-                ipg_dict = {}
+        self.epg_data = list(self.client.iter_epgs(epg, with_health))
 
-                if ipg_type == 'interface':
-                    name = str(ipg['infraAccPortGrp']['attributes']['name'])
-                    link_agg = '-'
-                else:
-                    name = str(ipg['infraAccBndlGrp']['attributes']['name'])
-                    lag_t = ipg['infraAccBndlGrp']['attributes']['lagT']
-                    if lag_t == 'link':
-                       link_agg = 'pc'
-                    elif lag_t == 'node':
-                       link_agg = 'vpc'
-
-                ipg_dict['link_agg'] = link_agg
-                
-                children = []               
-                if ipg_type == 'interface':
-     
-                    if 'children' in ipg['infraAccPortGrp'] and ipg['infraAccPortGrp']['children']:
-                        children = ipg['infraAccPortGrp']['children']
-                else:
-                    if 'children' in ipg['infraAccBndlGrp'] and ipg['infraAccBndlGrp']['children']:
-                        children = ipg['infraAccBndlGrp']['children']
-
-                if children:
-
-                    for child in children:
-                        if 'infraRsAttEntP' in child:
-                            if 'tDn' in child['infraRsAttEntP']['attributes']:
-                                ipg_dict['aep'] = child['infraRsAttEntP']['attributes']['tDn'].split('/')[-1].replace('attentp-', '')
-                            
-                        if 'infraRsHIfPol' in child:
-                            link_level = '-'
-                            if child['infraRsHIfPol']['attributes']['tnFabricHIfPolName']:
-                                link_level = child['infraRsHIfPol']['attributes']['tnFabricHIfPolName']
-                            ipg_dict['link_level'] = link_level
-
-                        if 'infraRsStpIfPol' in child:
-                            stp = '-'
-                            if child['infraRsStpIfPol']['attributes']['tnStpIfPolName']:
-                                stp = child['infraRsStpIfPol']['attributes']['tnStpIfPolName']
-                            ipg_dict['stp'] = stp
-
-                        if 'infraRsMcpIfPol' in child:
-                            mcp = '-'
-                            if child['infraRsMcpIfPol']['attributes']['tnMcpIfPolName']:
-                                mcp = child['infraRsMcpIfPol']['attributes']['tnMcpIfPolName']
-                            ipg_dict['mcp'] = mcp
-
-                        if 'infraRsCdpIfPol' in child:
-                            cdp = '-'
-                            if child['infraRsCdpIfPol']['attributes']['tnCdpIfPolName']:
-                                cdp = child['infraRsCdpIfPol']['attributes']['tnCdpIfPolName']
-                            ipg_dict['cdp'] = cdp
-
-                        if 'infraRsL2IfPol' in child:
-                            l2_intf = '-'
-                            if child['infraRsL2IfPol']['attributes']['tnL2IfPolName']:
-                                l2_intf = child['infraRsL2IfPol']['attributes']['tnL2IfPolName']
-                            ipg_dict['l2_intf'] = l2_intf
-
-                        if 'infraRsLldpIfPol' in child:
-                            lldp = '-'
-                            if child['infraRsLldpIfPol']['attributes']['tnLldpIfPolName']:
-                                lldp = child['infraRsLldpIfPol']['attributes']['tnLldpIfPolName']
-                            ipg_dict['lldp'] = lldp
-
-                        if 'infraRsLacpPol' in child:
-                            lacp = '-'
-                            if child['infraRsLacpPol']['attributes']['tnLacpLagPolName']:
-                                lacp = child['infraRsLacpPol']['attributes']['tnLacpLagPolName']
-                            ipg_dict['lacp'] = lacp
-
-                if 'aep' not in ipg_dict:
-                    ipg_dict['aep'] = '-'
-
-                if 'lacp' not in ipg_dict:
-                    ipg_dict['lacp'] = '-'
- 
-                self.ipgs[name] = ipg_dict
+    def get_interface_data(self, target_node='', with_health=False, with_neighbors=False):
+        result = self.refresh_connection()
+
+        if result[0] == 1:
+           return
+
+        self.neighbor_index = None
+        self.idict_node = target_node
+        if self.client.fabric_cache is not None and not (target_node or with_health or with_neighbors):
+            self.idict = self.client.fabric_cache.get('interfaces')
+            return
 
-    def get_interface_data(self, target_node=''):
+        health_scores = interface_neighbors = None
+        if with_health:
+            self.interface_health = health_scores = {}
+        if with_neighbors:
+            self.interface_neighbors = interface_neighbors = {}
+        self.idict = self.client.interface_table(target_node, health_scores, interface_neighbors)
+        if with_neighbors:
+            self.neighbor_index = neighbors.NeighborIndex(interface_neighbors)
 
+    def have_interfaces(self):
+        """Returns True if self.idict holds the interfaces of every leaf, so commands can reuse it."""
+        return bool(self.idict) and not self.idict_node
+
+    def get_ipg_data(self):
         result = self.refresh_connection()
 
         if result[0] == 1:
            return
 
-        # Initialize self.idict
-        self.idict = {}
+        if self.client.fabric_cache is not None:
+            self.ipgs = self.client.fabric_cache.get('ipgs')
+        else:
+            self.ipgs = self.client.get_ipgs()
 
-        # Populates self.idict:
-        #
-        # { "104146": {
-        #              "descr": "",
-        #              "intf_id": "1/46",
-        #              "node": "node-104",
-        #              "operDuplex": "full",
-        #              "operSpeed": "10G",
-        #              "operSt": "up",
-        #              "pod": "1",
-        #              "policy_group": "10G-ACCESS-EXISTING-LAB",
-        #              "portT": "leaf",
-        #              "port_sr_name": "Nutanix8",
-        #              "usage": "epg,infra"
-        #             },
-        # }
-
-        port_to_switch_prof_map = {}
-        # format:
-        # {'UCS-103-104-FI-B-IFSELECTOR': ['SP-UCS-103-104-FI-B'],
-        #  'LF1_ACCESS': ['LF1_SPR']}
-        #
-        uri = "https://{0}/api/class/infraRtAccPortP.json".format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        for mo in response['imdata']:
-            mo_class = list(mo.keys())[0]
-            sw_sel = mo[mo_class]['attributes']['tDn'].split('/')[2].replace('nprof-', '')
-            int_sel = mo[mo_class]['attributes']['dn'].split('/')[2].replace('accportprof-', '')
-            port_to_switch_prof_map.setdefault(int_sel, []).append(sw_sel)
-
-        fex_to_interface_profile_map = {}
-        uri = "https://{0}/api/node/class/infraFexBndlGrp.json".format(self.apic_address)
-        subtree = 'children'
-        subtreeClassFilter = 'infraRtAccBaseGrp'
-        options = '?rsp-subtree={0}&rsp-subtree-class={1}'.format(subtree, subtreeClassFilter)
-        uri += options
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        if response['imdata']:
-            for item in response['imdata']:
-                if 'children' in item['infraFexBndlGrp']:
-                    fex_profile = item['infraFexBndlGrp']['attributes']['name']
-                    rt_base_group = item['infraFexBndlGrp']['children'][0]['infraRtAccBaseGrp']['attributes']
-                    interface_profile = rt_base_group['tDn'].split('/')[2].replace('accportprof-', '')
-                    fex_to_interface_profile_map[fex_profile] = interface_profile
-        switch_prof_leafs = {}
-        # format:
-        # {'SP-UCS-103-104-FI-B': [103, 104],
-        #  'LF1_SPR': [101]]
-        #
-        uri = "https://{0}/api/class/infraNodeBlk.json".format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        for mo in response['imdata']:
-            mo_class = list(mo.keys())[0]
-            sw_sel = mo[mo_class]['attributes']['dn'].split('/')[2].replace('nprof-', '')
-            from_ = int(mo[mo_class]['attributes']['from_'])
-            to_ = int(mo[mo_class]['attributes']['to_']) + 1
-            for node in range(from_, to_):
-                switch_prof_leafs.setdefault(sw_sel, []).append(node)
-
-        access_port_selectors = {}
-        # format:
-        # UCS-103-104-FI-B-IFSELECTOR': [{'interfaces': ['1/48'], 'policy_group': u'PG-UCS2-FI-B', 'hport_name': u'UCS-FI-B-PORT2'}],
-        #
-        uri = "https://{0}/api/class/infraHPortS.json".format(self.apic_address)
-        options = '?query-target=subtree'
-        uri += options
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        for mo in response['imdata']:
-            mo_class = list(mo.keys())[0]
-            # Relies on ACI returning objects in PortBlk, RsAccBaseGrp, HPortS order
-            if 'accportprof-' in mo[mo_class]['attributes']['dn']:
-                isl = mo[mo_class]['attributes']['dn'].split('/')[2].replace('accportprof-', '')
-            elif 'fexprof-' in mo[mo_class]['attributes']['dn']:
-                fex_prof = mo[mo_class]['attributes']['dn'].split('/')[2].replace('fexprof-', '')
-                if fex_prof in fex_to_interface_profile_map:
-                    isl = fex_to_interface_profile_map[fex_prof]
-
-            if mo_class == 'infraPortBlk':
-                fromPort = int(mo[mo_class]['attributes']['fromPort'])
-                toPort = int(mo[mo_class]['attributes']['toPort']) + 1
-                interfaces = []
-                for intf in range(fromPort, toPort):
-                    intf_name = '1/' + str(intf)
-                    interfaces.append(intf_name)
-
-            if mo_class == 'infraRsAccBaseGrp':
-                if 'fexbundle' in mo[mo_class]['attributes']['tDn']:
-                    pol_grp = mo[mo_class]['attributes']['tDn'].split('/')[3].replace('fexbundle-', '')
-                else:
-                    pol_grp = mo[mo_class]['attributes']['tDn'].split('-', 1)[-1]
-                if 'fexprof-' in mo[mo_class]['attributes']['dn']:
-                    fex = mo[mo_class]['attributes']['fexId']
-                else:
-                    fex = '0'
-
-            if mo_class == 'infraHPortS':
-                hport_name = mo[mo_class]['attributes']['name']
-                access_port_selectors.setdefault(isl, []).append({'fex': fex, 'hport_name': hport_name, 'policy_group': pol_grp, 'interfaces': interfaces})
-
-        # Format:
-        # {104148: {'port_sr_name': u'UCS-FI-B-PORT2', 'policy_group': u'PG-UCS2-FI-B'},  }
-        #
-        for port_selector in access_port_selectors:
-            if port_selector in port_to_switch_prof_map:
-                for port_selector_item in access_port_selectors[port_selector]:
-                    policy_group = port_selector_item['policy_group']
-                    port_sr_name = port_selector_item['hport_name']
-                    fex = port_selector_item['fex']
-                    nodes = []
-                    for sw_sel in port_to_switch_prof_map[port_selector]:
-                        if sw_sel in switch_prof_leafs:
-                            for node in switch_prof_leafs[sw_sel]:
-                                nodes.append(node)
-                    if nodes:
-                        for node in set(nodes):
-                            if target_node:
-                                if node != target_node:
-                                    continue
-                            for intf in set(port_selector_item['interfaces']):
-                                hport_dict = {}
-                                key = int(node)*1000000 + int(fex)*1000 + int(intf.split('/')[0])*100 + int(intf.split('/')[-1])
-                                if fex != '0':
-                                    intf = fex + '/' + intf
-                                hport_dict['policy_group'] = policy_group
-                                hport_dict['port_sr_name'] = port_sr_name
-                                hport_dict['intf_id'] = intf
-                                hport_dict['node'] = str(node)
-                                hport_dict['descr'] = ''
-                                hport_dict['portT'] = '-'
-                                hport_dict['usage'] = '-'
-                                hport_dict['operSt'] = '-'
-                                hport_dict['operSpeed'] = '-'
-                                hport_dict['operDuplex'] = '-'
-
-                                self.idict[key] = hport_dict
-        #pprint.pprint(self.idict)
-        leaf_nodes = []
-        # format:
-        # [101, 102, 103, 104]
-        #
-        uri = "https://{0}/api/class/fabricPod.json".format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        pods = response['imdata']
-        for pod_dict in pods:
-            pod_mo_class = list(pod_dict.keys())[0]
-            pod = pod_dict[pod_mo_class]['attributes']
-            if target_node:
-                options = '?query-target-filter=eq(fabricNode.id,"{0}")'.format(target_node)
-            else:
-                options = ''
-            uri = "https://{0}/api/class/fabricNode.json".format(self.apic_address)
-            uri += options
-            response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-            nodes = response['imdata']
-            for node_dict in nodes:
-                node_mo_class = list(node_dict.keys())[0]
-                node = node_dict[node_mo_class]['attributes']
-                if node['role'] == 'leaf' and pod['dn'] in node['dn']:
-                    node_rn = 'node-' + node['id']
-                    leaf_nodes.append(node_rn)
-        #print(leaf_nodes)
-        # Query l1PhysIf to buils self.idict
-        uri = "https://{0}/api/class/l1PhysIf.json".format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        intfs = response['imdata']
-        if intfs:
-            for intf_dict in intfs:
-                intf_mo_class = list(intf_dict.keys())[0]
-                intf = intf_dict[intf_mo_class]['attributes']
-                node = intf['dn'].split('/')[2]
-                pod_id = intf['dn'].split('/')[1].replace('pod-', '')
-                if node in leaf_nodes:
-                    node_id = node.replace('node-', '')
-                    intf_id =  intf['id'].strip('eth')
-                    portT = intf['portT']
-                    usage = intf['usage']
-                    descr = intf['descr']
-                    if len(intf_id.split('/')) == 3:
-                        fex = intf_id.split('/')[0]
-                        module = intf_id.split('/')[1]
-                        port = intf_id.split('/')[2]
-                    elif len(intf_id.split('/')) == 2:
-                        fex = '0'
-                        module = intf_id.split('/')[0]
-                        port = intf_id.split('/')[1]
-                    idx = int(node.split('-')[-1])*1000000 + int(fex)*1000 + int(module)*100 + int(port)
-                    if idx in self.idict:
-                        self.idict[idx].update({'portT': portT, 'usage': usage, 'descr': descr,
-                                       'pod': pod_id, 'operSt': '-', 'operSpeed': '-', 'operDuplex': '-'})
-                    else:
-                        self.idict[idx] = {'node': node_id, 'intf_id': intf_id, 'portT': portT, 'usage': usage, 'descr': descr,
-                                       'pod': pod_id, 'operSt': '-', 'operSpeed': '-', 'operDuplex': '-', 'port_sr_name': '', 'policy_group': ''}
-
-            #pprint.pprint(self.idict)
-
-            # Query ethpmPhysIf and add status, speed and duplex to self.idict
-            uri = "https://{0}/api/class/ethpmPhysIf.json".format(self.apic_address)
-            response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-            phy_intfs = response['imdata']
-            for phy_intf_dict in phy_intfs:
-                phy_intf_mo_class = list(phy_intf_dict.keys())[0]
-                phy_intf = phy_intf_dict[phy_intf_mo_class]['attributes']
-                node = phy_intf['dn'].split('/')[2]
-                if node in leaf_nodes:
-                    pod = phy_intf['dn'].split('/')[1].replace('pod-', '')
-                    node = phy_intf['dn'].split('/')[2].replace('node-', '')
-                    match = re.findall('\[eth.*\]', phy_intf['dn'])
-                    if match:
-                        intf_id = match[0].strip('[eth]')
-                        if len(intf_id.split('/')) == 3:
-                            fex = intf_id.split('/')[0]
-                            module = intf_id.split('/')[1]
-                            port = intf_id.split('/')[2]
-                        elif len(intf_id.split('/')) == 2:
-                            fex = '0'
-                            module = intf_id.split('/')[0]
-                            port = intf_id.split('/')[1]
-                        search_idx = int(node.split('-')[-1])*1000000 + int(fex)*1000 + int(module)*100 + int(port)
-                        if search_idx in self.idict:
-                            self.idict[search_idx]['operSt'] = phy_intf['operSt']
-                            self.idict[search_idx]['operSpeed'] = phy_intf['operSpeed']
-                            self.idict[search_idx]['operDuplex'] = phy_intf['operDuplex']
-
-        # Match idx in self.idict and port_profiles to add port_sr_name and policy_group
+    def get_aep_data(self):
+        result = self.refresh_connection()
 
-    def get_vlan_pool(self):
+        if result[0] == 1:
+           return
+
+        if self.client.fabric_cache is not None:
+            self.aeps = self.client.fabric_cache.get('aeps')
+        else:
+            self.aeps = self.client.get_aeps()
 
+    def get_vlan_pool(self):
         result = self.refresh_connection()
 
         if result[0] == 1:
             return
 
-        self.vlan_pools = []
-        uri = 'https://{0}/api/class/fvnsVlanInstP.json?rsp-subtree=children'.format(self.apic_address)
-        response = self.session.get(uri, headers=self.headers, cookies=self.cookie, verify=False).json()
-        for inst in response['imdata']:
-            name = inst['fvnsVlanInstP']['attributes']['name']
-            alloc = inst['fvnsVlanInstP']['attributes']['allocMode']
-            domains = []
-            if 'children' in inst['fvnsVlanInstP']:
-                for child in inst['fvnsVlanInstP']['children']:
-                    if 'fvnsRtVlanNs' in child:
-                        domains.append(str(child['fvnsRtVlanNs']['attributes']['tDn'].split('uni/')[1]))
-                for child in inst['fvnsVlanInstP']['children']:
-                    if 'fvnsEncapBlk' in child:
-                        from_vlan = int(child['fvnsEncapBlk']['attributes']['from'].replace('vlan-', ''))
-                        to_vlan = int(child['fvnsEncapBlk']['attributes']['to'].replace('vlan-', ''))
-                        self.vlan_pools.append({'name': name, 'alloc': alloc, 'domains': domains,
-                                                'from_vlan': from_vlan, 'to_vlan': to_vlan})
+        if self.client.fabric_cache is not None:
+            self.vlan_pools = self.client.fabric_cache.get('vlan_pools')
+        else:
+            self.vlan_pools = self.client.get_vlan_pools()
+
+    def path_keys(self, path, idict=None):
+        """Returns the keys of the interfaces in idict, by default self.idict, bound by an EPG path dict."""
+        if idict is None:
+            idict = self.idict
+        if 'vpc' in path:
+            return table.select(idict, path['vpc'], path['protpaths'].__contains__)
+        if 'pc' in path:
+            return table.select(idict, path['pc'], path['node'].__eq__)
+        if path['idx'] in idict:
+            return [path['idx']]
+        return []
+
+    def watch_interfaces(self, keys, interval, count=0):
+        """
+        Polls the ethpmPhysIf state of the nodes of keys every interval seconds, count times or
+        until Ctrl-C, and prints the interfaces whose state changed or that are gone since the
+        previous refresh.
+        """
+        nodes = {self.idict[key]['node'] for key in keys}
+        node_dns = self.client.get_node_dns(nodes)
+        state = watch.StateDiff()
+        state.update(self.client.get_oper_state(keys, node_dns))
+        print('Watching {0} interfaces every {1:g}s, Ctrl-C to stop'.format(len(keys), interval))
+
+        refreshes = 0
+        try:
+            while not count or refreshes < count:
+                time.sleep(interval)
+                refreshes += 1
+                result = self.refresh_connection()
+                if result[0] == 1:
+                    return
+                records = self.client.get_oper_state(keys, node_dns)
+                changed, removed = state.update(records)
+                if changed or removed:
+                    self.print_oper_changes(changed, removed, records)
+        except KeyboardInterrupt:
+            print()
 
     def print_ipgs(self):
         
@@ -980,7 +985,6 @@ class Apic(Cmd):
         print('LINK_AGG: {0}'.format(self.ipgs[target_ipg_name]['link_agg']))
         print('LACP: {0}'.format(self.ipgs[target_ipg_name]['lacp']))
         print('AEP: {0}'.format(self.ipgs[target_ipg_name]['aep']))
-        print
 
         print('* - flag indicates configured but not mapped to any EPG interfaces')
 
@@ -990,20 +994,15 @@ class Apic(Cmd):
         y.vertical_char = ' '
         y.junction_char = ' '
 
-        for key in sorted(self.idict):
-            policy_group = self.idict[key]['policy_group']
-            if policy_group == target_ipg_name:
-                flag = ''
-                node = self.idict[key]['node'].replace('node-', '')
-                intf_id = self.idict[key]['intf_id']
-                port_t = self.idict[key]['portT']
-                usage = self.idict[key]['usage']
-                oper_st = self.idict[key]['operSt']
-                oper_speed = self.idict[key]['operSpeed']
-                port_sr_name = self.idict[key]['port_sr_name']
-                if ('discovery' in usage) and (port_sr_name or policy_group):
-                    flag = '*'
-                y.add_row([flag, node, intf_id, port_t, usage, oper_st, oper_speed, port_sr_name, policy_group])
+        for key in table.select(self.idict, target_ipg_name, bool):
+            intf = self.idict[key]
+            flag = ''
+            node = intf['node'].replace('node-', '')
+            usage = intf['usage']
+            if ('discovery' in usage) and (intf['port_sr_name'] or intf['policy_group']):
+                flag = '*'
+            y.add_row([flag, node, intf['intf_id'], intf['portT'], usage, intf['operSt'], intf['operSpeed'],
+                       intf['port_sr_name'], intf['policy_group']])
         print(y)
 
 
@@ -1027,7 +1026,7 @@ class Apic(Cmd):
                     y.add_row([name, alloc, from_vlan, to_vlan, domains])
         print(y)
 
-        if self.epgs:
+        if self.epg_data:
             print('\n')
             y = PrettyTable(
                 ['TENANT', 'APP_PROFILE', 'EPG', 'TAGS', 'DOMAINS'])
@@ -1035,7 +1034,7 @@ class Apic(Cmd):
             y.vertical_char = ' '
             y.junction_char = ' '
 
-            for epg in self.epgs:
+            for epg in self.epg_data:
                 vlan_used = False
                 for path in epg['paths']:
                     if str(vlan) == path['encap']:
@@ -1051,8 +1050,8 @@ class Apic(Cmd):
                     y.add_row([tenant, ap_profile, epg_name, tags, domains])
         print(y)
        
-    def print_epgs(self):
-        for epg in self.epgs:
+    def print_epgs(self, with_health=False):
+        for epg in self.epg_data:
             print('\n')
             print('TN:', epg['tn'])
             print('AP:', epg['ap'])
@@ -1060,45 +1059,24 @@ class Apic(Cmd):
             print('TAG:', ','.join(epg['tags']))
             print('BD:', epg['bd'])
             print('DOMAINS:', ','.join(epg['domains']))
+            if with_health:
+                print('HEALTH:', health.format_score(epg['health']))
 
             y = PrettyTable(
                 ['NODE', 'INTERFACE', 'VLAN', 'TOPOLOGY', 'USAGE', 'STATE', 'SPEED', 'PORT_SR_NAME',
-                                  'POLICY_GROUP'])
+                                  'POLICY_GROUP'] + (['HEALTH'] if with_health else []))
             y.align = "l"
             y.vertical_char = ' '
             y.junction_char = ' '
 
             for path in epg['paths']:
-                if 'vpc' in path:
-                    for idx in self.idict:
-                        if (path['vpc'] == self.idict[idx]['policy_group']) and (self.idict[idx]['node'] in path['protpaths']):
-                            node = self.idict[idx]['node']
-                            intf_id = self.idict[idx]['intf_id']
-                            port_t = self.idict[idx]['portT']
-                            usage = self.idict[idx]['usage']
-                            oper_st = self.idict[idx]['operSt']
-                            oper_speed = self.idict[idx]['operSpeed']
-                            port_sr_name = self.idict[idx]['port_sr_name']
-                            policy_group = self.idict[idx]['policy_group']
-                            vlan = path['encap']
-                            y.add_row([node, intf_id, vlan, port_t, usage, oper_st, oper_speed, port_sr_name,
-                                       policy_group])
-
-                elif 'pc' in path:
-                    for idx in self.idict:
-                        if (path['pc'] == self.idict[idx]['policy_group']) and (self.idict[idx]['node'] == path['node']):
-                            node = self.idict[idx]['node']
-                            intf_id = self.idict[idx]['intf_id']
-                            port_t = self.idict[idx]['portT']
-                            usage = self.idict[idx]['usage']
-                            oper_st = self.idict[idx]['operSt']
-                            oper_speed = self.idict[idx]['operSpeed']
-                            port_sr_name = self.idict[idx]['port_sr_name']
-                            policy_group = self.idict[idx]['policy_group']
-                            vlan = path['encap']
-                            y.add_row([node, intf_id, vlan, port_t, usage, oper_st, oper_speed, port_sr_name,
-                                       policy_group])
-
+                if 'vpc' in path or 'pc' in path:
+                    for idx in self.path_keys(path):
+                        intf = self.idict[idx]
+                        vlan = path['encap']
+                        y.add_row([intf['node'], intf['intf_id'], vlan, intf['portT'], intf['usage'], intf['operSt'],
+                                   intf['operSpeed'], intf['port_sr_name'], intf['policy_group']] +
+                                  self.health_column(idx, with_health))
 
                 elif path['idx'] in self.idict:
                     key = path['idx']
@@ -1112,35 +1090,42 @@ class Apic(Cmd):
                     policy_group = self.idict[key]['policy_group']
                     vlan = path['encap']
                     y.add_row([node, intf_id, vlan, port_t, usage, oper_st, oper_speed, port_sr_name,
-                               policy_group])
+                               policy_group] + self.health_column(key, with_health))
 
             print(y)
 
-    def print_interface(self, target_node=''):
+    def health_column(self, key, with_health):
+        """Returns the HEALTH cell of an interface as a list, empty without with_health."""
+        return [health.format_score(self.interface_health.get(key))] if with_health else []
+
+    def print_interface(self, target_node='', with_health=False, with_neighbors=False):
         print('* - flag indicates configured but not mapped to any EPG interfaces')
 
         y = PrettyTable(["F", "NODE", "INTERFACE", "TOPOLOGY", "USAGE", "STATE", "SPEED", "PORT_SR_NAME",
-                         "POLICY_GROUP"])
+                         "POLICY_GROUP"] + (["HEALTH"] if with_health else []) +
+                        (["NEIGHBOR"] if with_neighbors else []))
         y.align = "l"
         y.vertical_char = ' '
         y.junction_char = ' '
 
-        for key in sorted(self.idict):
+        for key, intf in sorted(self.idict.items(), key=itemgetter(0)):
             flag = ''
-            node = self.idict[key]['node'].replace('node-', '')
+            node = intf['node'].replace('node-', '')
             if target_node:
                 if node != target_node:
                     continue
-            intf_id = self.idict[key]['intf_id']
-            port_t = self.idict[key]['portT']
-            usage = self.idict[key]['usage']
-            oper_st = self.idict[key]['operSt']
-            oper_speed = self.idict[key]['operSpeed']
-            port_sr_name = self.idict[key]['port_sr_name']
-            policy_group = self.idict[key]['policy_group']
+            intf_id = intf['intf_id']
+            port_t = intf['portT']
+            usage = intf['usage']
+            oper_st = intf['operSt']
+            oper_speed = intf['operSpeed']
+            port_sr_name = intf['port_sr_name']
+            policy_group = intf['policy_group']
             if ('discovery' in usage) and (port_sr_name or policy_group):
                 flag = '*'
-            y.add_row([flag, node, intf_id, port_t, usage, oper_st, oper_speed, port_sr_name, policy_group])
+            y.add_row([flag, node, intf_id, port_t, usage, oper_st, oper_speed, port_sr_name, policy_group] +
+                      self.health_column(key, with_health) +
+                      ([neighbors.format_neighbors(self.interface_neighbors.get(key))] if with_neighbors else []))
         print(y)
 
     def print_interface_details(self, key):
@@ -1173,7 +1158,7 @@ class Apic(Cmd):
         y.vertical_char = ' '
         y.junction_char = ' '
 
-        for epg in self.epgs:
+        for epg in self.epg_data:
             for path in epg['paths']:
                 if 'vpc' in path:
                     if (path['vpc'] == self.idict[key]['policy_group']) and (self.idict[key]['node'] in path['protpaths']):
@@ -1189,6 +1174,75 @@ class Apic(Cmd):
                     y.add_row([epg['tn'], epg['ap'], epg['epg_name'], epg['bd'], vlan])
         print((y))
 
+    def print_oper_changes(self, changed, removed, records):
+        print('{0} {1} interfaces changed'.format(datetime.datetime.now().strftime('%H:%M:%S'),
+                                                  len(changed) + len(removed)))
+
+        y = PrettyTable(["NODE", "INTERFACE", "STATE", "SPEED", "DUPLEX", "PORT_SR_NAME", "POLICY_GROUP"])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+
+        for key in sorted(changed):
+            intf = self.idict[key]
+            oper_st, oper_speed, oper_duplex = records[key]
+            y.add_row([intf['node'], intf['intf_id'], oper_st, oper_speed, oper_duplex, intf['port_sr_name'],
+                       intf['policy_group']])
+        # Interfaces no longer returned by ethpmPhysIf
+        for key in sorted(removed):
+            intf = self.idict[key]
+            y.add_row([intf['node'], intf['intf_id'], 'gone', '-', '-', intf['port_sr_name'], intf['policy_group']])
+        print(y)
+
+    def print_binding_changes(self, changes):
+        y = PrettyTable(['LINE', 'ACTION', 'TENANT', 'APP_PROFILE', 'EPG', 'PATH', 'VLAN', 'MODE', 'MESSAGE'])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+
+        for change in changes:
+            y.add_row([change.line, change.action, change.tenant, change.app_profile, change.epg, change.t_dn,
+                       change.encap, change.mode, change.message])
+        print(y)
+
+    def print_diagnostics(self):
+        limiters = getattr(self.client.session, 'limiters', {})
+        if not limiters:
+            print('No rate limited APIC connections')
+            return
+
+        y = PrettyTable(["APIC", "CONCURRENCY", "IN_FLIGHT", "QUEUED", "RATE", "LATENCY", "REQUESTS", "THROTTLED",
+                         "RETRIES"])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+
+        for address in sorted(limiters):
+            stats = limiters[address].diagnostics()
+            y.add_row([address, '{0}/{1}'.format(stats['concurrency'], stats['max_concurrency']), stats['in_flight'],
+                       stats['queued'], '{0:.1f}/s'.format(stats['rate']), '{0:.0f}ms'.format(stats['latency'] * 1000),
+                       stats['requests'], stats['throttled'], stats['retries']])
+        print(y)
+
+    def print_explain(self, queries):
+        y = PrettyTable(["ID", "SOURCE", "CLASS", "SCOPE", "FILTER", "SUBTREE", "REQUESTS", "OBJECTS", "SIZE"])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+
+        for query_id, query in enumerate(queries):
+            y.add_row([query_id, query['source'], query['class'], query['scope'], query['filter'] or '-',
+                       query['subtree'], query['requests'], query['count'] if query['source'] == SOURCE_APIC else '-',
+                       '{0:.1f}KB'.format(query['bytes'] / 1024.0)])
+        print(y)
+        for query_id, query in enumerate(queries):
+            print('{0:<4} {1}'.format(query_id, query['uri']))
+
+        sent = [query for query in queries if query['source'] == SOURCE_APIC]
+        print('{0} requests, about {1} objects and {2:.1f}KB from the APIC; {3} queries served from a plan'.format(
+            sum(query['requests'] for query in sent), sum(query['count'] for query in sent),
+            sum(query['bytes'] for query in sent) / 1024.0, len(queries) - len(sent)))
+
     def print_vlan_pool(self):
         y = PrettyTable(["NAME", "ALLOCATION", "FROM", "TO", "DOMAINS"])
         y.align = "l"
@@ -1204,19 +1258,323 @@ class Apic(Cmd):
             y.add_row([name, alloc, from_vlan, to_vlan, domains])
         print(y)
 
-    def print_snapshot(self):
-        self.collect_snapshots()
-        y = PrettyTable(["ID", "TRIGGER", "TIME", "DESCRIPTION" ])
+    def show_interface_stats(self, parameters):
+        target_node = ''
+        count = 0
+        try:
+            if parameters and parameters[0] in self.leafs:
+                target_node = parameters[0]
+                parameters = parameters[1:]
+            if parameters:
+                if len(parameters) != 2 or parameters[0] != 'top':
+                    raise ValueError
+                count = int(parameters[1])
+                if count < 1:
+                    raise ValueError
+        except ValueError:
+            print('Usage: show interface stats [<node>] [top <N>]')
+            return
+
+        # The pods and nodes are read once for the table and the counters
+        with self.client.planned(POD_QUERY, NODE_QUERY):
+            self.get_interface_data(target_node)
+            rates = self.client.get_interface_rates(self.idict, target_node)
+        if count:
+            ranked = stats.top(rates.values(), count)
+        else:
+            ranked = [rates[key] for key in sorted(rates)]
+        self.print_interface_stats(ranked)
+
+    def show_health(self, parameters):
+        try:
+            if len(parameters) != 2 or parameters[0] != 'worst' or int(parameters[1]) < 1:
+                raise ValueError
+        except ValueError:
+            print('Usage: show health worst <N>')
+            return
+        result = self.refresh_connection()
+        if result[0] == 1:
+            return
+
+        y = PrettyTable(["SCORE", "TYPE", "NAME", "DN"])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+        for score, (object_type, name, dn) in self.client.worst_health(int(parameters[1])):
+            y.add_row([score, object_type, name, dn])
+        print(y)
+
+    def show_neighbor(self, parameters):
+        if len(parameters) != 1:
+            print('Usage: show neighbor <name_pattern>')
+            return
+        result = self.refresh_connection()
+        if result[0] == 1:
+            return
+
+        # The table and index of the last neighbour command are reused until another table is read, the
+        # daemon reads them again as it does not keep neighbours current
+        if self.neighbor_index is None or self.client.fabric_cache is not None:
+            self.get_interface_data(with_neighbors=True)
+        found = self.neighbor_index.find(parameters[0])
+        if not found:
+            print('No LLDP or CDP neighbor matches', parameters[0])
+            return
+
+        y = PrettyTable(["NEIGHBOR", "PORT", "PROTOCOL", "MGMT_IP", "NODE", "INTERFACE", "STATE", "PORT_SR_NAME",
+                         "POLICY_GROUP"])
         y.align = "l"
         y.vertical_char = ' '
         y.junction_char = ' '
+        for neighbor in found:
+            intf = self.idict[neighbor.key]
+            y.add_row([neighbor.sys_name, neighbor.port_id, neighbor.protocol, neighbor.mgmt_ip, intf['node'],
+                       intf['intf_id'], intf['operSt'], intf['port_sr_name'], intf['policy_group']])
+        print(y)
 
+    def show_faults(self, parameters):
+        severity, node, since, summary = '', '', '', False
+        items = iter(parameters)
+        try:
+            for item in items:
+                if item in faults.SEVERITIES and not severity:
+                    severity = item
+                elif item.isdigit() and not node:
+                    node = item
+                elif item == 'since' and not since:
+                    since = next(items)
+                    faults.parse_since(since, newest='')
+                elif item == 'summary':
+                    summary = True
+                else:
+                    raise ValueError
+        except (StopIteration, ValueError):
+            print('Usage: show faults [<severity>] [<node>] [since <YYYY-MM-DD[THH:MM]> | since <N>m|h|d] [summary]')
+            return
 
-        snapshot_id = 0
+        result = self.refresh_connection()
+        if result[0] == 1:
+            return
+        index = faults.FaultIndex()
+        pages = self.client.iter_faults(severity, node, since)
+        header = ["SEVERITY", "CODE", "NODE", "AFFECTED", "LAST_CHANGE", "LIFECYCLE", "DESCRIPTION"]
+        self.print_stream(header, self.fault_rows(pages, index), summary)
+        self.print_fault_summary(index, 'faults', severities=True)
+
+    def show_events(self, parameters):
+        since, prefix, summary = '', '', False
+        items = iter(parameters)
+        try:
+            for item in items:
+                if item == 'since' and not since:
+                    since = next(items)
+                    faults.parse_since(since, newest='')
+                elif item == 'summary':
+                    summary = True
+                elif not prefix:
+                    prefix = item
+                else:
+                    raise ValueError
+        except (StopIteration, ValueError):
+            print('Usage: show events [since <YYYY-MM-DD[THH:MM]> | since <N>m|h|d] [<dn_prefix>] [summary]')
+            return
+
+        result = self.refresh_connection()
+        if result[0] == 1:
+            return
+        index = faults.FaultIndex()
+        pages = self.client.iter_events(since, prefix)
+        header = ["CREATED", "CODE", "CAUSE", "NODE", "AFFECTED", "DESCRIPTION"]
+        self.print_stream(header, self.event_rows(pages, index), summary)
+        self.print_fault_summary(index, 'events', severities=False)
+
+    def show_endpoint(self, parameters):
+        usage = 'Usage: show endpoint <mac> | <ip> | epg <epg_name> | interface <node> <interface> | table'
+        if not parameters:
+            print(usage)
+            return
+        result = self.refresh_connection()
+        if result[0] == 1:
+            return
 
-        for snapshot in self.snapshots:
+        if parameters == ['table']:
+            endpoint_table, fetched = self.client.load_endpoints()
+            print('{0} endpoints, {1} MACs, {2} IPs, {3} EPGs; {4} endpoints fetched'.format(
+                len(endpoint_table), len(endpoint_table.by_mac), len(endpoint_table.by_ip),
+                len(endpoint_table.by_epg), fetched))
+            return
+
+        if len(parameters) == 1 and (endpoints.normalize_mac(parameters[0]) or endpoints.normalize_ip(parameters[0])):
+            # Once the table is loaded it answers lookups after a delta refresh
+            if self.client.endpoint_table is not None:
+                found = self.client.load_endpoints()[0].lookup(parameters[0])
+            else:
+                found = self.client.lookup_endpoints(parameters[0])
+            self.print_endpoints(found)
+
+        elif len(parameters) == 2 and parameters[0] == 'epg':
+            endpoint_table = self.client.load_endpoints()[0]
+            found = []
+            for key in sorted(endpoint_table.by_epg):
+                if key[2] == parameters[1]:
+                    found.extend(endpoint_table.find(endpoint_table.by_epg, key))
+            self.print_endpoints(found)
+
+        elif len(parameters) == 3 and parameters[0] == 'interface' and parameters[1] in self.leafs:
+            node, port = parameters[1:]
+            with self.client.planned(*([] if self.have_interfaces() else ['interfaces'])):
+                if not self.have_interfaces():
+                    self.get_interface_data()
+            idx = dn_parser.parse('node-{0}/phys-[eth{1}]'.format(node, port)).key
+            if idx not in self.idict:
+                print('ERROR: Interface is not present on the Node or not a LEAF port', node)
+                return
+            endpoint_table = self.client.load_endpoints()[0]
+            found = endpoint_table.find(endpoint_table.by_path, idx)
+            # Endpoints on the PC or vPC the interface is a member of
+            for endpoint in endpoint_table.find(endpoint_table.by_path, self.idict[idx]['policy_group']):
+                paths = [self.client.parse_path({'tDn': t_dn, 'encap': ''}) for t_dn in endpoint.paths]
+                if any(idx in self.path_keys(path) for path in paths):
+                    found.append(endpoint)
+            self.print_endpoints(found)
+
+        else:
+            print(usage)
+
+    def print_endpoints(self, found):
+        """Prints endpoints with a row per interface of their paths, joined with the interface table."""
+        if not found:
+            print('No endpoints found')
+            return
+        idict = self.idict
+        if not idict:
+            # Only the leaf of the endpoints is collected if there is a single one
+            nodes = set()
+            for endpoint in found:
+                for t_dn in endpoint.paths:
+                    path = dn_parser.parse(t_dn)
+                    nodes.update(path.protpaths.split('-') if path.protpaths else [path.node])
+            idict = self.client.interface_table(nodes.pop() if len(nodes) == 1 else '')
+
+        y = PrettyTable(["MAC", "IP", "TENANT", "AP", "EPG", "VLAN", "NODE", "INTERFACE", "STATE", "PORT_SR_NAME",
+                         "POLICY_GROUP"])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+
+        for endpoint in found:
+            ips = ','.join(endpoint.ips) or '-'
+            columns = [endpoint.mac, ips, endpoint.tenant, endpoint.app_profile, endpoint.epg, endpoint.encap]
+            rows = 0
+            for t_dn in endpoint.paths:
+                path = self.client.parse_path({'tDn': t_dn, 'encap': ''})
+                for key in self.path_keys(path, idict) if path else []:
+                    intf = idict[key]
+                    y.add_row(columns + [intf['node'], intf['intf_id'], intf['operSt'], intf['port_sr_name'],
+                                         intf['policy_group']])
+                    rows += 1
+            if not rows:
+                y.add_row(columns + ['-', '-', '-', '-', '-'])
+        print(y)
+
+    @staticmethod
+    def fault_rows(pages, index):
+        """Yields the table rows of each page of faults, adding the faults to index."""
+        for page in pages:
+            rows = []
+            for fault in page:
+                affected = fault['dn'].rpartition('/fault-')[0]
+                index.add(affected, fault['severity'])
+                node, affected = affected_columns(affected)
+                rows.append([fault['severity'], fault['code'], node, affected, fault['lastTransition'][:19],
+                             fault['lc'], fault['descr']])
+            yield rows
+
+    @staticmethod
+    def event_rows(pages, index):
+        """Yields the table rows of each page of events, adding the events to index."""
+        for page in pages:
+            rows = []
+            for event in page:
+                index.add(event['affected'], event['severity'])
+                node, affected = affected_columns(event['affected'])
+                rows.append([event['created'][:19], event['code'], event['cause'], node, affected, event['descr']])
+            yield rows
+
+    def print_stream(self, header, pages, summary=False):
+        """
+        Prints the rows of each page as it arrives, in the layout of the PrettyTable tables.
+
+        Column widths come from the first page, longer values on later pages are not cut.
+        With summary set the rows are only consumed.
+        """
+        widths = None
+        for rows in pages:
+            if summary or not rows:
+                continue
+            if widths is None:
+                widths = [max([len(str(name))] + [len(str(row[column])) for row in rows])
+                          for column, name in enumerate(header)]
+                print(' ' + ' '.join('-' * (width + 2) for width in widths) + ' ')
+                print(stream_line(header, widths))
+                print(' ' + ' '.join('-' * (width + 2) for width in widths) + ' ')
+            for row in rows:
+                print(stream_line(row, widths))
+            sys.stdout.flush()
+        if widths is not None:
+            print(' ' + ' '.join('-' * (width + 2) for width in widths) + ' ')
+
+    def print_interface_stats(self, ranked):
+        y = PrettyTable(["NODE", "INTERFACE", "STATE", "SPEED", "RX_BPS", "TX_BPS", "RX_PPS", "TX_PPS", "UTIL",
+                         "PORT_SR_NAME", "POLICY_GROUP"])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+
+        for rate in ranked:
+            intf = self.idict[rate.key]
+            util = '-' if rate.util is None else '{0:.1f}%'.format(rate.util)
+            y.add_row([intf['node'], intf['intf_id'], intf['operSt'], intf['operSpeed'], stats.format_rate(rate.rx_bps),
+                       stats.format_rate(rate.tx_bps), stats.format_rate(rate.rx_pps),
+                       stats.format_rate(rate.tx_pps), util, intf['port_sr_name'], intf['policy_group']])
+        print(y)
+
+    def print_fault_summary(self, index, name, severities):
+        print('{0} {1}'.format(index.records, name))
+        if not index.records:
+            return
+        if severities:
+            y = PrettyTable(["NODE", "TOTAL"] + [severity.upper() for severity in faults.SEVERITIES])
+        else:
+            y = PrettyTable(["NODE", name.upper()])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+        for row in index.node_rows():
+            y.add_row(list(row) if severities else list(row[:2]))
+        print(y)
+
+        top = index.top_interfaces()
+        if top:
+            y = PrettyTable(["NODE", "INTERFACE", name.upper()])
+            y.align = "l"
+            y.vertical_char = ' '
+            y.junction_char = ' '
+            for (node, interface), count in top:
+                y.add_row([node, interface, count])
+            print(y)
+
+    def print_snapshot(self, last=0, since=''):
+        snapshots = self.collect_snapshots(last, since)
+        y = PrettyTable(["ID", "TRIGGER", "TIME", "DESCRIPTION" ])
+        y.align = "l"
+        y.vertical_char = ' '
+        y.junction_char = ' '
+
+
+        for snapshot in reversed(snapshots):
             trigger = ''
-            dn = snapshot['configSnapshot']['attributes']['dn']
+            dn = snapshot['dn']
             if 'OneTime' in dn:
                 trigger = 'OneTime'
             elif 'DailyAuto' in dn:
@@ -1224,20 +1582,159 @@ class Apic(Cmd):
             elif 'defaultAuto' in dn:
                 trigger = 'defaultAuto'
 
-            snapshot_time = snapshot['configSnapshot']['attributes']['createTime']
-            descr = snapshot['configSnapshot']['attributes']['descr']
-            y.add_row([snapshot_id, trigger, snapshot_time, descr])
-            snapshot_id += 1
+            snapshot_time = snapshot['createTime']
+            descr = snapshot['descr']
+            y.add_row([self.client.snapshot_ids[dn], trigger, snapshot_time, descr])
 
         print(y)
- 
+
+
+def affected_columns(affected):
+    """Returns (node, DN below the node) of the DN a fault or event is raised on, ('-', DN) outside nodes."""
+    match = NODE_DN.match(affected)
+    if not match:
+        return '-', affected
+    return match.group(1), affected[match.end():] or '-'
+
+
+def stream_line(row, widths):
+    return ' ' + ' '.join(' ' + str(value).ljust(width) + ' ' for value, width in zip(row, widths)) + ' '
+
+
+def create_shell(cli_args):
+    """Returns an Apic shell set up from the command line options."""
+    apic = Apic()
+    apic.prompt = 'ACLI()>'
+    apic.client.workers = cli_args.workers
+    apic.client.page_parallelism = cli_args.page_parallelism
+    apic.client.shard_by = cli_args.shard_by
+    apic.client.shard_timeout = cli_args.shard_timeout
+    apic.client.columnar = cli_args.columnar
+    limits = {'max_concurrency': cli_args.max_requests, 'query_rate': cli_args.rate,
+              'login_rate': cli_args.login_rate}
+    if cli_args.transport == 'asyncio':
+        apic.client.session = aio.AsyncSession(limit=limits.pop('max_concurrency'), **limits)
+    else:
+        apic.client.session = ratelimit.RateLimitedSession(requests.Session(), **limits)
+    return apic
+
+
+def run_daemon(cli_args):
+    """Serves show commands to 'acli3.py --client' processes until Ctrl-C."""
+
+    def login_shell(fabric):
+        apic = create_shell(cli_args)
+        if cli_args.offline:
+            apic.open_archive(cli_args.offline)
+            return apic
+        if fabric not in FABRICS:
+            raise daemon.DaemonError('unknown fabric {0}'.format(fabric))
+        if not all(item['username'] and item['password'] for item in FABRICS[fabric]):
+            raise daemon.DaemonError('the daemon needs the credentials of {0} in config.yml'.format(fabric))
+        apic.do_login(fabric)
+        if not apic.can_connect:
+            raise daemon.DaemonError('cannot connect to APIC in {0}'.format(fabric))
+        return apic
+
+    try:
+        server = daemon.AcliDaemon(login_shell, cli_args.socket, cli_args.refresh)
+    except daemon.DaemonError as error:
+        sys.exit('ERROR: {0}'.format(error))
+    print('ACLI daemon listening on {0}, Ctrl-C to stop'.format(cli_args.socket))
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        print('\nINFO: ACLI daemon stopped')
+    for state in server.fabrics.values():
+        if state.shell is not None:
+            state.shell.disconnect()
+
+
+def read_commands(prompt):
+    """Yields the commands typed at the prompt until quit, exit, Ctrl-D or Ctrl-C."""
+    while True:
+        try:
+            command = input(prompt).strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if command in ('quit', 'exit'):
+            return
+        if command:
+            yield command
+
+
+def run_client(cli_args):
+    """Runs the command line, or each command read from the prompt, on the daemon."""
+    try:
+        client = daemon.DaemonClient(cli_args.socket)
+    except OSError as error:
+        sys.exit('ERROR: no ACLI daemon on {0}: {1}'.format(cli_args.socket, error))
+    if cli_args.command:
+        commands = [' '.join(cli_args.command)]
+    else:
+        commands = read_commands('ACLI({0})>'.format(cli_args.client))
+    with client:
+        for command in commands:
+            try:
+                reply = client.request(cli_args.client, command)
+            except daemon.DaemonError as error:
+                print('ERROR:', str(error))
+                continue
+            print(reply['output'], end='')
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Command line shell for Cisco ACI APIC')
+    parser.add_argument('--offline', metavar='FILE', help='serve all commands from a fabric archive')
+    parser.add_argument('--daemon', action='store_true', help='serve show commands to --client processes')
+    parser.add_argument('--client', metavar='FABRIC', help='run commands on the fabric through the daemon')
+    parser.add_argument('--socket', default=daemon.DEFAULT_SOCKET,
+                        help='Unix socket of the daemon, default {0}'.format(daemon.DEFAULT_SOCKET))
+    parser.add_argument('--refresh', type=float, default=daemon.REFRESH_INTERVAL,
+                        help='seconds between refreshes of the daemon cache, default {0:g}'.format(
+                            daemon.REFRESH_INTERVAL))
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes used to parse large interface responses, default 1')
+    parser.add_argument('--page-parallelism', type=int, default=PAGE_PARALLELISM,
+                        help='pages of a large class query fetched at once, default {0}'.format(PAGE_PARALLELISM))
+    parser.add_argument('--shard-by', choices=SHARD_STRATEGIES, default='class',
+                        help="query l1PhysIf and ethpmPhysIf fabric wide ('class') or per leaf ('node')")
+    parser.add_argument('--shard-timeout', type=float, default=SHARD_TIMEOUT,
+                        help='seconds to wait for the slowest leaf, default {0:g}'.format(SHARD_TIMEOUT))
+    parser.add_argument('--columnar', action='store_true',
+                        help='keep the interface table in NumPy columns instead of a dict')
+    parser.add_argument('--transport', choices=['requests', 'asyncio'], default='requests',
+                        help='HTTP client used for APIC queries, asyncio requires aiohttp')
+    parser.add_argument('--max-requests', type=int, default=ratelimit.MAX_CONCURRENCY,
+                        help='concurrent requests per APIC, default {0}'.format(ratelimit.MAX_CONCURRENCY))
+    parser.add_argument('--rate', type=float, default=ratelimit.QUERY_RATE,
+                        help='queries per second per APIC, default {0:g}'.format(ratelimit.QUERY_RATE))
+    parser.add_argument('--login-rate', type=float, default=ratelimit.LOGIN_RATE,
+                        help='logins and token refreshes per second per APIC, default {0:g}'.format(
+                            ratelimit.LOGIN_RATE))
+    parser.add_argument('command', nargs='*', help='with --client, command to run instead of a prompt')
+    cli_args = parser.parse_args()
+    if cli_args.daemon and cli_args.client:
+        parser.error('--daemon and --client are exclusive')
+    if cli_args.transport == 'asyncio' and not aio.HAVE_AIOHTTP:
+        parser.error('--transport asyncio requires aiohttp')
+    if cli_args.columnar and not table.HAVE_NUMPY:
+        parser.error('--columnar requires NumPy')
+
     requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
     requests.packages.urllib3.disable_warnings(InsecurePlatformWarning)
     requests.packages.urllib3.disable_warnings(SNIMissingWarning)
+    if cli_args.client:
+        run_client(cli_args)
+        sys.exit()
+    if cli_args.daemon:
+        run_daemon(cli_args)
+        sys.exit()
     try:
-        apic = Apic()
-        apic.prompt = 'ACLI()>'
+        apic = create_shell(cli_args)
+        if cli_args.offline:
+            apic.open_archive(cli_args.offline)
         apic.cmdloop('Starting ACLI...')
     except KeyboardInterrupt:
         print("\nINFO: ACLI Shell was interrupted by Ctrl-C")
@@ -0,0 +1,6 @@
+"""
+Support library for the ACLI shell.
+
+Modules in this package do not depend on the Cmd shell in acli3.py and can be
+imported on their own.
+"""
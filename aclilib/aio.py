@@ -0,0 +1,232 @@
+"""
+asyncio transport for APIC queries.
+
+AsyncApic is an aiohttp client for one controller: login, refresh, class and
+mo queries with paging, and posts. Requests wait on the controller's
+aclilib.ratelimit limiter, which allows at most `limit` requests in flight
+and adapts to latency and throttling responses.
+
+AsyncSession runs the clients on an event loop in a background thread and
+has the get/post/close interface of requests.Session used by the shell, so
+the Cmd loop and the collectors stay synchronous. get_many() sends a batch
+of GETs concurrently.
+
+aiohttp is optional, HAVE_AIOHTTP is False when it is not installed.
+"""
+import asyncio
+import atexit
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from aclilib import ratelimit
+from aclilib.client import ApicError
+
+HAVE_AIOHTTP = aiohttp is not None
+
+# Requests in flight per controller
+DEFAULT_LIMIT = ratelimit.MAX_CONCURRENCY
+PAGE_SIZE = 10000
+
+
+def status_error(response):
+    """Returns the ApicError of a response with an error status."""
+    return ApicError('APIC returned {0}: {1}'.format(response.status_code, response.text))
+
+
+class AsyncResponse(object):
+    """Status, body and cookies of a response, read as from a requests.Response."""
+
+    def __init__(self, status_code, content, cookies=None, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.cookies = cookies or {}
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncApic(object):
+    def __init__(self, address, limit=DEFAULT_LIMIT, scheme='https', **limits):
+        self.base = '{0}://{1}'.format(scheme, address)
+        self.limit = limit
+        self.limiter = ratelimit.ControllerLimiter(address, max_concurrency=limit, **limits)
+        self.cookies = {}
+        self.headers = {'content-type': 'application/json', 'cache-control': 'no-cache'}
+        self.session = None
+        self.condition = None
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(ssl=False, limit=self.limit)
+            self.session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+            self.condition = asyncio.Condition()
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method, path, data=None, headers=None, cookies=None):
+        """Sends one request, path is relative to the controller, e.g. '/api/class/fvTenant.json'."""
+        await self.open()
+        if cookies is None:
+            cookies = self.cookies
+        kind = ratelimit.request_kind(path)
+        for attempt in range(ratelimit.MAX_RETRIES + 1):
+            await self.acquire(kind)
+            start = time.monotonic()
+            status_code = 0
+            try:
+                response = await self.send(method, path, data, headers or self.headers, cookies)
+                status_code = response.status_code
+            finally:
+                await self.release(time.monotonic() - start, status_code)
+
+            if not ratelimit.retryable(method, status_code) or attempt == ratelimit.MAX_RETRIES:
+                return response
+            self.limiter.retries += 1
+            await asyncio.sleep(ratelimit.retry_delay(response.headers, attempt))
+
+    async def send(self, method, path, data, headers, cookies):
+        async with self.session.request(method, self.base + path, data=data, headers=headers,
+                                        cookies=cookies) as response:
+            content = await response.read()
+            return AsyncResponse(response.status, content,
+                                 {name: morsel.value for name, morsel in response.cookies.items()},
+                                 dict(response.headers))
+
+    async def acquire(self, kind):
+        """Waits for a token of the kind bucket and a free slot in the concurrency window."""
+        limiter = self.limiter
+        limiter.queued += 1
+        try:
+            delay = limiter.reserve(kind)
+            if delay:
+                await asyncio.sleep(delay)
+            async with self.condition:
+                await self.condition.wait_for(limiter.can_start)
+                limiter.started()
+        finally:
+            limiter.queued -= 1
+
+    async def release(self, latency, status_code):
+        async with self.condition:
+            self.limiter.finished(latency, status_code)
+            self.condition.notify_all()
+
+    async def login(self, username, password):
+        payload = {'aaaUser': {'attributes': {'name': username, 'pwd': password}}}
+        response = await self.request('POST', '/api/aaaLogin.json', data=json.dumps(payload), cookies={})
+        if response.status_code != 200:
+            raise status_error(response)
+        self.cookies = {'APIC-cookie': response.cookies['APIC-cookie']}
+        return response
+
+    async def refresh(self):
+        response = await self.request('GET', '/api/aaaRefresh.json')
+        if response.status_code != 200:
+            raise status_error(response)
+        if 'APIC-cookie' in response.cookies:
+            self.cookies = {'APIC-cookie': response.cookies['APIC-cookie']}
+        return response
+
+    async def get(self, path):
+        """Returns the decoded body of a GET, raises ApicError on an error status."""
+        response = await self.request('GET', path)
+        if response.status_code != 200:
+            raise status_error(response)
+        return response.json()
+
+    async def query(self, path):
+        """Returns the imdata of a class or mo query."""
+        return (await self.get(path))['imdata']
+
+    async def iter_pages(self, path, page_size=PAGE_SIZE):
+        """Yields the objects of a query page by page."""
+        separator = '&' if '?' in path else '?'
+        page = 0
+        while True:
+            body = await self.get('{0}{1}page={2}&page-size={3}'.format(path, separator, page, page_size))
+            for mo in body['imdata']:
+                yield mo
+            page += 1
+            if page * page_size >= int(body['totalCount']):
+                break
+
+    async def post(self, path, payload):
+        response = await self.request('POST', path, data=json.dumps(payload))
+        if response.status_code != 200:
+            raise status_error(response)
+        return response.json()
+
+
+class AsyncSession(object):
+    """requests.Session like facade over AsyncApic clients, one per controller."""
+
+    def __init__(self, limit=DEFAULT_LIMIT, **limits):
+        if not HAVE_AIOHTTP:
+            raise RuntimeError('the asyncio transport requires aiohttp')
+        self.limit = limit
+        self.limits = limits
+        self.clients = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='acli-asyncio', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self, coroutine):
+        """Runs a coroutine on the session loop and waits for its result, Ctrl-C cancels it."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+
+    def client(self, uri):
+        url = urlsplit(uri)
+        if url.netloc not in self.clients:
+            self.clients[url.netloc] = AsyncApic(url.netloc, self.limit, url.scheme, **self.limits)
+        path = uri[len(url.scheme) + 3 + len(url.netloc):]
+        return self.clients[url.netloc], path
+
+    @property
+    def limiters(self):
+        return {netloc: client.limiter for netloc, client in self.clients.items()}
+
+    def get(self, uri, headers=None, cookies=None, **kwargs):
+        client, path = self.client(uri)
+        return self.run(client.request('GET', path, headers=headers, cookies=cookies))
+
+    def post(self, uri, data=None, headers=None, cookies=None, **kwargs):
+        client, path = self.client(uri)
+        return self.run(client.request('POST', path, data=data, headers=headers, cookies=cookies))
+
+    def get_many(self, uris, headers=None, cookies=None):
+        """Sends GETs for all uris concurrently, returns the responses in the order of uris."""
+        requests = []
+        for uri in uris:
+            client, path = self.client(uri)
+            requests.append(client.request('GET', path, headers=headers, cookies=cookies))
+        return self.run(self._gather(requests))
+
+    async def _gather(self, requests):
+        return await asyncio.gather(*requests)
+
+    def close(self):
+        clients = list(self.clients.values())
+        self.clients = {}
+        self.run(self._gather([client.close() for client in clients]))
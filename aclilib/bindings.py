@@ -0,0 +1,182 @@
+"""
+Bulk static path bindings from CSV.
+
+Rows have the columns of 'export bindings' (tenant, app_profile, epg,
+path_type, node, interface, policy_group, encap, mode; bd is ignored), so an
+export can be edited and imported again. mode (regular, native or untagged)
+is optional: without it a binding keeps its current mode, new bindings are
+regular.
+
+plan() validates every row against the interface table, policy groups, VLAN
+pools and EPGs collected by the shell and compares it with the existing
+bindings. payload() turns the changes into one polUni payload with a subtree
+per tenant, which the APIC applies in a single transaction. chunks() splits
+batches of more than CHUNK_SIZE bindings into several payloads, each its
+own transaction.
+"""
+import csv
+from collections import namedtuple
+
+from aclilib import dn
+
+# Bindings posted in one request
+CHUNK_SIZE = 1000
+
+PATH_TYPES = ('port', 'pc', 'vpc')
+MODES = ('regular', 'native', 'untagged')
+REQUIRED_COLUMNS = ('tenant', 'app_profile', 'epg', 'path_type', 'node', 'encap')
+# Identity of a binding, the columns of a row besides encap and mode
+IDENTITY_COLUMNS = ('tenant', 'app_profile', 'epg', 'path_type', 'node', 'interface', 'policy_group')
+
+ADD = 'add'
+MODIFY = 'modify'
+UNCHANGED = 'unchanged'
+ERROR = 'error'
+DEPLOY_ACTIONS = (ADD, MODIFY)
+
+Change = namedtuple('Change', ['line', 'action', 'tenant', 'app_profile', 'epg', 't_dn', 'encap', 'mode', 'message'])
+
+
+class BindingError(Exception):
+    pass
+
+
+def read_csv(path):
+    """Returns the rows of a bindings CSV as (line number, row dict), raises BindingError on missing columns."""
+    with open(path, newline='') as fh:
+        reader = csv.DictReader(fh)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise BindingError('missing columns {0} in {1}'.format(', '.join(missing), path))
+        rows = []
+        for row in reader:
+            rows.append((reader.line_num, {key: (value or '').strip() for key, value in row.items() if key}))
+        return rows
+
+
+def identity(row):
+    """Returns the identity of a row or an export row dict, pc and vpc rows have no interface."""
+    row = dict(row)
+    if row['path_type'] == 'port':
+        row['policy_group'] = ''
+    else:
+        row['interface'] = ''
+    return tuple(row.get(column, '') for column in IDENTITY_COLUMNS)
+
+
+def path_dn(row, pods):
+    """Returns the fvRsPathAtt tDn of a row, pods maps node ids to their pod id."""
+    node = row['node']
+    pod = pods[node.split('-')[0]]
+    if row['path_type'] == 'vpc':
+        return 'topology/pod-{0}/protpaths-{1}/pathep-[{2}]'.format(pod, node, row['policy_group'])
+    if row['path_type'] == 'pc':
+        return 'topology/pod-{0}/paths-{1}/pathep-[{2}]'.format(pod, node, row['policy_group'])
+    parts = row['interface'].split('/')
+    if len(parts) == 3 and int(parts[0]) >= dn.MIN_FEX_ID:
+        return 'topology/pod-{0}/paths-{1}/extpaths-{2}/pathep-[eth{3}/{4}]'.format(pod, node, *parts)
+    return 'topology/pod-{0}/paths-{1}/pathep-[eth{2}]'.format(pod, node, row['interface'])
+
+
+def check_row(row, interfaces, ipgs, vlan_pools, epgs, pods):
+    """Returns the error message of a row, '' if it is valid."""
+    if row['path_type'] not in PATH_TYPES:
+        return 'path_type must be one of {0}'.format(', '.join(PATH_TYPES))
+    if row.get('mode', 'regular') not in MODES:
+        return 'mode must be one of {0}'.format(', '.join(MODES))
+    epg = (row['tenant'], row['app_profile'], row['epg'])
+    if epg not in epgs:
+        return 'EPG {0} not found'.format('/'.join(epg))
+
+    nodes = row['node'].split('-')
+    if len(nodes) != (2 if row['path_type'] == 'vpc' else 1):
+        return 'node must be {0} for a {1} path'.format('<node>-<node>' if row['path_type'] == 'vpc' else '<node>',
+                                                        row['path_type'])
+    for node in nodes:
+        if node not in pods:
+            return 'node {0} not found'.format(node)
+    if row['path_type'] == 'port':
+        if (row['node'], row.get('interface', '')) not in interfaces:
+            return 'interface {0} not found on node {1}'.format(row.get('interface', ''), row['node'])
+    else:
+        ipg = ipgs.get(row.get('policy_group', ''))
+        if not ipg:
+            return 'policy group {0!r} not found'.format(row.get('policy_group', ''))
+        if ipg['link_agg'] != row['path_type']:
+            return 'policy group {0} is not a {1} policy group'.format(row['policy_group'], row['path_type'])
+
+    encap = row['encap'].replace('vlan-', '')
+    if not encap.isdigit() or not 1 <= int(encap) <= 4094:
+        return 'encap must be a VLAN id 1-4094'
+    domains = set(epgs[epg])
+    for pool in vlan_pools:
+        if pool['from_vlan'] <= int(encap) <= pool['to_vlan'] and domains.intersection(pool['domains']):
+            return ''
+    return 'VLAN {0} is not in a pool of the EPG domains'.format(encap)
+
+
+def plan(rows, interfaces, ipgs, vlan_pools, epgs, existing, pods):
+    """
+    Returns a Change per row of read_csv().
+
+    interfaces is a set of (node, interface), ipgs and vlan_pools as collected by the client,
+    epgs maps (tenant, app_profile, epg) to the EPG domains, existing maps the identity of
+    the current bindings to their (encap, mode) and pods node ids to pod ids.
+    """
+    changes = []
+    seen = {}
+    for line, row in rows:
+        row.setdefault('interface', '')
+        row.setdefault('policy_group', '')
+        key = identity(row)
+        mode = row.get('mode') or (existing[key][1] if key in existing else 'regular')
+        row['mode'] = mode
+        encap = row['encap'].replace('vlan-', '')
+        message = check_row(row, interfaces, ipgs, vlan_pools, epgs, pods)
+        if not message and key in seen:
+            message = 'duplicate of line {0}'.format(seen[key])
+        seen.setdefault(key, line)
+
+        t_dn = '' if message else path_dn(row, pods)
+        if message:
+            action = ERROR
+        elif key not in existing:
+            action = ADD
+        elif existing[key] == (encap, mode):
+            action = UNCHANGED
+        else:
+            action = MODIFY
+            message = ', '.join('{0} {1} -> {2}'.format(name, old, new) for name, old, new in
+                                zip(('encap', 'mode'), existing[key], (encap, mode)) if old != new)
+        changes.append(Change(line, action, row['tenant'], row['app_profile'], row['epg'], t_dn, encap, mode, message))
+    return changes
+
+
+def payload(changes):
+    """Returns the polUni payload of the add and modify changes, one fvTenant subtree per tenant."""
+    tenants = {}
+    for change in changes:
+        if change.action not in DEPLOY_ACTIONS:
+            continue
+        path_att = {'fvRsPathAtt': {'attributes': {'tDn': change.t_dn, 'encap': 'vlan-' + change.encap,
+                                                   'mode': change.mode}}}
+        aps = tenants.setdefault(change.tenant, {})
+        aps.setdefault(change.app_profile, {}).setdefault(change.epg, []).append(path_att)
+
+    tenant_mos = []
+    for tenant, aps in tenants.items():
+        ap_mos = []
+        for ap, epgs in aps.items():
+            epg_mos = [{'fvAEPg': {'attributes': {'name': epg, 'status': 'modified'}, 'children': paths}}
+                       for epg, paths in epgs.items()]
+            ap_mos.append({'fvAp': {'attributes': {'name': ap, 'status': 'modified'}, 'children': epg_mos}})
+        tenant_mos.append({'fvTenant': {'attributes': {'name': tenant, 'status': 'modified'}, 'children': ap_mos}})
+    return {'polUni': {'attributes': {}, 'children': tenant_mos}}
+
+
+def chunks(changes, size=CHUNK_SIZE):
+    """Yields the add and modify changes in lists of at most size, grouped by tenant, app profile and EPG."""
+    deploy = sorted((change for change in changes if change.action in DEPLOY_ACTIONS),
+                    key=lambda change: (change.tenant, change.app_profile, change.epg, change.line))
+    for start in range(0, len(deploy), size):
+        yield deploy[start:start + size]
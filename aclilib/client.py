@@ -0,0 +1,1230 @@
+"""
+APIC query client, usable without the ACLI shell.
+
+ApicClient logs in to one APIC and collects the fabric state the shell shows:
+interfaces with their access policies and state, EPGs with their static
+bindings, policy groups and VLAN pools. Queries are paged, optionally fetched
+in parallel and sharded per leaf, and every request passes the per-APIC rate
+limiter of aclilib.ratelimit. A query that fails raises ApicError rather than
+returning partial data.
+
+interfaces(), epgs() and bindings() yield Interface, Epg and Binding records.
+The lookup_ methods answer many lookups with one set of queries, e.g.
+lookup_bindings(['100', '200']) fetches the EPGs once for all VLANs. Code
+that needs several datasets declares them with planned(), which merges and
+prefetches their queries concurrently (see aclilib.planner).
+
+    client = ApicClient('apic1.example.com', 'admin', 'password')
+    if client.login()['rc'] == 0:
+        for intf in client.interfaces(node='101'):
+            print(intf.interface, intf.state)
+"""
+import datetime
+import json
+import re
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+
+import requests
+
+from aclilib import bindings
+from aclilib import dn as dn_parser
+from aclilib import encap
+from aclilib import endpoints
+from aclilib import export
+from aclilib import health
+from aclilib import faults
+from aclilib import neighbors
+from aclilib import parallel
+from aclilib import planner
+from aclilib import ratelimit
+from aclilib import stats
+from aclilib import table
+
+# Objects requested per page by iter_query
+PAGE_SIZE = 10000
+# Pages of a class query requested at once after the first page
+PAGE_PARALLELISM = 4
+# Per-leaf classes are queried fabric wide ('class') or per leaf node ('node')
+SHARD_STRATEGIES = ['class', 'node']
+# Leaf nodes queried at once and seconds to wait for the slowest before going on without it
+SHARD_PARALLELISM = 8
+SHARD_TIMEOUT = 120.0
+# Class of a class query URI, e.g. 'l1PhysIf' of /api/node/class/topology/pod-1/node-101/l1PhysIf.json
+QUERY_CLASS = re.compile(r'/api/(?:node/)?class/(?:[^?]*/)?(\w+)\.json')
+TOTAL_COUNT = re.compile(br'"totalCount"\s*:\s*"(\d+)"')
+# configSnapshot queries are sorted newest first by the APIC
+SNAPSHOT_ORDER = 'configSnapshot.createTime|desc'
+# Objects per page of changed(), the changes of a refresh usually fit in the first page
+CHANGED_PAGE_SIZE = 100
+
+# Subtree of uni/infra switch, interface and FEX profiles used to map policy groups to interfaces
+ACCESS_POLICY_CLASSES = ['infraRtAccPortP', 'infraHPortS', 'infraPortBlk', 'infraSubPortBlk', 'infraRsAccBaseGrp',
+                         'infraFexBndlGrp', 'infraRtAccBaseGrp', 'infraLeafS', 'infraNodeBlk']
+# Merged queries of a plan run at once
+PLAN_PARALLELISM = 6
+
+# Queries of the collectors
+EPG_QUERY = planner.Query('class/fvAEPg', subtree='children',
+                          subtree_classes=('fvRsPathAtt', 'fvRsDomAtt', 'fvRsBd', 'tagInst'))
+EPG_NAME_QUERY = planner.Query('class/fvAEPg')
+POD_QUERY = planner.Query('class/fabricPod')
+NODE_QUERY = planner.Query('class/fabricNode')
+NODE_BLOCK_QUERY = planner.Query('class/infraNodeBlk')
+ACCESS_POLICY_QUERY = planner.Query('mo/uni/infra', target='children',
+                                    target_classes=('infraAccPortP', 'infraFexP', 'infraNodeP'), subtree='full',
+                                    subtree_classes=tuple(ACCESS_POLICY_CLASSES))
+PORT_GROUP_QUERY = planner.Query('class/infraAccPortGrp', subtree='children')
+BUNDLE_GROUP_QUERY = planner.Query('class/infraAccBndlGrp', subtree='children')
+PORT_GROUP_NAME_QUERY = planner.Query('class/infraAccPortGrp')
+BUNDLE_GROUP_NAME_QUERY = planner.Query('class/infraAccBndlGrp')
+VLAN_POOL_QUERY = planner.Query('class/fvnsVlanInstP', subtree='children')
+AEP_QUERY = planner.Query('class/infraAttEntityP', subtree='children', subtree_classes=('infraRsDomP', ))
+ENDPOINT_QUERY = planner.Query('class/fvCEp', subtree='children', subtree_classes=endpoints.ENDPOINT_CHILDREN)
+# (class, parse function, query parameters) of the LLDP and CDP adjacencies, read per leaf like l1PhysIf
+NEIGHBOR_CLASSES = (('lldpAdjEp', parallel.parse_lldp_adj_ep, ''),
+                    ('cdpAdjEp', parallel.parse_cdp_adj_ep, 'rsp-subtree=children&rsp-subtree-class=cdpMgmtAddr'))
+
+# Queries each dataset is collected from, l1PhysIf and ethpmPhysIf are streamed per leaf outside plans
+DATASETS = {
+    'epgs': (EPG_QUERY, ),
+    'epg_names': (EPG_NAME_QUERY, ),
+    'nodes': (NODE_QUERY, ),
+    'leafs': (NODE_QUERY, NODE_BLOCK_QUERY),
+    'interfaces': (ACCESS_POLICY_QUERY, POD_QUERY, NODE_QUERY),
+    'ipgs': (PORT_GROUP_QUERY, BUNDLE_GROUP_QUERY),
+    'ipg_names': (PORT_GROUP_NAME_QUERY, BUNDLE_GROUP_NAME_QUERY),
+    'vlan_pools': (VLAN_POOL_QUERY, ),
+    'aeps': (AEP_QUERY, ),
+}
+
+
+Interface = namedtuple('Interface', [name for name, _ in export.INTERFACE_FIELDS])
+Binding = namedtuple('Binding', [name for name, _ in export.BINDING_FIELDS])
+Epg = namedtuple('Epg', ['tenant', 'app_profile', 'name', 'bd', 'domains', 'tags', 'bindings'])
+
+
+class ApicError(Exception):
+    """A query the APIC failed or did not answer in time."""
+
+
+def target_nodes(target_node):
+    """Returns the set of node ids of a target_node argument, a node id or a list of them, empty for all nodes."""
+    if not target_node:
+        return set()
+    if isinstance(target_node, str):
+        return {target_node}
+    return set(target_node)
+
+
+def epg_query(epg, with_health=False):
+    """Returns the query of iter_epgs(), each EPG arrives with its static paths, domains, BD and tags as children."""
+    query = EPG_QUERY._replace(include='health') if with_health else EPG_QUERY
+    if epg == 'ALL':
+        return query
+    return query._replace(filter='eq(fvAEPg.name,"{0}")'.format(epg))
+
+
+class ApicClient(object):
+    def __init__(self, address='', username='', password='', session=None):
+        self.address = address
+        self.username = username
+        self.password = password
+        self.headers = {'content-type': "application/json", 'cache-control': "no-cache"}
+        self.session = session or ratelimit.RateLimitedSession(requests.Session())
+        self.cookie = None
+        self.apic_address = ''
+        self.refresh_time_epoch = 0
+        self.workers = 1
+        self.pool = None
+        self.page_parallelism = PAGE_PARALLELISM
+        self.page_pool = None
+        self.shard_by = 'class'
+        self.shard_timeout = SHARD_TIMEOUT
+        self.shard_pool = None
+        self.columnar = False
+        # {query: (merged query, objects)} of the active plan
+        self.plan_results = None
+        self.plan_pool = None
+        # configSnapshot attributes and session handles, both keyed by DN
+        self.snapshots = {}
+        self.snapshot_ids = {}
+        # endpoints.EndpointTable, loaded by load_endpoints()
+        self.endpoint_table = None
+        # datasets.DatasetCache the shell reads its datasets from, set by the daemon
+        self.fabric_cache = None
+
+    def login(self):
+        """Logs in to self.address, returns {'rc': 0, 'error_msg': ''} or rc 1 with the error."""
+        uri = "https://{0}/api/aaaLogin.json".format(self.address)
+        payload = {'aaaUser': {'attributes': {'name': self.username, 'pwd': self.password}}}
+        response = self.session.post(uri, data=json.dumps(payload), headers=self.headers, verify=False)
+        if response.status_code != 200:
+            error_msg = 'failed to connect to APIC {0}, Error Code {1}'.format(self.address, response.status_code)
+            return {'rc': 1, 'error_msg': error_msg}
+        self.cookie = {'APIC-cookie': response.cookies['APIC-cookie']}
+        self.apic_address = self.address
+        self.refresh_time_epoch = int(datetime.datetime.now().strftime('%s'))
+        return {'rc': 0, 'error_msg': ''}
+
+    def refresh(self, timeout=90):
+        """Logs in again if the last login is older than timeout seconds."""
+        current_time_epoch = int(datetime.datetime.now().strftime('%s'))
+        if current_time_epoch - self.refresh_time_epoch >= timeout:
+            return self.login()
+        return {'rc': 0, 'error_msg': ''}
+
+    def close(self):
+        """Closes the session and shuts down the worker pools."""
+        try:
+            self.session.close()
+        except:
+            pass
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+        if self.page_pool:
+            self.page_pool.shutdown()
+            self.page_pool = None
+        if self.shard_pool:
+            self.shard_pool.shutdown(wait=False)
+            self.shard_pool = None
+        if self.plan_pool:
+            self.plan_pool.shutdown()
+            self.plan_pool = None
+
+    def interfaces(self, node=''):
+        """Yields an Interface per leaf interface, only of node if given."""
+        self.refresh()
+        for row in self.iter_interface_rows(node):
+            yield Interface(*row)
+
+    def epgs(self, tenant='', name=''):
+        """Yields an Epg with its static bindings per EPG, only of tenant and named name if given."""
+        self.refresh()
+        for epg in self.iter_epgs(name or 'ALL'):
+            if not tenant or epg['tn'] == tenant:
+                yield Epg(epg['tn'], epg['ap'], epg['epg_name'], epg['bd'], epg['domains'], epg['tags'],
+                          [Binding(*row) for row in self.iter_path_rows(epg)])
+
+    def bindings(self, vlan='', tenant='', node=''):
+        """Yields a Binding per EPG static path, only with encap vlan, of tenant and on node if given."""
+        for epg in self.epgs(tenant):
+            for binding in epg.bindings:
+                if vlan and binding.encap != str(vlan):
+                    continue
+                if node and node not in binding.node.split('-'):
+                    continue
+                yield binding
+
+    def lookup_interfaces(self, ports):
+        """Returns {(node, interface): Interface} of (node, interface) pairs, e.g. ('101', '1/10')."""
+        wanted = set(ports)
+        nodes = {node for node, _ in wanted}
+        found = {}
+        for intf in self.interfaces(nodes.pop() if len(nodes) == 1 else ''):
+            if (intf.node, intf.interface) in wanted:
+                found[(intf.node, intf.interface)] = intf
+        return found
+
+    def lookup_bindings(self, vlans):
+        """Returns {vlan: [Binding]} of VLAN ids with one EPG query."""
+        found = {str(vlan): [] for vlan in vlans}
+        for binding in self.bindings():
+            if binding.encap in found:
+                found[binding.encap].append(binding)
+        return found
+
+    def lookup_epgs(self, names):
+        """Returns {name: [Epg]} of EPG names with one EPG query, EPG names are unique per tenant only."""
+        found = {name: [] for name in names}
+        for epg in self.epgs():
+            if epg.name in found:
+                found[epg.name].append(epg)
+        return found
+
+    def plan_bindings(self, rows, idict=None, ipgs=None, vlan_pools=None, epgs=None):
+        """
+        Returns the bindings.plan() changes of bindings.read_csv() rows.
+
+        The interface table, policy groups, VLAN pools and EPG dicts are collected when not given.
+        """
+        if idict is None:
+            idict = self.interface_table()
+        if ipgs is None:
+            ipgs = self.get_ipgs()
+        if vlan_pools is None:
+            vlan_pools = self.get_vlan_pools()
+        if epgs is None:
+            epgs = list(self.iter_epgs('ALL'))
+
+        interfaces = {(intf['node'], intf['intf_id']) for _, intf in idict.items()}
+        epg_domains = {(epg['tn'], epg['ap'], epg['epg_name']): epg['domains'] for epg in epgs}
+        names = [name for name, _ in export.BINDING_FIELDS]
+        existing = {}
+        for epg in epgs:
+            for row in self.iter_path_rows(epg):
+                row = dict(zip(names, row))
+                existing[bindings.identity(row)] = (row['encap'], row['mode'])
+        nodes = {node for _, row in rows for node in row['node'].split('-')}
+        pods = {}
+        for node_dn in self.get_node_dns(nodes):
+            node_parts = dn_parser.parse(node_dn)
+            pods[node_parts.node] = node_parts.pod
+        return bindings.plan(rows, interfaces, ipgs, vlan_pools, epg_domains, existing, pods)
+
+    def post_bindings(self, changes, chunk_size=None):
+        """
+        Posts the add and modify changes to uni, in one request up to chunk_size bindings (CHUNK_SIZE).
+
+        Larger batches are posted in chunks, each its own transaction; posting stops at the first
+        failed chunk. Returns (bindings posted, error message or '').
+        """
+        posted = 0
+        for chunk in bindings.chunks(changes, chunk_size or bindings.CHUNK_SIZE):
+            response = self.post('mo/uni.json', bindings.payload(chunk))
+            if response.status_code != 200:
+                return posted, 'Error Code {0}: {1}'.format(response.status_code, response.text)
+            posted += len(chunk)
+        return posted, ''
+
+    def post(self, path, payload):
+        """Posts payload to /api/<path> of the APIC, returns the response."""
+        uri = 'https://{0}/api/{1}'.format(self.apic_address, path)
+        return self.session.post(uri, data=json.dumps(payload), headers=self.headers, cookies=self.cookie, verify=False)
+
+    @contextmanager
+    def planned(self, *datasets):
+        """
+        Prefetches the queries of datasets, keys of DATASETS or planner.Query, for the collectors run in the block.
+
+        The queries are merged by planner.merge() and run PLAN_PARALLELISM at a time; within the
+        block fetch() answers every query the plan covers from the merged results, other queries
+        go to the APIC as usual. A plan opened inside another one adds nothing, and datasets
+        held by the fabric cache are not fetched again.
+        """
+        if self.plan_results is not None:
+            yield
+            return
+        self.refresh()
+        if self.fabric_cache is not None:
+            datasets = [dataset for dataset in datasets if dataset not in self.fabric_cache.datasets]
+        queries = []
+        for dataset in datasets:
+            queries.extend([dataset] if isinstance(dataset, planner.Query) else DATASETS[dataset])
+        plan = planner.merge(queries)
+        if not self.plan_pool:
+            self.plan_pool = ThreadPoolExecutor(max_workers=PLAN_PARALLELISM)
+        futures = [self.plan_pool.submit(list, self.iter_query(planner.uri(merged, self.apic_address)))
+                   for merged, _ in plan]
+        results = {}
+        for (merged, members), future in zip(plan, futures):
+            mos = future.result()
+            for query in members:
+                results[query] = (merged, mos)
+        self.plan_results = results
+        try:
+            yield
+        finally:
+            self.plan_results = None
+
+    def fetch(self, query):
+        """Yields the objects returned by a planner.Query, from the active plan if it covers the query."""
+        uri = planner.uri(query, self.apic_address)
+        if self.plan_results is not None:
+            if query in self.plan_results:
+                merged, mos = self.plan_results[query]
+                return self.serve_planned(uri, query, merged, mos)
+            for merged, mos in self.plan_results.values():
+                if planner.covers(merged, query):
+                    return self.serve_planned(uri, query, merged, mos)
+        return self.iter_query(uri)
+
+    def serve_planned(self, uri, query, merged, mos):
+        """Returns the objects of query from a merged plan query, telling a session with a served() hook."""
+        served = getattr(self.session, 'served', None)
+        if served:
+            served(uri)
+        return planner.serve(query, merged, mos)
+
+    def iter_pages(self, uri, page_size=PAGE_SIZE, raw=False):
+        """
+        Yields each page of a query, requesting page_size objects at a time.
+
+        Pages are decoded dicts, or the undecoded response bodies if raw is set. Class queries
+        are ordered by DN so page boundaries are stable, and once the first page gives the
+        totalCount the other pages are fetched page_parallelism at a time, still yielded in order.
+        """
+        separator = '&' if '?' in uri else '?'
+        match = QUERY_CLASS.search(uri)
+        if match and 'order-by=' not in uri:
+            uri = '{0}{1}order-by={2}.dn'.format(uri, separator, match.group(1))
+            separator = '&'
+        page_uri = '{0}{1}page={{0}}&page-size={2}'.format(uri, separator, page_size)
+
+        body, total_count = self.get_page(page_uri.format(0), raw)
+        yield body
+        pages = range(1, -(-total_count // page_size))
+        if not match or self.page_parallelism < 2 or len(pages) < 2:
+            for page in pages:
+                yield self.get_page(page_uri.format(page), raw)[0]
+            return
+
+        if not self.page_pool:
+            self.page_pool = ThreadPoolExecutor(max_workers=self.page_parallelism)
+        pending = deque()
+        pages = iter(pages)
+        try:
+            for page in pages:
+                pending.append(self.page_pool.submit(self.get_page, page_uri.format(page), raw))
+                if len(pending) < self.page_parallelism:
+                    continue
+                yield pending.popleft().result()[0]
+            while pending:
+                yield pending.popleft().result()[0]
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def get_page(self, page_uri, raw=False):
+        """Returns (page, totalCount) of one page of a query, raises ApicError if the query failed."""
+        response = self.session.get(page_uri, headers=self.headers, cookies=self.cookie, verify=False)
+        if response.status_code != 200:
+            raise ApicError('query failed, Error Code {0}: {1}'.format(response.status_code, page_uri))
+        if raw:
+            # totalCount heads the body, the page itself is decoded by a worker process
+            body = response.content
+            match = TOTAL_COUNT.search(body[:256])
+            total_count = int(match.group(1)) if match else int(response.json().get('totalCount', 0))
+        else:
+            body = response.json()
+            total_count = int(body.get('totalCount', 0))
+        return body, total_count
+
+    def iter_query(self, uri, page_size=PAGE_SIZE):
+        """Yields the objects returned by a query, requesting page_size objects at a time."""
+        for page in self.iter_pages(uri, page_size):
+            for mo in page['imdata']:
+                yield mo
+
+    def iter_parsed(self, uri, parse_func):
+        """
+        Yields parse_func(page) for each page of a query.
+
+        With more than one worker the raw pages are decoded and parsed in the process pool
+        while the next pages are fetched; results are still yielded in page order.
+        """
+        if self.workers > 1 and not self.pool:
+            self.pool = parallel.create_pool(self.workers)
+
+        if not self.pool:
+            for page in self.iter_pages(uri):
+                yield parse_func(page)
+            return
+
+        pending = deque()
+        for page in self.iter_pages(uri, raw=True):
+            pending.append(self.pool.submit(parse_func, page))
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def iter_leaf_rows(self, mo_class, parse_func, leaf_nodes, params='', shard_by=''):
+        """
+        Yields parse_func rows of a per-leaf class such as l1PhysIf, one list per page.
+
+        With shard_by 'node' the class is queried per leaf node instead of fabric wide, one list
+        per leaf in the order the leaves answer. shard_by defaults to self.shard_by. params are
+        added to the query, e.g. 'rsp-subtree-include=health'.
+        """
+        if (shard_by or self.shard_by) != 'node':
+            uri = 'https://{0}/api/class/{1}.json'.format(self.apic_address, mo_class)
+            if params:
+                uri += '?' + params
+            for rows in self.iter_parsed(uri, parse_func):
+                yield rows
+            return
+
+        for node_dn, rows in self.iter_sharded(mo_class, parse_func, self.get_node_dns(set(leaf_nodes)), params):
+            yield rows
+
+    def iter_sharded(self, mo_class, parse_func, node_dns, params=''):
+        """
+        Yields (node_dn, rows) of node scoped mo_class queries as each node answers.
+
+        Up to SHARD_PARALLELISM nodes are queried at once. Nodes whose query fails, or that are
+        still busy after shard_timeout seconds, are not waited for: once the other nodes are
+        yielded, ApicError names them.
+        """
+        self.create_pools()
+        futures = {self.shard_pool.submit(self.get_node_rows, mo_class, parse_func, node_dn, params): node_dn
+                   for node_dn in node_dns}
+        failed = []
+        try:
+            for future in as_completed(futures, timeout=self.shard_timeout):
+                node_dn = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as error:
+                    failed.append('{0} query failed on {1}: {2}'.format(mo_class, node_dn, error))
+                    continue
+                yield node_dn, rows
+        except TimeoutError:
+            late = sorted(node_dn for future, node_dn in futures.items() if not future.done())
+            failed.append('no {0} from {1} after {2:g}s'.format(mo_class, ', '.join(late), self.shard_timeout))
+        finally:
+            for future in futures:
+                future.cancel()
+        if failed:
+            raise ApicError('; '.join(failed))
+
+    def create_pools(self):
+        """Creates the parse, page and shard pools before query threads use them, rather than in the threads."""
+        if self.workers > 1 and not self.pool:
+            self.pool = parallel.create_pool(self.workers)
+        if self.page_parallelism > 1 and not self.page_pool:
+            self.page_pool = ThreadPoolExecutor(max_workers=self.page_parallelism)
+        if not self.shard_pool:
+            self.shard_pool = ThreadPoolExecutor(max_workers=SHARD_PARALLELISM)
+
+    def get_node_rows(self, mo_class, parse_func, node_dn, params=''):
+        """Returns the parse_func rows of a node scoped mo_class query."""
+        uri = 'https://{0}/api/node/class/{1}/{2}.json'.format(self.apic_address, node_dn, mo_class)
+        if params:
+            uri += '?' + params
+        rows = []
+        for page_rows in self.iter_parsed(uri, parse_func):
+            rows.extend(page_rows)
+        return rows
+
+    def get_node_dns(self, nodes):
+        """Returns the DNs of the fabric nodes with the ids in nodes, e.g. ['topology/pod-1/node-101']."""
+        return [mo['fabricNode']['attributes']['dn'] for mo in self.fetch(NODE_QUERY)
+                if mo['fabricNode']['attributes']['id'] in nodes]
+
+    def get_oper_state(self, keys, node_dns):
+        """Returns {key: (operSt, operSpeed, operDuplex)} of keys with node scoped ethpmPhysIf queries."""
+        wanted = set(keys)
+        records = {}
+        for node_dn, rows in self.iter_sharded('ethpmPhysIf', parallel.parse_ethpm_phys_if, node_dns):
+            for key, node, oper_st, oper_speed, oper_duplex in rows:
+                if key in wanted:
+                    records[key] = (oper_st, oper_speed, oper_duplex)
+        return records
+
+    def get_access_policies(self):
+        """
+        Fetches switch, interface and FEX profiles with one uni/infra subtree query.
+
+        Objects are joined by their parent DNs, so the result does not depend on the order
+        or the paging of the response.
+        """
+        port_to_switch_prof_map = {}
+        # format:
+        # {'UCS-103-104-FI-B-IFSELECTOR': ['SP-UCS-103-104-FI-B'],
+        #  'LF1_ACCESS': ['LF1_SPR']}
+        #
+        switch_prof_leafs = {}
+        # format:
+        # {'SP-UCS-103-104-FI-B': [103, 104],
+        #  'LF1_SPR': [101]]
+        #
+        access_port_selectors = {}
+        # format:
+        # UCS-103-104-FI-B-IFSELECTOR': [{'interfaces': ['1/48'], 'policy_group': u'PG-UCS2-FI-B', 'hport_name': u'UCS-FI-B-PORT2'}],
+        #
+        fex_to_interface_profile_map = {}
+        fex_port_selectors = []
+
+        for mo in self.fetch(ACCESS_POLICY_QUERY):
+            mo_class = list(mo.keys())[0]
+            profile = mo[mo_class]['attributes']['name']
+            children = mo[mo_class].get('children', [])
+
+            if mo_class == 'infraNodeP':
+                for leaf_s in children:
+                    for node_blk in leaf_s.get('infraLeafS', {}).get('children', []):
+                        if 'infraNodeBlk' in node_blk:
+                            from_ = int(node_blk['infraNodeBlk']['attributes']['from_'])
+                            to_ = int(node_blk['infraNodeBlk']['attributes']['to_']) + 1
+                            for node in range(from_, to_):
+                                switch_prof_leafs.setdefault(profile, []).append(node)
+                continue
+
+            for child in children:
+                if 'infraRtAccPortP' in child:
+                    sw_sel = dn_parser.rn_value(child['infraRtAccPortP']['attributes']['tDn'], 'nprof')
+                    port_to_switch_prof_map.setdefault(profile, []).append(sw_sel)
+
+                elif 'infraFexBndlGrp' in child:
+                    fex_profile = child['infraFexBndlGrp']['attributes']['name']
+                    for rt_base_group in child['infraFexBndlGrp'].get('children', []):
+                        if 'infraRtAccBaseGrp' in rt_base_group:
+                            t_dn = rt_base_group['infraRtAccBaseGrp']['attributes']['tDn']
+                            interface_profile = dn_parser.rn_value(t_dn, 'accportprof')
+                            fex_to_interface_profile_map[fex_profile] = interface_profile
+
+                elif 'infraHPortS' in child:
+                    hport_name = child['infraHPortS']['attributes']['name']
+                    interfaces = []
+                    pol_grp = ''
+                    fex = '0'
+                    for item in child['infraHPortS'].get('children', []):
+                        if 'infraPortBlk' in item:
+                            port_blk = item['infraPortBlk']['attributes']
+                            for intf in range(int(port_blk['fromPort']), int(port_blk['toPort']) + 1):
+                                interfaces.append('{0}/{1}'.format(port_blk.get('fromCard', '1'), intf))
+                        elif 'infraSubPortBlk' in item:
+                            # Sub-ports of breakout ports, e.g. 1/49/1-4
+                            port_blk = item['infraSubPortBlk']['attributes']
+                            card = port_blk.get('fromCard', '1')
+                            for intf in range(int(port_blk['fromPort']), int(port_blk['toPort']) + 1):
+                                for sub_port in range(int(port_blk['fromSubPort']), int(port_blk['toSubPort']) + 1):
+                                    interfaces.append('{0}/{1}/{2}'.format(card, intf, sub_port))
+                        elif 'infraRsAccBaseGrp' in item:
+                            t_dn = item['infraRsAccBaseGrp']['attributes']['tDn']
+                            if 'fexbundle' in t_dn:
+                                pol_grp = dn_parser.rn_value(t_dn, 'fexbundle')
+                            else:
+                                pol_grp = dn_parser.rn(t_dn).split('-', 1)[-1]
+                            if mo_class == 'infraFexP':
+                                fex = item['infraRsAccBaseGrp']['attributes']['fexId']
+                    if not pol_grp:
+                        continue
+                    selector = {'fex': fex, 'hport_name': hport_name, 'policy_group': pol_grp, 'interfaces': interfaces}
+                    if mo_class == 'infraFexP':
+                        # Interface profile of a FEX profile may arrive later in the stream
+                        fex_port_selectors.append((profile, selector))
+                    else:
+                        access_port_selectors.setdefault(profile, []).append(selector)
+
+        for fex_prof, selector in fex_port_selectors:
+            if fex_prof in fex_to_interface_profile_map:
+                access_port_selectors.setdefault(fex_to_interface_profile_map[fex_prof], []).append(selector)
+
+        return port_to_switch_prof_map, switch_prof_leafs, access_port_selectors
+
+    def get_selector_rows(self, target_node=''):
+        """Returns the interfaces configured by access port selectors with their selector and policy group."""
+        port_to_switch_prof_map, switch_prof_leafs, access_port_selectors = self.get_access_policies()
+        node_ids = target_nodes(target_node)
+
+        # Format:
+        # [(104148, '104', '1/48', 'UCS-FI-B-PORT2', 'PG-UCS2-FI-B'), ]
+        #
+        selector_rows = []
+        for port_selector in access_port_selectors:
+            if port_selector in port_to_switch_prof_map:
+                for port_selector_item in access_port_selectors[port_selector]:
+                    policy_group = port_selector_item['policy_group']
+                    port_sr_name = port_selector_item['hport_name']
+                    fex = port_selector_item['fex']
+                    nodes = []
+                    for sw_sel in port_to_switch_prof_map[port_selector]:
+                        if sw_sel in switch_prof_leafs:
+                            for node in switch_prof_leafs[sw_sel]:
+                                nodes.append(node)
+                    if nodes:
+                        for node in set(nodes):
+                            # Node blocks expand to int node ids
+                            if node_ids and str(node) not in node_ids:
+                                continue
+                            for intf in set(port_selector_item['interfaces']):
+                                key = dn_parser.interface_key(node, fex, *intf.split('/'))
+                                if fex != '0':
+                                    intf = fex + '/' + intf
+                                selector_rows.append((key, str(node), intf, port_sr_name, policy_group))
+        return selector_rows
+
+    def get_leaf_nodes(self, target_node=''):
+        """Returns the ids of the leaf nodes, only those of target_node, a node id or a list of them, if given."""
+        leaf_nodes = []
+        # format:
+        # ['101', '102', '103', '104']
+        #
+        pods = list(self.fetch(POD_QUERY))
+        query = NODE_QUERY
+        if target_node:
+            filters = ['eq(fabricNode.id,"{0}")'.format(node) for node in sorted(target_nodes(target_node))]
+            query = NODE_QUERY._replace(filter=filters[0] if len(filters) == 1 else 'or({0})'.format(','.join(filters)))
+        nodes = list(self.fetch(query))
+        for pod_dict in pods:
+            pod_mo_class = list(pod_dict.keys())[0]
+            pod = pod_dict[pod_mo_class]['attributes']
+            for node_dict in nodes:
+                node_mo_class = list(node_dict.keys())[0]
+                node = node_dict[node_mo_class]['attributes']
+                if node['role'] == 'leaf' and dn_parser.parse(node['dn']).pod == pod['id']:
+                    leaf_nodes.append(node['id'])
+        return leaf_nodes
+
+    def interface_table(self, target_node='', health_scores=None, interface_neighbors=None):
+        """
+        Returns the interfaces of all leaf nodes, or of target_node, with their policies and state.
+
+        target_node is a node id or a list of them, whose leafs are then queried alone.
+
+        If a health_scores dict is given, the l1PhysIf query includes the health scores and
+        health_scores is filled with {key: score}. If an interface_neighbors dict is given, the
+        LLDP and CDP adjacencies are fetched while l1PhysIf and ethpmPhysIf are read and
+        interface_neighbors is filled with {key: [neighbors.Neighbor]}.
+        """
+
+        # A dict or with columnar an aclilib.table.InterfaceTable:
+        #
+        # { 104146: {
+        #              "descr": "",
+        #              "intf_id": "1/46",
+        #              "node": "104",
+        #              "operDuplex": "full",
+        #              "operSpeed": "10G",
+        #              "operSt": "up",
+        #              "pod": "1",
+        #              "policy_group": "10G-ACCESS-EXISTING-LAB",
+        #              "portT": "leaf",
+        #              "port_sr_name": "Nutanix8",
+        #              "usage": "epg,infra"
+        #             },
+        # }
+
+        selector_rows = self.get_selector_rows(target_node)
+        leaf_nodes = self.get_leaf_nodes(target_node)
+        shard_by = 'node' if target_node else ''
+
+        neighbor_futures = []
+        if interface_neighbors is not None and leaf_nodes:
+            self.create_pools()
+            if not self.plan_pool:
+                self.plan_pool = ThreadPoolExecutor(max_workers=PLAN_PARALLELISM)
+            neighbor_futures = [self.plan_pool.submit(self.get_leaf_rows, mo_class, parse_func, leaf_nodes, params)
+                                for mo_class, parse_func, params in NEIGHBOR_CLASSES]
+
+        # Query l1PhysIf for the interfaces and ethpmPhysIf for their status, speed and duplex
+        l1_rows = []
+        if health_scores is None:
+            for rows in self.iter_leaf_rows('l1PhysIf', parallel.parse_l1_phys_if, leaf_nodes, shard_by=shard_by):
+                l1_rows.extend(rows)
+        else:
+            for rows in self.iter_leaf_rows('l1PhysIf', parallel.parse_l1_phys_if_health, leaf_nodes,
+                                            'rsp-subtree-include=health', shard_by):
+                for row in rows:
+                    l1_rows.append(row[:-1])
+                    health_scores[row[0]] = row[-1]
+
+        ethpm_rows = []
+        if leaf_nodes:
+            for rows in self.iter_leaf_rows('ethpmPhysIf', parallel.parse_ethpm_phys_if, leaf_nodes, shard_by=shard_by):
+                ethpm_rows.extend(rows)
+
+        idict = table.build(selector_rows, l1_rows, ethpm_rows, leaf_nodes, columnar=self.columnar)
+        if neighbor_futures:
+            neighbor_rows = []
+            for future in neighbor_futures:
+                neighbor_rows.extend(future.result())
+            interface_neighbors.update(neighbors.join(neighbor_rows, idict))
+        return idict
+
+    def get_leaf_rows(self, mo_class, parse_func, leaf_nodes, params=''):
+        """Returns all rows of iter_leaf_rows() as one list."""
+        rows = []
+        for page_rows in self.iter_leaf_rows(mo_class, parse_func, leaf_nodes, params):
+            rows.extend(page_rows)
+        return rows
+
+    def get_interface_rates(self, idict, target_node=''):
+        """
+        Returns {key: stats.InterfaceRate} of the interfaces in idict, of all leaf nodes or of target_node.
+
+        The 5 minute ingress and egress counters are read like l1PhysIf: fabric wide in pages fetched
+        in parallel, or per leaf concurrently with shard_by 'node'. A target node is queried alone.
+        """
+        leaf_nodes = self.get_leaf_nodes(target_node)
+        counters = []
+        for mo_class, parse_func in (('eqptIngrTotal5min', parallel.parse_eqpt_ingr_total),
+                                     ('eqptEgrTotal5min', parallel.parse_eqpt_egr_total)):
+            rows = []
+            if target_node:
+                for _, node_rows in self.iter_sharded(mo_class, parse_func, self.get_node_dns(set(leaf_nodes))):
+                    rows.extend(node_rows)
+            else:
+                for page_rows in self.iter_leaf_rows(mo_class, parse_func, leaf_nodes):
+                    rows.extend(page_rows)
+            counters.append(rows)
+        return stats.rates(counters[0], counters[1], idict)
+
+    def iter_epgs(self, epg, with_health=False):
+        """
+        Yields an EPG dict with its paths, domains, BD and tags per EPG, epg is a name or 'ALL'.
+
+        With with_health the query includes the health scores, in 'health' of the dicts.
+        """
+        if not epg:
+            return
+
+        for epg_data in self.fetch(epg_query(epg, with_health)):
+            yield self.parse_epg(epg_data)
+
+    def get_epg(self, epg_dn):
+        """Returns the EPG dict of an EPG DN like iter_epgs(), None if the EPG does not exist."""
+        query = planner.Query('mo/' + epg_dn, subtree='children', subtree_classes=EPG_QUERY.subtree_classes)
+        for epg_data in self.fetch(query):
+            return self.parse_epg(epg_data)
+        return None
+
+    def parse_epg(self, epg_data):
+        """Returns the EPG dict of a fvAEPg with its children."""
+        tags = []
+        domains = []
+        paths = []
+        bd_full = ''
+        epg_name = epg_data['fvAEPg']['attributes']['name']
+        epg_dn = dn_parser.parse(epg_data['fvAEPg']['attributes']['dn'])
+        tn = epg_dn.tenant
+        ap = epg_dn.ap
+
+        for child in epg_data['fvAEPg'].get('children', []):
+
+            if 'fvRsPathAtt' in child:
+                path_dict = self.parse_path(child['fvRsPathAtt']['attributes'])
+                if path_dict:
+                    paths.append(path_dict)
+
+            elif 'tagInst' in child:
+                tags.append(child['tagInst']['attributes']['name'])
+
+            elif 'fvRsBd' in child:
+                t_dn = child['fvRsBd']['attributes']['tDn']
+                if t_dn:
+                    bd_dn = dn_parser.parse(t_dn)
+                    bd_full = bd_dn.tenant + '/' + bd_dn.bd
+                else:
+                    bd_full = child['fvRsBd']['attributes']['tnFvBDName']
+            elif 'fvRsDomAtt' in child:
+                domains.append(dn_parser.domain_name(child['fvRsDomAtt']['attributes']['tDn']))
+
+        paths_sorted = sorted(paths, key=lambda k: k['idx'])
+        return {'epg_name': epg_name, 'tn': tn, 'ap': ap, 'bd': bd_full, 'domains': domains, 'paths': paths_sorted,
+                'tags': tags, 'health': health.score(epg_data['fvAEPg'])}
+
+    def parse_path(self, path_att):
+        """Returns the path dict for a fvRsPathAtt, {} for path types that are not shown."""
+        path_dict = {}
+        path = dn_parser.parse(path_att['tDn'])
+        encap = path_att['encap'].replace('vlan-', '')
+        mode = path_att.get('mode', 'regular')
+
+        if path.protpaths:
+            path_dict = {'vpc': path.pathep, 'protpaths': 'protpaths-' + path.protpaths, 'encap': encap, 'idx': 0,
+                         'mode': mode}
+
+        elif path.node:
+
+            if path.port:
+                # FEX ports are named fex/module/port like in the interface table
+                intf_id = path.intf_id if path.fex == '0' else path.fex + '/' + path.intf_id
+                path_dict = {'idx': path.key, 'node': path.node, 'intf_id': intf_id, 'encap': encap, 'mode': mode}
+
+            else:
+                path_dict = {'idx': 0, 'node': path.node, 'pc': path.pathep, 'encap': encap, 'mode': mode}
+
+        return path_dict
+
+    def worst_health(self, count):
+        """
+        Returns [(score, (type, name, dn))] of the count EPGs and leaf interfaces with the lowest health.
+
+        Both are read with rsp-subtree-include=health, the objects pass through a heap of count entries.
+        """
+        worst = health.WorstN(count)
+        for mo in self.fetch(EPG_NAME_QUERY._replace(include='health')):
+            score = health.score(mo['fvAEPg'])
+            if score is not None:
+                epg_dn = mo['fvAEPg']['attributes']['dn']
+                parts = dn_parser.parse(epg_dn)
+                worst.add(score, ('epg', '/'.join((parts.tenant, parts.ap, parts.epg)), epg_dn))
+        leaf_nodes = set(self.get_leaf_nodes())
+        for rows in self.iter_leaf_rows('l1PhysIf', parallel.parse_l1_phys_if_health, leaf_nodes,
+                                        'rsp-subtree-include=health'):
+            for key, node, pod, intf_id, _, _, _, score in rows:
+                if score is not None and node in leaf_nodes:
+                    intf_dn = 'topology/pod-{0}/node-{1}/sys/phys-[eth{2}]'.format(pod, node, intf_id)
+                    worst.add(score, ('interface', '{0} {1}'.format(node, intf_id), intf_dn))
+        return worst.items()
+
+    def get_ipgs(self):
+        """Returns {name: policies} of the interface, PC and vPC policy groups."""
+        ipgs = {}
+
+        for ipg_type in ('interface', 'pc_vpc'):
+            if ipg_type == 'interface':
+                query = PORT_GROUP_QUERY
+            elif ipg_type == 'pc_vpc':
+                query = BUNDLE_GROUP_QUERY
+
+            for ipg in self.fetch(query):
+                ipg_dict = {}
+
+                if ipg_type == 'interface':
+                    name = str(ipg['infraAccPortGrp']['attributes']['name'])
+                    link_agg = '-'
+                else:
+                    name = str(ipg['infraAccBndlGrp']['attributes']['name'])
+                    lag_t = ipg['infraAccBndlGrp']['attributes']['lagT']
+                    if lag_t == 'link':
+                       link_agg = 'pc'
+                    elif lag_t == 'node':
+                       link_agg = 'vpc'
+
+                ipg_dict['link_agg'] = link_agg
+                
+                children = []               
+                if ipg_type == 'interface':
+     
+                    if 'children' in ipg['infraAccPortGrp'] and ipg['infraAccPortGrp']['children']:
+                        children = ipg['infraAccPortGrp']['children']
+                else:
+                    if 'children' in ipg['infraAccBndlGrp'] and ipg['infraAccBndlGrp']['children']:
+                        children = ipg['infraAccBndlGrp']['children']
+
+                if children:
+
+                    for child in children:
+                        if 'infraRsAttEntP' in child:
+                            if 'tDn' in child['infraRsAttEntP']['attributes']:
+                                ipg_dict['aep'] = dn_parser.rn_value(child['infraRsAttEntP']['attributes']['tDn'], 'attentp')
+                            
+                        if 'infraRsHIfPol' in child:
+                            link_level = '-'
+                            if child['infraRsHIfPol']['attributes']['tnFabricHIfPolName']:
+                                link_level = child['infraRsHIfPol']['attributes']['tnFabricHIfPolName']
+                            ipg_dict['link_level'] = link_level
+
+                        if 'infraRsStpIfPol' in child:
+                            stp = '-'
+                            if child['infraRsStpIfPol']['attributes']['tnStpIfPolName']:
+                                stp = child['infraRsStpIfPol']['attributes']['tnStpIfPolName']
+                            ipg_dict['stp'] = stp
+
+                        if 'infraRsMcpIfPol' in child:
+                            mcp = '-'
+                            if child['infraRsMcpIfPol']['attributes']['tnMcpIfPolName']:
+                                mcp = child['infraRsMcpIfPol']['attributes']['tnMcpIfPolName']
+                            ipg_dict['mcp'] = mcp
+
+                        if 'infraRsCdpIfPol' in child:
+                            cdp = '-'
+                            if child['infraRsCdpIfPol']['attributes']['tnCdpIfPolName']:
+                                cdp = child['infraRsCdpIfPol']['attributes']['tnCdpIfPolName']
+                            ipg_dict['cdp'] = cdp
+
+                        if 'infraRsL2IfPol' in child:
+                            l2_intf = '-'
+                            if child['infraRsL2IfPol']['attributes']['tnL2IfPolName']:
+                                l2_intf = child['infraRsL2IfPol']['attributes']['tnL2IfPolName']
+                            ipg_dict['l2_intf'] = l2_intf
+
+                        if 'infraRsLldpIfPol' in child:
+                            lldp = '-'
+                            if child['infraRsLldpIfPol']['attributes']['tnLldpIfPolName']:
+                                lldp = child['infraRsLldpIfPol']['attributes']['tnLldpIfPolName']
+                            ipg_dict['lldp'] = lldp
+
+                        if 'infraRsLacpPol' in child:
+                            lacp = '-'
+                            if child['infraRsLacpPol']['attributes']['tnLacpLagPolName']:
+                                lacp = child['infraRsLacpPol']['attributes']['tnLacpLagPolName']
+                            ipg_dict['lacp'] = lacp
+
+                if 'aep' not in ipg_dict:
+                    ipg_dict['aep'] = '-'
+
+                if 'lacp' not in ipg_dict:
+                    ipg_dict['lacp'] = '-'
+ 
+                ipgs[name] = ipg_dict
+        return ipgs
+
+    def get_vlan_pools(self):
+        """Returns one dict per VLAN pool encap block with the pool name, allocation and domains."""
+        vlan_pools = []
+        for inst in self.fetch(VLAN_POOL_QUERY):
+            name = inst['fvnsVlanInstP']['attributes']['name']
+            alloc = inst['fvnsVlanInstP']['attributes']['allocMode']
+            domains = []
+            if 'children' in inst['fvnsVlanInstP']:
+                for child in inst['fvnsVlanInstP']['children']:
+                    if 'fvnsRtVlanNs' in child:
+                        domains.append(dn_parser.domain_name(child['fvnsRtVlanNs']['attributes']['tDn']))
+                for child in inst['fvnsVlanInstP']['children']:
+                    if 'fvnsEncapBlk' in child:
+                        from_vlan = int(child['fvnsEncapBlk']['attributes']['from'].replace('vlan-', ''))
+                        to_vlan = int(child['fvnsEncapBlk']['attributes']['to'].replace('vlan-', ''))
+                        vlan_pools.append({'name': name, 'alloc': alloc, 'domains': domains,
+                                                'from_vlan': from_vlan, 'to_vlan': to_vlan})
+        return vlan_pools
+
+    def get_aeps(self):
+        """Returns {name: [domains]} of the AEPs, domains named by dn.domain_name() like the EPG domains."""
+        aeps = {}
+        for mo in self.fetch(AEP_QUERY):
+            domains = []
+            for child in mo['infraAttEntityP'].get('children', []):
+                if 'infraRsDomP' in child:
+                    domains.append(dn_parser.domain_name(child['infraRsDomP']['attributes']['tDn']))
+            aeps[mo['infraAttEntityP']['attributes']['name']] = domains
+        return aeps
+
+    def audit_encap(self, idict=None, ipgs=None, aeps=None, vlan_pools=None, epgs=None):
+        """
+        Returns (bindings checked, [encap.Finding]) of the static bindings whose encap does not resolve.
+
+        The interface table, policy groups, AEPs, VLAN pools and EPG dicts are collected when not given.
+        """
+        if idict is None:
+            idict = self.interface_table()
+        if ipgs is None:
+            ipgs = self.get_ipgs()
+        if aeps is None:
+            aeps = self.get_aeps()
+        if vlan_pools is None:
+            vlan_pools = self.get_vlan_pools()
+        if epgs is None:
+            epgs = self.iter_epgs('ALL')
+        return encap.audit(encap.EncapGraph(idict, ipgs, aeps, vlan_pools), epgs)
+
+    def get_snapshots(self, last=0, since=''):
+        """
+        Returns the configSnapshot attributes, newest first.
+
+        The APIC sorts the snapshots by createTime and returns only the last ones or those
+        created since a time, see faults.parse_since(). Every snapshot returned is cached by DN
+        and gets a handle that stays the same for the session, see snapshot_dn().
+        """
+        uri = 'https://{0}/api/class/configSnapshot.json?order-by={1}'.format(self.apic_address, SNAPSHOT_ORDER)
+        since = self.since_time('configSnapshot', 'createTime', since)
+        if since:
+            uri += '&query-target-filter=ge(configSnapshot.createTime,"{0}")'.format(since)
+        if last:
+            mos = self.get_page('{0}&page=0&page-size={1}'.format(uri, last))[0]['imdata']
+        else:
+            mos = self.iter_query(uri)
+
+        snapshots = [mo['configSnapshot']['attributes'] for mo in mos]
+        # A snapshot gets the next handle when it is first listed, oldest first within a listing, so
+        # handles follow the creation order only for snapshots first seen in the same listing
+        for attributes in reversed(snapshots):
+            self.snapshots[attributes['dn']] = attributes
+            self.snapshot_ids.setdefault(attributes['dn'], len(self.snapshot_ids))
+        return snapshots
+
+    def newest(self, mo_class, prop, scope=''):
+        """Returns prop of the newest object of a class, only below the scope DN if given, '' if there is none."""
+        uri = 'https://{0}/api/node/class/{1}{2}.json?order-by={2}.{3}|desc&page=0&page-size=1'.format(
+            self.apic_address, scope + '/' if scope else '', mo_class, prop)
+        imdata = self.get_page(uri)[0]['imdata']
+        if not imdata:
+            return ''
+        return imdata[0][mo_class]['attributes'][prop]
+
+    def since_time(self, mo_class, prop, since, scope=''):
+        """Returns the timestamp of a since option, relative times count back from the newest object."""
+        if not since:
+            return ''
+        if faults.RELATIVE_SINCE.match(since):
+            return faults.parse_since(since, self.newest(mo_class, prop, scope))
+        return faults.parse_since(since)
+
+    def iter_faults(self, severity='', node='', since=''):
+        """
+        Yields a list of faultInst attributes per page, oldest change first.
+
+        Only faults of severity or more severe, raised below node and changed since a time,
+        all filtered by the APIC.
+        """
+        scope = ''
+        if node:
+            node_dns = self.get_node_dns({node})
+            if not node_dns:
+                return
+            scope = node_dns[0]
+        since = self.since_time('faultInst', faults.FAULT_TIME, since, scope)
+        uri = 'https://{0}/api/node/class/{1}faultInst.json?order-by={2}'.format(
+            self.apic_address, scope + '/' if scope else '', faults.time_order('faultInst', faults.FAULT_TIME))
+        query_filter = faults.join_filters([faults.severity_filter(severity),
+                                            faults.time_filter('faultInst', faults.FAULT_TIME, since)])
+        if query_filter:
+            uri += '&query-target-filter=' + query_filter
+        for page in self.iter_pages(uri, faults.PAGE_SIZE):
+            yield [mo['faultInst']['attributes'] for mo in page['imdata']]
+
+    def iter_events(self, since='', prefix=''):
+        """
+        Yields a list of eventRecord attributes per page, oldest first.
+
+        Only events created since a time, by default the DEFAULT_EVENT_WINDOW before the newest
+        event, and with an affected DN starting with prefix.
+        """
+        if since:
+            since = self.since_time('eventRecord', faults.EVENT_TIME, since)
+        else:
+            newest = self.newest('eventRecord', faults.EVENT_TIME)
+            if not newest:
+                return
+            since = (faults.parse_time(newest) - faults.DEFAULT_EVENT_WINDOW).strftime(faults.TIME_FORMAT)
+        uri = 'https://{0}/api/node/class/eventRecord.json?order-by={1}&query-target-filter={2}'.format(
+            self.apic_address, faults.time_order('eventRecord', faults.EVENT_TIME), faults.join_filters(
+                [faults.time_filter('eventRecord', faults.EVENT_TIME, since), faults.prefix_filter(prefix)]))
+        for page in self.iter_pages(uri, faults.PAGE_SIZE):
+            # The APIC matches the prefix anywhere in the DN
+            yield [mo['eventRecord']['attributes'] for mo in page['imdata']
+                   if mo['eventRecord']['attributes']['affected'].startswith(prefix)]
+
+    def class_count(self, mo_class):
+        """Returns the number of objects of a class."""
+        uri = 'https://{0}/api/node/class/{1}.json?rsp-subtree-include=count'.format(self.apic_address, mo_class)
+        imdata = self.get_page(uri)[0]['imdata']
+        if not imdata:
+            return 0
+        return int(imdata[0]['moCount']['attributes']['count'])
+
+    def class_dns(self, mo_class):
+        """Returns the DNs of the objects of a class, read without their other properties."""
+        uri = 'https://{0}/api/node/class/{1}.json?rsp-prop-include=naming-only'.format(self.apic_address, mo_class)
+        return [mo[mo_class]['attributes']['dn'] for mo in self.iter_query(uri)]
+
+    def changed(self, mo_class, since):
+        """
+        Returns ([objects whose modTs is not older than since, compared to the second], number of objects of the class).
+
+        The class is read newest first, a page at a time until an older object, so the count comes with the
+        first page instead of a count query.
+        """
+        uri = 'https://{0}/api/node/class/{1}.json?order-by={1}.modTs|desc'.format(self.apic_address, mo_class)
+        found = []
+        page = 0
+        while True:
+            body, count = self.get_page('{0}&page={1}&page-size={2}'.format(uri, page, CHANGED_PAGE_SIZE))
+            for mo in body['imdata']:
+                if mo[mo_class]['attributes']['modTs'][:19] < since[:19]:
+                    return found, count
+                found.append(mo)
+            page += 1
+            if page * CHANGED_PAGE_SIZE >= count:
+                return found, count
+
+    def lookup_endpoints(self, address):
+        """Returns the Endpoints of a MAC or IP address with queries filtered by the APIC."""
+        mac = endpoints.normalize_mac(address)
+        if mac:
+            query = ENDPOINT_QUERY._replace(filter='eq(fvCEp.mac,"{0}")'.format(mac))
+            return [endpoints.parse(mo) for mo in self.fetch(query)]
+        ip = endpoints.normalize_ip(address)
+        if not ip:
+            return []
+        # Secondary addresses are only in the fvIp children, so the endpoints are found by their fvIp
+        query = planner.Query('class/fvIp', filter='eq(fvIp.addr,"{0}")'.format(ip))
+        endpoint_dns = {dn_parser.parent_dn(mo['fvIp']['attributes']['dn']) for mo in self.fetch(query)}
+        found = []
+        for endpoint_dn in sorted(endpoint_dns):
+            if dn_parser.rn(endpoint_dn).startswith('cep-'):
+                query = planner.Query('mo/' + endpoint_dn, subtree='children',
+                                      subtree_classes=endpoints.ENDPOINT_CHILDREN)
+                found.extend(endpoints.parse(mo) for mo in self.fetch(query))
+        return found
+
+    def load_endpoints(self):
+        """
+        Returns (endpoint table, endpoints fetched), loading the table on first use.
+
+        A loaded table is refreshed with the endpoints whose modTs is not older than the newest
+        in the table. If the APIC then counts fewer endpoints, only the DNs of the endpoints are
+        read and those no longer there are removed; the table is loaded again only if the counts
+        still differ.
+        """
+        endpoint_table = self.endpoint_table
+        if endpoint_table is not None and endpoint_table.newest:
+            # Without the time zone, a '+' in a URL reads as a space
+            query = ENDPOINT_QUERY._replace(filter='ge(fvCEp.modTs,"{0}")'.format(endpoint_table.newest[:19]))
+            fetched = endpoint_table.update(endpoints.parse(mo) for mo in self.fetch(query))
+            count = self.class_count('fvCEp')
+            if count != len(endpoint_table):
+                endpoint_dns = set(self.class_dns('fvCEp'))
+                for endpoint_dn in set(endpoint_table.entries) - endpoint_dns:
+                    endpoint_table.remove(endpoint_dn)
+                count = len(endpoint_dns)
+            if count == len(endpoint_table):
+                return endpoint_table, fetched
+        endpoint_table = endpoints.EndpointTable()
+        fetched = endpoint_table.update(endpoints.parse(mo) for mo in self.fetch(ENDPOINT_QUERY))
+        self.endpoint_table = endpoint_table
+        return endpoint_table, fetched
+
+    def snapshot_dn(self, snapshot_id):
+        """Returns the DN of a snapshot handle or DN seen by get_snapshots(), '' if unknown."""
+        if snapshot_id in self.snapshots:
+            return snapshot_id
+        for dn, handle in self.snapshot_ids.items():
+            if str(handle) == snapshot_id:
+                return dn
+        return ''
+
+    def iter_interface_rows(self, target_node=''):
+        """
+        Yields the rows of the interface table as l1PhysIf pages arrive.
+
+        Only the selector expansions and the ethpmPhysIf state are kept in memory, as compact
+        tuples; interfaces configured by a selector but without l1PhysIf come last. Only the
+        interfaces of target_node if given.
+        """
+        leaf_nodes = set(self.get_leaf_nodes(target_node))
+        policies = {row[0]: row for row in self.get_selector_rows(target_node)}
+
+        # format:
+        # {104146: ('up', '10G', 'full'), }
+        #
+        oper = {}
+        for rows in self.iter_leaf_rows('ethpmPhysIf', parallel.parse_ethpm_phys_if, leaf_nodes):
+            for key, node, oper_st, oper_speed, oper_duplex in rows:
+                if node in leaf_nodes:
+                    oper[key] = (oper_st, oper_speed, oper_duplex)
+
+        for rows in self.iter_leaf_rows('l1PhysIf', parallel.parse_l1_phys_if, leaf_nodes):
+            for key, node, pod, intf_id, port_t, usage, descr in rows:
+                if node in leaf_nodes:
+                    port_sr_name = policy_group = ''
+                    if key in policies:
+                        _, node, intf_id, port_sr_name, policy_group = policies.pop(key)
+                    yield (pod, node, intf_id, port_t, usage, descr) + oper.get(key, ('-', '-', '-')) + \
+                          (port_sr_name, policy_group)
+
+        for key, node, intf_id, port_sr_name, policy_group in sorted(policies.values()):
+            yield ('', node, intf_id, '-', '-', '') + oper.get(key, ('-', '-', '-')) + (port_sr_name, policy_group)
+
+    def iter_binding_rows(self):
+        """Yields one row per static path of every EPG."""
+        for epg in self.iter_epgs('ALL'):
+            for row in self.iter_path_rows(epg):
+                yield row
+
+    def iter_path_rows(self, epg):
+        """Yields one row per static path of an EPG dict from iter_epgs()."""
+        for path in epg['paths']:
+            if 'vpc' in path:
+                path_row = ('vpc', path['protpaths'].replace('protpaths-', ''), '', path['vpc'])
+            elif 'pc' in path:
+                path_row = ('pc', path['node'], '', path['pc'])
+            else:
+                path_row = ('port', path['node'], path['intf_id'], '')
+            yield (epg['tn'], epg['ap'], epg['epg_name'], epg['bd']) + path_row + (path['encap'], path['mode'])
+
+    def iter_ipg_rows(self):
+        ipgs = self.get_ipgs()
+        for name in sorted(ipgs):
+            ipg = ipgs[name]
+            yield (name, ) + tuple(ipg.get(field, '-') for field, _ in export.IPG_FIELDS[1:])
+
+    def iter_vlan_pool_rows(self):
+        for pool in self.get_vlan_pools():
+            yield pool['name'], pool['alloc'], pool['from_vlan'], pool['to_vlan'], ','.join(pool['domains'])
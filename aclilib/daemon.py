@@ -0,0 +1,258 @@
+"""
+Local daemon sharing fabric sessions and datasets between CLI clients.
+
+AcliDaemon listens on a Unix socket and keeps one logged in shell per fabric,
+created on the first request by shell_factory(fabric). Clients send one JSON
+line {"fabric": ..., "command": ...} and read one JSON line back with the
+output of the command, the age in seconds of the data it was rendered from
+and whether that data came from memory.
+
+Each shell reads its interface table, EPGs, policy groups, AEPs and VLAN
+pools from a datasets.DatasetCache, which a refresh thread brings up to date
+by modTs delta every refresh_interval seconds. Every request is rendered from
+the current data. Requests for the same fabric run one at a time; fabrics do
+not wait for each other. Only show and explain commands are served, and the
+output of explain lists the datasets the daemon holds.
+"""
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+
+from aclilib import datasets
+
+DEFAULT_SOCKET = os.path.join(os.path.expanduser('~'), '.acli.sock')
+# Seconds
+REFRESH_INTERVAL = 60.0
+
+SERVED_COMMANDS = ('show', 'explain')
+
+
+class DaemonError(Exception):
+    pass
+
+
+def normalize(command):
+    return ' '.join(command.split())
+
+
+class ThreadStdout(object):
+    """
+    sys.stdout that writes to a buffer in threads running capture() and to stream in the others.
+
+    Commands print their output, and the shells of several fabrics print at the same time.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def target(self):
+        buffer = getattr(self.local, 'buffer', None)
+        return self.stream if buffer is None else buffer
+
+    def write(self, text):
+        return self.target().write(text)
+
+    def flush(self):
+        self.target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    @contextmanager
+    def capture(self):
+        self.local.buffer = buffer = io.StringIO()
+        try:
+            yield buffer
+        finally:
+            self.local.buffer = None
+
+
+class FabricState(object):
+    """The shell of one fabric, its datasets and the lock its commands run under."""
+
+    def __init__(self, name):
+        self.name = name
+        self.shell = None
+        self.cache = None
+        self.lock = threading.Lock()
+
+
+class AcliDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, shell_factory, socket_path=DEFAULT_SOCKET, refresh_interval=REFRESH_INTERVAL):
+        if os.path.exists(socket_path):
+            try:
+                request(socket_path, '', 'ping')
+            except (OSError, DaemonError):
+                os.unlink(socket_path)
+            else:
+                raise DaemonError('an ACLI daemon is already listening on {0}'.format(socket_path))
+        # The socket is created owner only, there is no moment other users could connect
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_path, DaemonHandler)
+        finally:
+            os.umask(umask)
+        self.shell_factory = shell_factory
+        self.socket_path = socket_path
+        self.refresh_interval = refresh_interval
+        self.fabrics = {}
+        self.requests = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.stdout = None
+        self.stopped = threading.Event()
+        self.refresher = threading.Thread(target=self.refresh_loop, name='acli-refresh', daemon=True)
+
+    def serve(self):
+        self.stdout = sys.stdout = ThreadStdout(sys.stdout)
+        self.refresher.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.stopped.set()
+            self.server_close()
+            os.unlink(self.socket_path)
+            sys.stdout = self.stdout.stream
+
+    def stop(self):
+        self.stopped.set()
+        self.shutdown()
+
+    def fabric(self, name):
+        with self.lock:
+            if name not in self.fabrics:
+                self.fabrics[name] = FabricState(name)
+            return self.fabrics[name]
+
+    def login(self, state):
+        """Creates the shell of a fabric on its first request. Holds the fabric lock."""
+        if state.shell is None:
+            shell = self.shell_factory(state.name)
+            # Interface state changes are patched into dict tables
+            shell.client.columnar = False
+            state.cache = shell.client.fabric_cache = datasets.DatasetCache(shell.client)
+            state.shell = shell
+
+    def execute(self, name, command):
+        """Returns (output, age, cached) of a command on a fabric, age and cached of the datasets it read."""
+        command = normalize(command)
+        if command.split(' ', 1)[0] not in SERVED_COMMANDS:
+            raise DaemonError('only {0} commands are served by the daemon'.format(', '.join(SERVED_COMMANDS)))
+        state = self.fabric(name)
+        with state.lock:
+            self.login(state)
+            if command.startswith('explain '):
+                output = self.explain(state) + self.run(state, command)
+                age, cached = 0.0, False
+            else:
+                state.cache.begin()
+                output = self.run(state, command)
+                reads = state.cache.reads
+                cached = bool(reads) and all(reads.values())
+                now = time.time()
+                age = max([now - state.cache.loaded[dataset] for dataset, hit in reads.items()
+                           if hit and dataset in state.cache.loaded] or [0.0])
+        with self.lock:
+            self.requests += 1
+            self.hits += cached
+        return output, age, cached
+
+    def explain(self, state):
+        """Returns the note explain output starts with, listing the datasets held for the fabric."""
+        now = time.time()
+        held = ['{0} ({1:.0f}s old)'.format(dataset, now - stamp)
+                for dataset, stamp in sorted(state.cache.loaded.items())]
+        if not held:
+            return 'The daemon holds no datasets of this fabric yet, show commands load those they read\n'
+        return 'The daemon holds {0}; show commands read them from memory instead of their queries\n'.format(
+            ', '.join(held))
+
+    def run(self, state, command):
+        """Runs a command on the fabric shell and returns its output. Holds the fabric lock."""
+        # Outside serve() only the calling thread prints
+        capture = redirect_stdout(io.StringIO()) if self.stdout is None else self.stdout.capture()
+        with capture as buffer:
+            state.shell.onecmd(command)
+        return buffer.getvalue()
+
+    def refresh_loop(self):
+        while not self.stopped.wait(self.refresh_interval):
+            with self.lock:
+                states = list(self.fabrics.values())
+            for state in states:
+                if self.stopped.is_set():
+                    return
+                with state.lock:
+                    if state.cache is not None:
+                        try:
+                            state.cache.refresh()
+                        except Exception as error:
+                            print('ERROR: refresh of {0} failed, keeping its data: {1}'.format(state.name, error))
+
+    def status(self):
+        with self.lock:
+            return {'fabrics': {name: sorted(state.cache.datasets) if state.cache else []
+                                for name, state in self.fabrics.items()},
+                    'requests': self.requests, 'hits': self.hits}
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                message = json.loads(line.decode('utf-8'))
+                if message.get('command') == 'ping':
+                    reply = self.server.status()
+                else:
+                    output, age, cached = self.server.execute(message['fabric'], message['command'])
+                    reply = {'output': output, 'age': age, 'cached': cached}
+            except Exception as error:
+                reply = {'error': str(error)}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class DaemonClient(object):
+    """Connection to an AcliDaemon, requests are sent one at a time."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.fh = self.sock.makefile('rb')
+
+    def request(self, fabric, command):
+        """Returns the reply of the daemon, raises DaemonError if it reports an error."""
+        message = {'fabric': fabric, 'command': command}
+        self.sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        line = self.fh.readline()
+        if not line:
+            raise DaemonError('connection closed by the daemon')
+        reply = json.loads(line.decode('utf-8'))
+        if 'error' in reply:
+            raise DaemonError(reply['error'])
+        return reply
+
+    def close(self):
+        self.fh.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def request(socket_path, fabric, command):
+    """Sends one command over a new connection and returns the reply."""
+    with DaemonClient(socket_path) as client:
+        return client.request(fabric, command)
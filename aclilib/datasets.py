@@ -0,0 +1,205 @@
+"""
+Fabric datasets kept in memory and current by modTs deltas.
+
+DatasetCache holds the datasets most show commands are rendered from: the
+interface table, the EPGs with their static paths, the policy groups, AEPs
+and VLAN pools. Each is loaded on first use. refresh() then reads each class
+the dataset is built from newest first by modTs, only down to the newest
+object seen; the class count that notices deletions comes with that query.
+Interface state changes are patched into the loaded table and changed EPGs
+are fetched again; the DNs of the EPG classes are kept, so when a count
+drops only the DNs are read to find the EPGs that lost objects. Other
+changes load the dataset again. Reloads update the dicts and lists in place,
+so references held by a shell stay current.
+"""
+import time
+
+from aclilib import client as apic_client
+from aclilib import dn as dn_parser
+from aclilib import parallel
+
+# Classes each dataset is built from
+DATASET_CLASSES = {
+    'interfaces': ('l1PhysIf', 'ethpmPhysIf', 'fabricNode') + apic_client.ACCESS_POLICY_QUERY.target_classes +
+                  apic_client.ACCESS_POLICY_QUERY.subtree_classes,
+    'epgs': ('fvAEPg', 'fvRsPathAtt', 'fvRsDomAtt', 'fvRsBd', 'tagInst'),
+    'ipgs': ('infraAccPortGrp', 'infraAccBndlGrp', 'infraRsAttEntP', 'infraRsHIfPol', 'infraRsStpIfPol',
+             'infraRsMcpIfPol', 'infraRsCdpIfPol', 'infraRsL2IfPol', 'infraRsLldpIfPol', 'infraRsLacpPol'),
+    'aeps': ('infraAttEntityP', 'infraRsDomP'),
+    'vlan_pools': ('fvnsVlanInstP', 'fvnsEncapBlk', 'fvnsRtVlanNs'),
+}
+# Datasets not read for this many refreshes are dropped
+IDLE_REFRESHES = 10
+
+
+def epg_dn(epg):
+    """Returns the DN of an EPG dict of ApicClient.iter_epgs()."""
+    return 'uni/tn-{0}/ap-{1}/epg-{2}'.format(epg['tn'], epg['ap'], epg['epg_name'])
+
+
+class DatasetCache(object):
+    """
+    The datasets of one fabric, read with get() and kept current with refresh().
+
+    client is the logged in ApicClient the datasets are collected with. It must build dict
+    interface tables (columnar off) for interface changes to be patched.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.datasets = {}
+        # {dataset: time of the last load or refresh}
+        self.loaded = {}
+        # {dataset: refresh count when last read}
+        self.used = {}
+        # {dataset: {class: (newest modTs, {dn: modTs} of the objects in that second, count)}}
+        self.marks = {}
+        # {class: {dn}} of the EPG classes
+        self.epg_members = {}
+        # {dataset: True if it was in memory} of the datasets read since begin()
+        self.reads = {}
+        self.refreshes = 0
+
+    def begin(self):
+        """Starts recording the datasets read, in reads."""
+        self.reads = {}
+
+    def get(self, name):
+        """Returns a dataset, loading it on first use."""
+        self.reads.setdefault(name, name in self.datasets)
+        if name not in self.datasets:
+            self.load(name)
+        self.used[name] = self.refreshes
+        return self.datasets[name]
+
+    def load(self, name):
+        # Marks are taken first, so changes made while the dataset loads are fetched again
+        self.marks[name] = {mo_class: self.mark(mo_class) for mo_class in DATASET_CLASSES[name]}
+        if name == 'interfaces':
+            data = self.client.interface_table()
+        elif name == 'epgs':
+            self.epg_members = {mo_class: set(self.client.class_dns(mo_class)) for mo_class in DATASET_CLASSES[name]}
+            data = sorted(self.client.iter_epgs('ALL'), key=epg_dn)
+        elif name == 'ipgs':
+            data = self.client.get_ipgs()
+        elif name == 'aeps':
+            data = self.client.get_aeps()
+        else:
+            data = self.client.get_vlan_pools()
+        current = self.datasets.get(name)
+        if isinstance(current, dict) and isinstance(data, dict):
+            current.clear()
+            current.update(data)
+        elif isinstance(current, list):
+            current[:] = data
+        else:
+            self.datasets[name] = data
+        self.loaded[name] = time.time()
+
+    def mark(self, mo_class):
+        newest = self.client.newest(mo_class, 'modTs')
+        if not newest:
+            return newest, {}, 0
+        items, count = self.changed(mo_class, newest)
+        return newest, {dn: mod_ts for dn, mod_ts, _ in items}, count
+
+    def changed(self, mo_class, since):
+        """Returns ([(dn, modTs, object)] of a class changed since a modTs, to the second, class count)."""
+        mos, count = self.client.changed(mo_class, since)
+        return [(mo[mo_class]['attributes']['dn'], mo[mo_class]['attributes']['modTs'], mo) for mo in mos], count
+
+    def refresh(self):
+        """
+        Brings the loaded datasets up to date, returns {dataset: 'patched' or 'reloaded'} of those that changed.
+
+        Datasets not read for IDLE_REFRESHES refreshes are dropped.
+        """
+        self.refreshes += 1
+        result = {}
+        for name in list(self.datasets):
+            if self.refreshes - self.used.get(name, 0) > IDLE_REFRESHES:
+                self.drop(name)
+                continue
+            changes = {}
+            counted = {}
+            for mo_class, (newest, seen, count) in self.marks[name].items():
+                items, new_count = self.changed(mo_class, newest)
+                found = [item for item in items if seen.get(item[0]) != item[1]]
+                if found:
+                    newest = max(newest, max(mod_ts for _, mod_ts, _ in found))
+                    changes[mo_class] = [mo for _, _, mo in found]
+                seen = {dn: mod_ts for dn, mod_ts, _ in items if mod_ts[:19] == newest[:19]}
+                if new_count != count:
+                    counted[mo_class] = new_count
+                self.marks[name][mo_class] = (newest, seen, new_count)
+            if not self.patch(name, changes, counted):
+                self.load(name)
+                result[name] = 'reloaded'
+            elif changes or counted:
+                result[name] = 'patched'
+            self.loaded[name] = time.time()
+        return result
+
+    def drop(self, name):
+        for store in (self.datasets, self.loaded, self.used, self.marks):
+            store.pop(name, None)
+        if name == 'epgs':
+            self.epg_members = {}
+
+    def patch(self, name, changes, counted):
+        """
+        Applies the changes to a loaded dataset, returns False if it has to be loaded again.
+
+        changes are {class: [changed objects]}, counted {class: count} of the classes whose count changed.
+        """
+        if name == 'epgs':
+            return self.patch_epgs(changes, counted)
+        if not changes and not counted:
+            return True
+        if name == 'interfaces' and not counted:
+            return self.patch_interfaces(changes)
+        return False
+
+    def patch_interfaces(self, changes):
+        idict = self.datasets['interfaces']
+        if not isinstance(idict, dict) or set(changes) - {'l1PhysIf', 'ethpmPhysIf'}:
+            return False
+        leaf_nodes = {row['node'] for row in idict.values()}
+        for key, node, _, _, port_t, usage, descr in parallel.parse_l1_phys_if(
+                {'imdata': changes.get('l1PhysIf', [])}):
+            if node not in leaf_nodes:
+                continue
+            if key not in idict:
+                return False
+            idict[key].update({'portT': port_t, 'usage': usage, 'descr': descr})
+        for key, node, oper_st, oper_speed, oper_duplex in parallel.parse_ethpm_phys_if(
+                {'imdata': changes.get('ethpmPhysIf', [])}):
+            if key in idict:
+                idict[key].update({'operSt': oper_st, 'operSpeed': oper_speed, 'operDuplex': oper_duplex})
+        return True
+
+    def patch_epgs(self, changes, counted):
+        """Fetches the EPGs with changed or removed objects again, with their children."""
+        changed_dns = set()
+        for mo_class, mos in changes.items():
+            for mo in mos:
+                dn = mo[mo_class]['attributes']['dn']
+                self.epg_members[mo_class].add(dn)
+                changed_dns.add(dn if mo_class == 'fvAEPg' else dn_parser.parent_dn(dn))
+        for mo_class, count in counted.items():
+            if count != len(self.epg_members[mo_class]):
+                current = set(self.client.class_dns(mo_class))
+                for dn in self.epg_members[mo_class] - current:
+                    changed_dns.add(dn if mo_class == 'fvAEPg' else dn_parser.parent_dn(dn))
+                self.epg_members[mo_class] = current
+
+        epgs = self.datasets['epgs']
+        fetched = {}
+        for dn in changed_dns:
+            if dn_parser.rn(dn).startswith('epg-'):
+                fetched[dn] = self.client.get_epg(dn)
+        if not fetched:
+            return True
+        kept = [epg for epg in epgs if epg_dn(epg) not in fetched]
+        epgs[:] = sorted(kept + [epg for epg in fetched.values() if epg is not None], key=epg_dn)
+        return True
@@ -0,0 +1,141 @@
+"""
+Helpers for APIC distinguished names.
+
+A DN is a '/' separated list of relative names (RNs). An RN may embed another
+DN in square brackets, e.g. 'topology/pod-1/node-101/sys/phys-[eth1/1]', so a
+plain dn.split('/') is not safe when walking the tree.
+
+parse() splits a DN once into the components used by the collectors and
+memoises the result, as the same DNs are seen many times per refresh.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Number of parsed DNs kept by parse() and rn_value()
+DN_CACHE_SIZE = 1 << 17
+
+RN_PREFIX = re.compile(r'([A-Za-z0-9]+)-(.*)$', re.S)
+ETH_INTERFACE = re.compile(r'\[?eth(\d+)/(\d+)(?:/(\d+))?\]?$')
+# FEX ids start at 101, ethA/B/C with a lower A is the sub-port C of the breakout port A/B
+MIN_FEX_ID = 101
+
+_DnParts = namedtuple('DnParts', ['tenant', 'ap', 'epg', 'bd', 'pod', 'node', 'fex', 'module', 'port', 'sub_port',
+                                  'protpaths', 'pathep', 'intf_id'])
+
+
+class DnParts(_DnParts):
+    """
+    Components of a DN, '' when not present.
+
+    node is set from 'node-101' and 'paths-101', protpaths holds '101-102' of a vPC path,
+    pathep the bracket content of 'pathep-[...]'. For interfaces (phys-[eth..], pathep-[eth..]
+    or the if-[eth..] of LLDP and CDP) fex, module and port are set, fex is '0' for leaf ports.
+    sub_port is set for the sub-ports of breakout ports, e.g. 'eth1/49/2', '' otherwise.
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """Packed interface key used by the interface table, 0 if the DN has no interface."""
+        if not self.port:
+            return 0
+        return interface_key(self.node, self.fex, self.module, self.port, self.sub_port or 0)
+
+
+def interface_key(node, fex, module, port, sub_port=0):
+    """
+    Returns the packed key of an interface, node * 1000000 + fex * 1000 + module * 100 + port.
+
+    Breakout sub-ports take the place of the FEX id, which is never below MIN_FEX_ID.
+    """
+    return int(node) * 1000000 + (int(fex) + int(sub_port)) * 1000 + int(module) * 100 + int(port)
+
+
+def split_rns(dn):
+    """Splits a DN into its RNs, ignoring '/' inside square brackets."""
+    if '[' not in dn:
+        return dn.split('/')
+
+    rns = []
+    depth = 0
+    start = 0
+    for pos, char in enumerate(dn):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == '/' and depth == 0:
+            rns.append(dn[start:pos])
+            start = pos + 1
+    rns.append(dn[start:])
+    return rns
+
+
+def parent_dn(dn):
+    """Returns the DN of the parent object, '' for a top level object."""
+    return '/'.join(split_rns(dn)[:-1])
+
+
+def rn(dn):
+    """Returns the last RN of a DN."""
+    return split_rns(dn)[-1]
+
+
+def domain_name(dn):
+    """Returns the RNs of a domain DN below uni, e.g. 'uni/vmmp-VMware/dom-DVS1' -> 'vmmp-VMware/dom-DVS1'."""
+    return dn[len('uni/'):] if dn.startswith('uni/') else dn
+
+
+@lru_cache(maxsize=DN_CACHE_SIZE)
+def rn_value(dn, prefix):
+    """Returns the naming value of the first RN of dn starting with '<prefix>-', e.g. ('uni/infra/nprof-LF1', 'nprof') -> 'LF1'."""
+    for item in split_rns(dn):
+        match = RN_PREFIX.match(item)
+        if match and match.group(1) == prefix:
+            return match.group(2)
+    return ''
+
+
+@lru_cache(maxsize=DN_CACHE_SIZE)
+def parse(dn):
+    """Returns the DnParts of a DN."""
+    values = dict.fromkeys(_DnParts._fields, '')
+    interface = ''
+    for item in split_rns(dn):
+        match = RN_PREFIX.match(item)
+        if not match:
+            continue
+        prefix, value = match.groups()
+        if prefix == 'tn':
+            values['tenant'] = value
+        elif prefix == 'ap':
+            values['ap'] = value
+        elif prefix == 'epg':
+            values['epg'] = value
+        elif prefix == 'BD':
+            values['bd'] = value
+        elif prefix == 'pod':
+            values['pod'] = value
+        elif prefix in ('node', 'paths'):
+            values['node'] = value
+        elif prefix == 'protpaths':
+            values['protpaths'] = value
+        elif prefix == 'extpaths':
+            values['fex'] = value
+        elif prefix == 'pathep':
+            values['pathep'] = value[1:-1]
+            interface = value
+        elif prefix in ('phys', 'if'):
+            interface = value
+
+    match = ETH_INTERFACE.match(interface) if interface else None
+    if match:
+        first, second, third = match.groups()
+        if third and int(first) >= MIN_FEX_ID:
+            values['fex'], values['module'], values['port'] = first, second, third
+        else:
+            values['module'], values['port'], values['sub_port'] = first, second, third or ''
+            values['fex'] = values['fex'] or '0'
+        values['intf_id'] = interface.strip('[]')[3:]
+    return DnParts(**values)
@@ -0,0 +1,111 @@
+"""
+Encap validation of static path bindings.
+
+A binding's VLAN is only deployed when the APIC can resolve it: the
+interface's policy group points to an AEP, the AEP carries some of the EPG's
+domains and the VLAN pools of those domains contain the VLAN. EncapGraph
+precomputes that chain from the collected interface table, policy groups,
+AEPs and VLAN pools. Each domain's pools become one bit mask of VLANs, and
+the mask a binding is checked against is computed once per AEP and EPG domain
+set, so audit() validates all bindings in one pass with a bit test each.
+"""
+from collections import namedtuple
+
+Finding = namedtuple('Finding', ['tenant', 'app_profile', 'epg', 'path', 'encap', 'policy_group', 'aep', 'problem'])
+
+
+def vlan_mask(from_vlan, to_vlan):
+    """Returns the bit mask of the VLANs from_vlan to to_vlan, bit N is VLAN N."""
+    return ((1 << (to_vlan - from_vlan + 1)) - 1) << from_vlan
+
+
+def path_label(path):
+    """Returns the path of an EPG path dict as shown in the audit, e.g. '101 1/10' or '101-102 VPC_1'."""
+    if 'vpc' in path:
+        return '{0} {1}'.format(path['protpaths'].replace('protpaths-', ''), path['vpc'])
+    if 'pc' in path:
+        return '{0} {1}'.format(path['node'], path['pc'])
+    return '{0} {1}'.format(path['node'], path['intf_id'])
+
+
+class EncapGraph(object):
+    """
+    interface key -> policy group -> AEP -> domains -> VLANs.
+
+    idict is the interface table, ipgs the policy groups of ApicClient.get_ipgs(), aeps
+    {aep: [domains]} of ApicClient.get_aeps() and vlan_pools the encap blocks of
+    ApicClient.get_vlan_pools(). Domains are named like the EPG domains by dn.domain_name(), e.g.
+    'phys-PHYS_1' or 'vmmp-VMware/dom-DVS1'.
+    """
+
+    def __init__(self, idict, ipgs, aeps, vlan_pools):
+        self.interface_groups = {key: intf['policy_group'] for key, intf in idict.items()}
+        self.group_aeps = {name: ipg['aep'] for name, ipg in ipgs.items()}
+        self.aep_domains = {aep: frozenset(domains) for aep, domains in aeps.items()}
+        self.domain_vlans = {}
+        for pool in vlan_pools:
+            mask = vlan_mask(pool['from_vlan'], pool['to_vlan'])
+            for domain in pool['domains']:
+                self.domain_vlans[domain] = self.domain_vlans.get(domain, 0) | mask
+        # {(aep, EPG domains): (domains in both, VLAN mask)}
+        self.allowed = {}
+
+    def policy_group(self, path):
+        """Returns the policy group of an EPG path dict, None for a port missing from the interface table."""
+        if 'vpc' in path:
+            return path['vpc']
+        if 'pc' in path:
+            return path['pc']
+        return self.interface_groups.get(path['idx'])
+
+    def resolve(self, aep, epg_domains):
+        """Returns (domains of both the AEP and the EPG, mask of the VLANs their pools allow)."""
+        key = (aep, epg_domains)
+        if key not in self.allowed:
+            common = self.aep_domains[aep] & epg_domains
+            mask = 0
+            for domain in common:
+                mask |= self.domain_vlans.get(domain, 0)
+            self.allowed[key] = (common, mask)
+        return self.allowed[key]
+
+    def check(self, path, epg_domains):
+        """Returns (policy group, AEP, problem) of a binding, problem '' if its encap resolves."""
+        policy_group = self.policy_group(path)
+        if policy_group is None:
+            return '', '', 'interface not found'
+        if not policy_group:
+            return '', '', 'interface has no policy group'
+        aep = self.group_aeps.get(policy_group)
+        if aep is None:
+            return policy_group, '', 'policy group not found'
+        if aep == '-':
+            return policy_group, '', 'policy group has no AEP'
+        if aep not in self.aep_domains:
+            return policy_group, aep, 'AEP not found'
+        if not epg_domains:
+            return policy_group, aep, 'EPG has no domain'
+        encap = path['encap']
+        if not encap.isdigit():
+            return policy_group, aep, 'encap {0} is not a VLAN'.format(encap)
+        common, mask = self.resolve(aep, epg_domains)
+        if not common:
+            return policy_group, aep, 'AEP has none of the EPG domains {0}'.format(','.join(sorted(epg_domains)))
+        if not mask >> int(encap) & 1:
+            return policy_group, aep, 'VLAN {0} is not in the pools of {1}'.format(encap, ','.join(sorted(common)))
+        return policy_group, aep, ''
+
+
+def audit(graph, epgs):
+    """Returns (bindings checked, [Finding]) of the static paths of the EPG dicts of ApicClient.iter_epgs()."""
+    checked = 0
+    findings = []
+    for epg in epgs:
+        epg_domains = frozenset(epg['domains'])
+        for path in epg['paths']:
+            checked += 1
+            policy_group, aep, problem = graph.check(path, epg_domains)
+            if problem:
+                findings.append(Finding(epg['tn'], epg['ap'], epg['epg_name'], path_label(path), path['encap'],
+                                        policy_group, aep, problem))
+    return checked, findings
@@ -0,0 +1,126 @@
+"""
+Learned endpoints (fvCEp) and their lookup.
+
+A single MAC or IP is looked up with a filtered query, so the APIC returns
+only the matching endpoints. EndpointTable holds every endpoint of the
+fabric, which can be several hundred thousand, in hash indexes by MAC, IP,
+EPG and path, so repeated lookups are dict hits. It is kept current with
+modTs deltas: only endpoints changed since the newest modTs in the table are
+fetched again, and a count query tells when endpoints were removed, which are
+then found by reading the endpoint DNs alone.
+"""
+import ipaddress
+import re
+from collections import namedtuple
+
+from aclilib import dn as dn_parser
+
+Endpoint = namedtuple('Endpoint', ['mac', 'ips', 'tenant', 'app_profile', 'epg', 'encap', 'paths', 'mod_ts', 'dn'])
+
+# The children of an endpoint read with it
+ENDPOINT_CHILDREN = ('fvIp', 'fvRsCEpToPathEp')
+MAC_ADDRESS = re.compile(r'^[0-9A-Fa-f]{2}([:.-]?)(?:[0-9A-Fa-f]{2}\1){4}[0-9A-Fa-f]{2}$|^(?:[0-9A-Fa-f]{4}\.){2}'
+                         r'[0-9A-Fa-f]{4}$')
+
+
+def normalize_mac(text):
+    """Returns a MAC address in the APIC format, e.g. '00:50:56:AB:CD:EF', '' if text is not a MAC."""
+    if not MAC_ADDRESS.match(text):
+        return ''
+    digits = re.sub(r'[:.-]', '', text).upper()
+    return ':'.join(digits[pos:pos + 2] for pos in range(0, 12, 2))
+
+
+def normalize_ip(text):
+    """Returns an IPv4 or IPv6 address in its compressed format, '' if text is not an address."""
+    try:
+        return str(ipaddress.ip_address(text))
+    except ValueError:
+        return ''
+
+
+def path_key(t_dn):
+    """Returns the key a path is indexed by: the interface key of a port, the PC or vPC policy group name else."""
+    path = dn_parser.parse(t_dn)
+    return path.key if path.port else path.pathep
+
+
+def parse(mo):
+    """Returns the Endpoint of a fvCEp with its fvIp and fvRsCEpToPathEp children."""
+    attributes = mo['fvCEp']['attributes']
+    ips = []
+    paths = []
+    for child in mo['fvCEp'].get('children', []):
+        if 'fvIp' in child:
+            ips.append(child['fvIp']['attributes']['addr'])
+        elif 'fvRsCEpToPathEp' in child:
+            paths.append(child['fvRsCEpToPathEp']['attributes']['tDn'])
+    if attributes.get('ip') and attributes['ip'] != '0.0.0.0' and attributes['ip'] not in ips:
+        ips.insert(0, attributes['ip'])
+    parts = dn_parser.parse(attributes['dn'])
+    return Endpoint(attributes['mac'], tuple(ips), parts.tenant, parts.ap, parts.epg,
+                    attributes['encap'].replace('vlan-', ''), tuple(sorted(paths)), attributes['modTs'],
+                    attributes['dn'])
+
+
+class EndpointTable(object):
+    """Endpoints by DN, indexed by MAC, IP, (tenant, app profile, EPG) and path_key()."""
+
+    def __init__(self):
+        self.entries = {}
+        self.by_mac = {}
+        self.by_ip = {}
+        self.by_epg = {}
+        self.by_path = {}
+        # modTs of the newest endpoint, deltas are fetched from there
+        self.newest = ''
+
+    def __len__(self):
+        return len(self.entries)
+
+    def index_keys(self, endpoint):
+        """Yields (index, key) of every index entry of an endpoint."""
+        yield self.by_mac, endpoint.mac
+        for ip in endpoint.ips:
+            yield self.by_ip, ip
+        yield self.by_epg, (endpoint.tenant, endpoint.app_profile, endpoint.epg)
+        for t_dn in endpoint.paths:
+            yield self.by_path, path_key(t_dn)
+
+    def add(self, endpoint):
+        """Adds an endpoint, replacing the one with the same DN."""
+        self.remove(endpoint.dn)
+        self.entries[endpoint.dn] = endpoint
+        for index, key in self.index_keys(endpoint):
+            index.setdefault(key, set()).add(endpoint.dn)
+        if endpoint.mod_ts > self.newest:
+            self.newest = endpoint.mod_ts
+
+    def remove(self, dn):
+        endpoint = self.entries.pop(dn, None)
+        if endpoint is None:
+            return
+        for index, key in self.index_keys(endpoint):
+            dns = index[key]
+            dns.discard(dn)
+            if not dns:
+                del index[key]
+
+    def update(self, endpoints):
+        """Adds or replaces endpoints, returns how many."""
+        count = 0
+        for endpoint in endpoints:
+            self.add(endpoint)
+            count += 1
+        return count
+
+    def find(self, index, key):
+        """Returns the endpoints of an index key ordered by DN."""
+        return [self.entries[dn] for dn in sorted(index.get(key, ()))]
+
+    def lookup(self, address):
+        """Returns the endpoints of a MAC or IP address."""
+        mac = normalize_mac(address)
+        if mac:
+            return self.find(self.by_mac, mac)
+        return self.find(self.by_ip, normalize_ip(address))
@@ -0,0 +1,163 @@
+"""
+Explains the APIC queries of a command without running them.
+
+ExplainSession has the get/post/close interface of requests.Session. It
+answers each query with an empty first page whose totalCount comes from a
+cheap rsp-subtree-include=count query, and sizes it from a sample page of
+one object, so a collector pages through the query as it would for real
+while no objects are transferred. The other pages are only counted.
+Queries of FETCH_CLASSES, the pods and nodes that other queries fan out
+to, queries of a single object, such as the newest record a relative
+time counts back from, and count queries are sent as they are. POSTs other than logins are recorded, not sent.
+
+Queries answered from the results of a plan never reach the session; the
+client reports them with served() instead.
+"""
+import json
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+from aclilib.offline import OfflineResponse
+
+# Classes fetched in full, collectors read them to choose the other queries
+FETCH_CLASSES = ('fabricPod', 'fabricNode')
+# Parameters that only page or sort a query
+PAGING_PARAMS = ('page', 'page-size', 'order-by')
+# Parameters dropped from count queries
+COUNT_DROP_PARAMS = PAGING_PARAMS + ('rsp-subtree', 'rsp-subtree-class', 'rsp-subtree-include')
+
+SOURCE_APIC = 'apic'
+SOURCE_PLAN = 'plan'
+SOURCE_WRITE = 'write'
+
+
+def query_key(uri):
+    """Returns (path, params) of a query without its paging parameters."""
+    url = urlsplit(uri)
+    params = [(key, value) for key, value in parse_qsl(url.query, keep_blank_values=True)
+              if key not in PAGING_PARAMS]
+    return unquote(url.path), tuple(params)
+
+
+def describe(path, params):
+    """Returns {'class', 'scope', 'filter', 'subtree'} of a query path and parameters."""
+    params = dict(params)
+    path = path[len('/api/'):] if path.startswith('/api/') else path
+    if path.endswith('.json'):
+        path = path[:-5]
+    if path.startswith('node/'):
+        path = path[5:]
+    if path.startswith('class/'):
+        scope, _, mo_class = path[6:].rpartition('/')
+    else:
+        scope, mo_class = path[3:], params.get('target-subtree-class', '')
+        if params.get('query-target', 'self') != 'self':
+            scope = '{0} ({1})'.format(scope, params['query-target'])
+    subtree = params.get('rsp-subtree', 'no')
+    if params.get('rsp-subtree-class'):
+        subtree = '{0} ({1} classes)'.format(subtree, len(params['rsp-subtree-class'].split(',')))
+    if params.get('rsp-subtree-include') == 'health':
+        subtree += ' + health'
+    return {'class': mo_class, 'scope': scope or 'fabric', 'filter': params.get('query-target-filter', ''),
+            'subtree': subtree}
+
+
+class ExplainSession(object):
+    def __init__(self, session, fetch_classes=FETCH_CLASSES):
+        self.session = session
+        self.fetch_classes = fetch_classes
+        # {(path, params): query dict}, in the order the queries were first sent
+        self.queries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def record(self, key, source, uri, requests=1, **fields):
+        """
+        Adds requests to a query, recording it on first use, and returns the query dict.
+
+        fields are the totalCount of the query (total), the objects per page (page_size) and
+        the bytes per object (object_size); count and bytes are what the requests return.
+        """
+        with self.lock:
+            if key not in self.queries:
+                query = describe(*key)
+                query.update({'source': source, 'uri': uri, 'requests': 0, 'total': 0, 'page_size': 0,
+                              'object_size': 0})
+                self.queries[key] = query
+            query = self.queries[key]
+            query.update(fields)
+            query['requests'] += requests
+            query['count'] = query['total']
+            if query['page_size']:
+                query['count'] = min(query['total'], query['page_size'] * query['requests'])
+            query['bytes'] = query['count'] * query['object_size']
+            return query
+
+    def served(self, uri):
+        """Records a query answered from the results of a plan."""
+        key = query_key(uri)
+        with self.lock:
+            if key in self.queries:
+                return
+        self.record(key, SOURCE_PLAN, uri, requests=0)
+
+    def estimate(self, uri, **kwargs):
+        """Returns (object count, bytes per object) of a query from a count and a one object sample query."""
+        url = urlsplit(uri)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        base = '{0}://{1}{2}?'.format(url.scheme, url.netloc, url.path)
+
+        count_params = [(key, value) for key, value in params if key not in COUNT_DROP_PARAMS]
+        response = self.session.get(base + urlencode(count_params + [('rsp-subtree-include', 'count')]), **kwargs)
+        if response.status_code != 200:
+            return None, response
+        imdata = response.json().get('imdata', [])
+        count = int(imdata[0]['moCount']['attributes']['count']) if imdata else 0
+        if not count:
+            return (0, 0), response
+
+        sample_params = [(key, value) for key, value in params if key not in ('page', 'page-size')]
+        response = self.session.get(base + urlencode(sample_params + [('page', '0'), ('page-size', '1')]), **kwargs)
+        if response.status_code != 200:
+            return None, response
+        sample = response.json().get('imdata', [])
+        return (count, len(json.dumps(sample[0])) if sample else 0), response
+
+    def get(self, uri, **kwargs):
+        url = urlsplit(uri)
+        if url.path.endswith('/aaaRefresh.json'):
+            return self.session.get(uri, **kwargs)
+        key = query_key(uri)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        if int(params.get('page', 0)) > 0:
+            # Later pages of a query already counted
+            query = self.record(key, SOURCE_APIC, uri)
+            return OfflineResponse(200, {'totalCount': str(query['total']), 'imdata': []})
+
+        page_size = int(params.get('page-size', 0))
+        if describe(*key)['class'] in self.fetch_classes or page_size == 1 or \
+                params.get('rsp-subtree-include') == 'count':
+            response = self.session.get(uri, **kwargs)
+            if response.status_code == 200:
+                body = response.json()
+                object_size = len(response.content) // max(1, len(body.get('imdata', [])))
+                self.record(key, SOURCE_APIC, uri, total=int(body.get('totalCount', 0)), page_size=page_size,
+                            object_size=object_size)
+            return response
+
+        estimate, response = self.estimate(uri, **kwargs)
+        if estimate is None:
+            return response
+        total, object_size = estimate
+        self.record(key, SOURCE_APIC, uri, total=total, page_size=page_size, object_size=object_size)
+        return OfflineResponse(200, {'totalCount': str(total), 'imdata': []})
+
+    def post(self, uri, data=None, **kwargs):
+        path = unquote(urlsplit(uri).path)
+        if path.endswith('/aaaLogin.json') or path.endswith('/aaaRefresh.json'):
+            return self.session.post(uri, data=data, **kwargs)
+        self.record((path, ()), SOURCE_WRITE, uri, total=1, object_size=len(data or ''))
+        return OfflineResponse(200, {'totalCount': '0', 'imdata': []})
+
+    def close(self):
+        pass
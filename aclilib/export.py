@@ -0,0 +1,129 @@
+"""
+Row writers for the inventory export commands.
+
+open_writer() picks NDJSON, CSV or Parquet from the file extension. Rows are
+tuples in the order of the dataset fields and are written as they arrive;
+Parquet rows are buffered into row groups of ROW_GROUP_SIZE, so memory does
+not grow with the size of the export.
+
+Parquet requires pyarrow, HAVE_PYARROW is False when it is not installed.
+"""
+import csv
+import json
+import os
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+HAVE_PYARROW = pyarrow is not None
+
+FORMATS = {'.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv', '.parquet': 'parquet'}
+ROW_GROUP_SIZE = 10000
+
+# Dataset fields as (name, type)
+INTERFACE_FIELDS = [('pod', str), ('node', str), ('interface', str), ('topology', str), ('usage', str),
+                    ('description', str), ('state', str), ('speed', str), ('duplex', str), ('port_sr_name', str),
+                    ('policy_group', str)]
+BINDING_FIELDS = [('tenant', str), ('app_profile', str), ('epg', str), ('bd', str), ('path_type', str),
+                  ('node', str), ('interface', str), ('policy_group', str), ('encap', str), ('mode', str)]
+IPG_FIELDS = [('name', str), ('link_agg', str), ('aep', str), ('link_level', str), ('cdp', str), ('lldp', str),
+              ('mcp', str), ('stp', str), ('l2_intf', str), ('lacp', str)]
+VLAN_POOL_FIELDS = [('name', str), ('allocation', str), ('from_vlan', int), ('to_vlan', int), ('domains', str)]
+
+
+class ExportError(Exception):
+    pass
+
+
+def export_format(path):
+    """Returns the format of an export file from its extension, raises ExportError if it is not supported."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ExportError('unsupported file type {0!r}, use one of {1}'.format(extension, ', '.join(sorted(FORMATS))))
+    if FORMATS[extension] == 'parquet' and not HAVE_PYARROW:
+        raise ExportError('Parquet export requires pyarrow')
+    return FORMATS[extension]
+
+
+def open_writer(path, fields):
+    writers = {'ndjson': NdjsonWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+    return writers[export_format(path)](path, fields)
+
+
+class RowWriter(object):
+    def __init__(self, path, fields):
+        self.path = path
+        self.names = [name for name, _ in fields]
+        self.fields = fields
+        self.rows = 0
+
+    def write(self, row):
+        self.rows += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NdjsonWriter(RowWriter):
+    def __init__(self, path, fields):
+        RowWriter.__init__(self, path, fields)
+        self.fh = open(path, 'w')
+
+    def write(self, row):
+        RowWriter.write(self, row)
+        self.fh.write(json.dumps(dict(zip(self.names, row))))
+        self.fh.write('\n')
+
+    def close(self):
+        self.fh.close()
+
+
+class CsvWriter(RowWriter):
+    def __init__(self, path, fields):
+        RowWriter.__init__(self, path, fields)
+        self.fh = open(path, 'w', newline='')
+        self.writer = csv.writer(self.fh)
+        self.writer.writerow(self.names)
+
+    def write(self, row):
+        RowWriter.write(self, row)
+        self.writer.writerow(row)
+
+    def close(self):
+        self.fh.close()
+
+
+class ParquetWriter(RowWriter):
+    def __init__(self, path, fields, row_group_size=ROW_GROUP_SIZE):
+        RowWriter.__init__(self, path, fields)
+        types = {str: pyarrow.string(), int: pyarrow.int64()}
+        self.schema = pyarrow.schema([(name, types[field_type]) for name, field_type in fields])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self.buffer = []
+
+    def write(self, row):
+        RowWriter.write(self, row)
+        self.buffer.append(row)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            columns = [pyarrow.array(list(values), type=field.type)
+                       for values, field in zip(zip(*self.buffer), self.schema)]
+            self.writer.write_table(pyarrow.Table.from_arrays(columns, schema=self.schema))
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
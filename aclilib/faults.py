@@ -0,0 +1,121 @@
+"""
+Faults and events.
+
+faultInst and eventRecord are among the largest classes on an APIC, so the
+severity, scope and time filters built here are applied by the APIC and the
+results are read page by page in a stable order: ascending by time, then by
+DN, so records created while the pages are read land on later pages.
+
+FaultIndex aggregates the records as they stream by into counts per node
+and per interface, for the summaries printed after the records.
+"""
+import datetime
+import re
+from collections import Counter
+
+from aclilib import dn as dn_parser
+
+# Most to least severe
+SEVERITIES = ('critical', 'major', 'minor', 'warning', 'info', 'cleared')
+# Records requested per page, pages are printed as they arrive
+PAGE_SIZE = 1000
+# Window of 'show events' without since, before the newest event
+DEFAULT_EVENT_WINDOW = datetime.timedelta(days=1)
+
+FAULT_TIME = 'lastTransition'
+EVENT_TIME = 'created'
+# 'since' relative to the newest record, e.g. 30m, 12h, 7d
+RELATIVE_SINCE = re.compile(r'^(\d+)([mhd])$')
+SINCE_FORMATS = ('%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S')
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def severity_filter(severity):
+    """Returns the faultInst filter of severity and more severe faults, '' for all faults."""
+    if not severity:
+        return ''
+    wanted = SEVERITIES[:SEVERITIES.index(severity) + 1]
+    if len(wanted) == 1:
+        return 'eq(faultInst.severity,"{0}")'.format(wanted[0])
+    return 'or({0})'.format(','.join('eq(faultInst.severity,"{0}")'.format(item) for item in wanted))
+
+
+def parse_time(stamp):
+    """Returns the datetime of an APIC timestamp, e.g. '2020-05-19T18:58:23.000+00:00', in its own time zone."""
+    return datetime.datetime.strptime(stamp[:19], TIME_FORMAT)
+
+
+def parse_since(since, newest=''):
+    """
+    Returns the timestamp a since option stands for, raises ValueError if it is not valid.
+
+    since is a date, a date and time or a time before newest, the timestamp of the newest record.
+    """
+    match = RELATIVE_SINCE.match(since)
+    if match:
+        if not newest:
+            return ''
+        units = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+        delta = datetime.timedelta(**{units[match.group(2)]: int(match.group(1))})
+        return (parse_time(newest) - delta).strftime(TIME_FORMAT)
+    for time_format in SINCE_FORMATS:
+        try:
+            return datetime.datetime.strptime(since, time_format).strftime(TIME_FORMAT)
+        except ValueError:
+            continue
+    raise ValueError('since must be YYYY-MM-DD[THH:MM[:SS]] or a number of m, h or d, e.g. 12h')
+
+
+def time_filter(mo_class, prop, since):
+    return 'ge({0}.{1},"{2}")'.format(mo_class, prop, since) if since else ''
+
+
+def join_filters(filters):
+    filters = [item for item in filters if item]
+    if len(filters) > 1:
+        return 'and({0})'.format(','.join(filters))
+    return filters[0] if filters else ''
+
+
+def prefix_filter(prefix):
+    """Returns the eventRecord filter of a DN prefix, the part before any '[' as the APIC matches it."""
+    text = prefix.split('[', 1)[0]
+    return 'wcard(eventRecord.affected,"{0}")'.format(text) if text else ''
+
+
+def time_order(mo_class, prop):
+    return '{0}.{1}|asc,{0}.dn|asc'.format(mo_class, prop)
+
+
+class FaultIndex(object):
+    """Counts of streamed faults or events per node and severity and per interface."""
+
+    def __init__(self):
+        self.records = 0
+        self.nodes = Counter()
+        self.interfaces = Counter()
+
+    def add(self, dn, severity):
+        self.records += 1
+        parts = dn_parser.parse(dn)
+        node = parts.node or '-'
+        self.nodes[(node, severity)] += 1
+        if parts.port:
+            self.interfaces[(node, parts.intf_id)] += 1
+
+    def node_rows(self):
+        """Returns [(node, total, count per SEVERITIES)] ordered by node."""
+        totals = {}
+        for (node, severity), count in self.nodes.items():
+            row = totals.setdefault(node, Counter())
+            row[severity] += count
+        return [(node, sum(row.values())) + tuple(row[severity] for severity in SEVERITIES)
+                for node, row in sorted(totals.items(), key=lambda item: node_sort_key(item[0]))]
+
+    def top_interfaces(self, count=10):
+        """Returns [((node, interface), records)] of the interfaces with the most records."""
+        return self.interfaces.most_common(count)
+
+
+def node_sort_key(node):
+    return (0, int(node)) if node.isdigit() else (1, node)
@@ -0,0 +1,43 @@
+"""
+Health scores.
+
+With rsp-subtree-include=health the APIC returns every object of a query
+with its healthInst as a child, so a view gets the scores of its objects
+from the query it already sends. WorstN keeps the lowest scores of a stream
+of objects in a heap bounded to N entries.
+"""
+import heapq
+import itertools
+
+
+def score(body):
+    """Returns the current health score of an object body read with rsp-subtree-include=health, None without one."""
+    for child in body.get('children', ()):
+        if 'healthInst' in child:
+            return int(child['healthInst']['attributes']['cur'])
+    return None
+
+
+def format_score(value):
+    return '-' if value is None else str(value)
+
+
+class WorstN(object):
+    """The count lowest scores added, of equal scores the first ones."""
+
+    def __init__(self, count):
+        self.count = count
+        # (-score, -order, item), heap[0] is the highest score kept
+        self.heap = []
+        self.order = itertools.count()
+
+    def add(self, value, item):
+        entry = (-value, -next(self.order), item)
+        if len(self.heap) < self.count:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self):
+        """Returns [(score, item)], lowest score first."""
+        return [(-value, item) for value, _, item in sorted(self.heap, reverse=True)]
@@ -0,0 +1,374 @@
+"""
+In-memory copy of the APIC management information tree (MIT).
+
+Mit holds managed objects keyed by DN and answers the subset of the APIC REST
+query API used by ACLI: class and mo queries, query-target,
+target-subtree-class, query-target-filter, rsp-subtree, rsp-subtree-class,
+rsp-subtree-include=count and health, rsp-prop-include=naming-only, order-by
+and paging. It also accepts the hierarchical POST payloads used for
+configuration; objects get a modTs when they are added or posted.
+
+The mock APIC in benchmarks/ serves HTTP requests from a Mit.
+"""
+import datetime
+import gzip
+import json
+import re
+
+from aclilib.dn import parent_dn, rn
+
+ARCHIVE_FORMAT = 'acli-mit'
+ARCHIVE_VERSION = 1
+
+# RN templates used to name objects posted without 'dn' or 'rn'
+RN_FORMATS = {
+    'fvTenant': 'tn-{name}',
+    'fvAp': 'ap-{name}',
+    'fvAEPg': 'epg-{name}',
+    'fvRsPathAtt': 'rspathAtt-[{tDn}]',
+    'fvRsDomAtt': 'rsdomAtt-[{tDn}]',
+    'fvRsBd': 'rsbd',
+    'tagInst': 'tag-{name}',
+    'configExportP': 'configexp-{name}',
+}
+
+# modTs of objects added without one; objects changed by a POST get the time of the POST
+BASE_MOD_TS = '2020-01-01T00:00:00.000+00:00'
+
+FILTER_TOKEN = re.compile(r'\s*(?:(?P<string>"(?:[^"\\]|\\.)*")|(?P<punct>[(),])|(?P<word>[^(),"\s]+))')
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = FILTER_TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise FilterError('invalid filter near: {0}'.format(text[pos:]))
+        pos = match.end()
+        if match.group('string') is not None:
+            tokens.append(('string', match.group('string')[1:-1]))
+        elif match.group('punct') is not None:
+            tokens.append(('punct', match.group('punct')))
+        elif match.group('word') is not None:
+            tokens.append(('word', match.group('word')))
+    return tokens
+
+
+def _value(attributes, operand):
+    kind, value = operand
+    if kind == 'prop':
+        return attributes.get(value, '')
+    return value
+
+
+def _compare(left, right):
+    try:
+        left, right = float(left), float(right)
+    except ValueError:
+        pass
+    return (left > right) - (left < right)
+
+
+def _build(op, args):
+    if op in ('and', 'or'):
+        funcs = args
+        if op == 'and':
+            return lambda attributes: all(func(attributes) for func in funcs)
+        return lambda attributes: any(func(attributes) for func in funcs)
+    if op == 'not':
+        func = args[0]
+        return lambda attributes: not func(attributes)
+
+    if op == 'wcard':
+        pattern = re.compile(args[1][1])
+        prop = args[0]
+        return lambda attributes: bool(pattern.search(_value(attributes, prop)))
+    if op == 'bw':
+        prop, low, high = args
+        return lambda attributes: (_compare(_value(attributes, prop), low[1]) >= 0 and
+                                   _compare(_value(attributes, prop), high[1]) <= 0)
+
+    checks = {
+        'eq': lambda result: result == 0,
+        'ne': lambda result: result != 0,
+        'lt': lambda result: result < 0,
+        'le': lambda result: result <= 0,
+        'gt': lambda result: result > 0,
+        'ge': lambda result: result >= 0,
+    }
+    if op not in checks:
+        raise FilterError('unsupported filter operator: {0}'.format(op))
+    check = checks[op]
+    left, right = args
+    return lambda attributes: check(_compare(_value(attributes, left), _value(attributes, right)))
+
+
+def _parse(tokens, pos):
+    kind, value = tokens[pos]
+    if kind == 'string':
+        return ('string', value), pos + 1
+    if pos + 1 < len(tokens) and tokens[pos + 1] == ('punct', '('):
+        args = []
+        pos += 2
+        while tokens[pos] != ('punct', ')'):
+            arg, pos = _parse(tokens, pos)
+            args.append(arg)
+            if tokens[pos] == ('punct', ','):
+                pos += 1
+        return _build(value, args), pos + 1
+    # class.property reference, e.g. fvAEPg.name
+    return ('prop', value.split('.')[-1]), pos + 1
+
+
+def compile_filter(text):
+    """Compiles a query-target-filter expression to a predicate on attributes."""
+    tokens = _tokenize(text)
+    try:
+        func, pos = _parse(tokens, 0)
+    except IndexError:
+        raise FilterError('unbalanced filter: {0}'.format(text))
+    if pos != len(tokens) or not callable(func):
+        raise FilterError('invalid filter: {0}'.format(text))
+    return func
+
+
+def error_body(code, text):
+    return {'totalCount': '1', 'imdata': [{'error': {'attributes': {'code': str(code), 'text': text}}}]}
+
+
+class Mit(object):
+    def __init__(self):
+        # dn -> (class, attributes)
+        self.objects = {}
+        # class -> {dn: None}, dicts are used as insertion ordered sets
+        self.classes = {}
+        # parent dn -> {dn: None}
+        self.children = {}
+
+    def __len__(self):
+        return len(self.objects)
+
+    def add(self, mo_class, attributes):
+        dn = attributes['dn']
+        if dn in self.objects:
+            self.objects[dn][1].update(attributes)
+            return
+        attributes = dict(attributes)
+        attributes.setdefault('modTs', BASE_MOD_TS)
+        self.objects[dn] = (mo_class, attributes)
+        self.classes.setdefault(mo_class, {})[dn] = None
+        self.children.setdefault(parent_dn(dn), {})[dn] = None
+
+    def remove(self, dn):
+        if dn not in self.objects:
+            return
+        for child_dn in list(self.children.get(dn, ())):
+            self.remove(child_dn)
+        mo_class = self.objects.pop(dn)[0]
+        self.classes[mo_class].pop(dn, None)
+        self.children.get(parent_dn(dn), {}).pop(dn, None)
+        self.children.pop(dn, None)
+
+    def extend(self, imdata, parent=''):
+        """Adds objects in APIC response format, including nested children."""
+        for mo in imdata:
+            mo_class, body = next(iter(mo.items()))
+            if mo_class in ('error', 'moCount'):
+                continue
+            attributes = dict(body.get('attributes', {}))
+            if not attributes.get('dn'):
+                attributes['dn'] = parent + '/' + attributes['rn']
+            attributes.pop('rn', None)
+            self.add(mo_class, attributes)
+            self.extend(body.get('children', []), attributes['dn'])
+
+    def subtree(self, dn):
+        """Yields the DNs of an object's subtree, children before their parent like the APIC."""
+        for child_dn in self.children.get(dn, ()):
+            for item in self.subtree(child_dn):
+                yield item
+        yield dn
+
+    def class_dns(self, mo_class, scope=''):
+        dns = self.classes.get(mo_class, {})
+        if not scope:
+            return list(dns)
+        prefix = scope + '/'
+        return [dn for dn in dns if dn.startswith(prefix)]
+
+    def get(self, path, params=None):
+        """
+        Answers a GET on /api/<path>, returns (status_code, response body).
+
+        path examples: 'class/fvAEPg.json', 'node/class/topology/pod-1/node-101/l1PhysIf.json',
+        'mo/uni/infra.json'
+        """
+        params = params or {}
+        if path.endswith('.json'):
+            path = path[:-5]
+        if path.startswith('node/'):
+            path = path[5:]
+
+        if path.startswith('class/'):
+            scope, _, mo_class = path[6:].rpartition('/')
+            dns = self.class_dns(mo_class, scope)
+        elif path.startswith('mo/'):
+            dn = path[3:]
+            if dn not in self.objects:
+                return 200, {'totalCount': '0', 'imdata': []}
+            dns = [dn]
+        else:
+            return 400, error_body(400, 'unsupported url /api/{0}'.format(path))
+
+        target = params.get('query-target', 'self')
+        if target == 'children':
+            dns = [child_dn for dn in dns for child_dn in self.children.get(dn, ())]
+        elif target == 'subtree':
+            dns = [item for dn in dns for item in self.subtree(dn)]
+        elif target != 'self':
+            return 400, error_body(400, 'invalid query-target {0}'.format(target))
+        if target != 'self' and params.get('target-subtree-class'):
+            target_classes = set(params['target-subtree-class'].split(','))
+            dns = [item for item in dns if self.objects[item][0] in target_classes]
+
+        if params.get('query-target-filter'):
+            try:
+                predicate = compile_filter(params['query-target-filter'])
+            except FilterError as error:
+                return 400, error_body(400, str(error))
+            dns = [dn for dn in dns if predicate(self.objects[dn][1])]
+
+        includes = params.get('rsp-subtree-include', '').split(',')
+        if 'count' in includes:
+            count = {'moCount': {'attributes': {'count': str(len(dns)), 'dn': ''}}}
+            return 200, {'totalCount': '1', 'imdata': [count]}
+
+        if params.get('order-by'):
+            for order in reversed(params['order-by'].split(',')):
+                prop, _, direction = order.partition('|')
+                prop = prop.split('.')[-1]
+                dns.sort(key=lambda item: self.objects[item][1].get(prop, ''), reverse=(direction == 'desc'))
+
+        total = len(dns)
+        if 'page-size' in params:
+            page_size = int(params['page-size'])
+            page = int(params.get('page', 0))
+            dns = dns[page * page_size:(page + 1) * page_size]
+
+        if params.get('rsp-prop-include') == 'naming-only':
+            imdata = [{self.objects[dn][0]: {'attributes': {'dn': dn}}} for dn in dns]
+            return 200, {'totalCount': str(total), 'imdata': imdata}
+
+        subtree = params.get('rsp-subtree', 'no')
+        subtree_classes = set(params['rsp-subtree-class'].split(',')) if params.get('rsp-subtree-class') else None
+        imdata = [self.render(dn, subtree, subtree_classes) for dn in dns]
+        if 'health' in includes:
+            for dn, mo in zip(dns, imdata):
+                self.include_health(dn, mo)
+        return 200, {'totalCount': str(total), 'imdata': imdata}
+
+    def include_health(self, dn, mo):
+        """Adds the healthInst of an object to its rendered children, as rsp-subtree-include=health does."""
+        health_dn = dn + '/health'
+        if health_dn not in self.objects:
+            return
+        body = next(iter(mo.values()))
+        children = body.setdefault('children', [])
+        if not any('healthInst' in child for child in children):
+            children.append(self.render(health_dn, 'no', None, False))
+
+    def render(self, dn, subtree='no', subtree_classes=None, top=True):
+        mo_class, attributes = self.objects[dn]
+        attributes = dict(attributes)
+        if not top:
+            # Children are returned with their RN only, like the APIC does
+            del attributes['dn']
+            attributes['rn'] = rn(dn)
+        body = {'attributes': attributes}
+
+        if subtree in ('children', 'full'):
+            children = []
+            for child_dn in self.children.get(dn, ()):
+                child_class = self.objects[child_dn][0]
+                if subtree == 'children':
+                    if subtree_classes and child_class not in subtree_classes:
+                        continue
+                    children.append(self.render(child_dn, 'no', None, False))
+                else:
+                    child = self.render(child_dn, 'full', subtree_classes, False)
+                    # Keep ancestors of matching classes so the tree stays connected
+                    if subtree_classes and child_class not in subtree_classes and \
+                            'children' not in child[child_class]:
+                        continue
+                    children.append(child)
+            if children:
+                body['children'] = children
+
+        return {mo_class: body}
+
+    def post(self, dn, payload):
+        """Applies a POST on /api/mo/<dn>.json, returns (status_code, response body)."""
+        try:
+            self._apply(payload, url_dn=dn)
+        except (KeyError, IndexError, StopIteration) as error:
+            return 400, error_body(400, 'cannot resolve object name: {0}'.format(error))
+        return 200, {'totalCount': '0', 'imdata': []}
+
+    def _apply(self, mo, parent='', url_dn=''):
+        mo_class, body = next(iter(mo.items()))
+        attributes = dict(body.get('attributes', {}))
+        dn = attributes.get('dn')
+        if not dn and attributes.get('rn'):
+            dn = (parent or url_dn) + '/' + attributes['rn']
+        elif not dn and url_dn:
+            dn = url_dn
+            if mo_class in RN_FORMATS:
+                try:
+                    object_rn = RN_FORMATS[mo_class].format(**attributes)
+                except KeyError:
+                    object_rn = rn(url_dn)
+                if object_rn != rn(url_dn):
+                    dn = url_dn + '/' + object_rn
+        elif not dn:
+            dn = parent + '/' + RN_FORMATS[mo_class].format(**attributes)
+
+        attributes.pop('rn', None)
+        attributes['dn'] = dn
+        attributes.setdefault('modTs', datetime.datetime.now(datetime.timezone.utc).strftime(
+            '%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+00:00')
+        status = attributes.pop('status', '')
+        if 'deleted' in status:
+            self.remove(dn)
+            return
+        self.add(mo_class, attributes)
+        for child in body.get('children', []):
+            self._apply(child, parent=dn)
+
+    def dump(self, path):
+        """Writes all objects to a gzip compressed JSON archive."""
+        with gzip.open(path, 'wt') as fh:
+            fh.write('{{"format": "{0}", "version": {1}, "objects": [\n'.format(ARCHIVE_FORMAT, ARCHIVE_VERSION))
+            first = True
+            for dn, (mo_class, attributes) in self.objects.items():
+                if not first:
+                    fh.write(',\n')
+                fh.write(json.dumps({mo_class: {'attributes': attributes}}))
+                first = False
+            fh.write('\n]}\n')
+
+    @classmethod
+    def load(cls, path):
+        """Reads an archive written by dump()."""
+        with gzip.open(path, 'rt') as fh:
+            archive = json.load(fh)
+        if archive.get('format') != ARCHIVE_FORMAT:
+            raise ValueError('{0} is not an ACLI fabric archive'.format(path))
+        mit = cls()
+        mit.extend(archive['objects'])
+        return mit
@@ -0,0 +1,68 @@
+"""
+LLDP and CDP neighbours of the leaf interfaces.
+
+lldpAdjEp and cdpAdjEp live under the if-[ethX/Y] of their protocol on the
+leaf, so their DNs carry the packed interface key of the port they were
+learned on. join() maps them onto the interface table in one pass over the
+adjacencies, and NeighborIndex inverts the result into neighbour system name
+to ports, so a name is found without scanning the interfaces.
+"""
+import fnmatch
+from collections import namedtuple
+
+# (key, protocol, sysName, port of the neighbour, management address)
+Neighbor = namedtuple('Neighbor', ['key', 'protocol', 'sys_name', 'port_id', 'mgmt_ip'])
+
+
+def join(rows, idict):
+    """
+    Returns {key: [Neighbor]} of the interfaces in idict, ordered by protocol and name.
+
+    The rows are parallel.NEIGHBOR_FIELDS tuples of lldpAdjEp and cdpAdjEp.
+    """
+    found = {}
+    for row in rows:
+        if row[0] in idict:
+            found.setdefault(row[0], []).append(Neighbor(*row))
+    for neighbors in found.values():
+        neighbors.sort(key=lambda neighbor: (neighbor.protocol, neighbor.sys_name, neighbor.port_id))
+    return found
+
+
+def format_neighbors(neighbors):
+    """Returns the NEIGHBOR cell of an interface, e.g. 'esx01 vmnic2', names seen by both protocols once."""
+    seen = []
+    for neighbor in neighbors or ():
+        text = '{0} {1}'.format(neighbor.sys_name, neighbor.port_id).strip()
+        if text not in seen:
+            seen.append(text)
+    return ', '.join(seen)
+
+
+class NeighborIndex(object):
+    """Neighbours by lower case system name, built from join()."""
+
+    def __init__(self, interface_neighbors):
+        self.by_name = {}
+        for neighbors in interface_neighbors.values():
+            for neighbor in neighbors:
+                self.by_name.setdefault(neighbor.sys_name.lower(), []).append(neighbor)
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def find(self, pattern):
+        """
+        Returns the Neighbors whose system name matches pattern, ordered by name and interface.
+
+        The match ignores case; a pattern without wildcards (* ? [ ]) is a name and is a dict
+        lookup, other patterns are matched against the names only, not against every port.
+        """
+        pattern = pattern.lower()
+        if not any(char in pattern for char in '*?['):
+            found = list(self.by_name.get(pattern, ()))
+        else:
+            found = []
+            for name in fnmatch.filter(self.by_name, pattern):
+                found.extend(self.by_name[name])
+        return sorted(found, key=lambda neighbor: (neighbor.sys_name.lower(), neighbor.key, neighbor.protocol))
@@ -0,0 +1,73 @@
+"""
+Serves APIC REST requests from a fabric archive instead of the network.
+
+OfflineSession has the get/post/close interface of requests.Session used by
+the shell, so all collectors run unchanged against an archive written by
+'export fabric'. The archive is read-only: logins succeed, configuration
+POSTs are rejected.
+"""
+import json
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from aclilib.mit import Mit, error_body
+
+# Every class read by the shell, including the children returned by rsp-subtree queries
+EXPORT_CLASSES = [
+    'polUni', 'infraInfra', 'fabricPod', 'fabricNode',
+    'fvTenant', 'fvAp', 'fvAEPg', 'fvRsPathAtt', 'fvRsDomAtt', 'fvRsBd', 'tagInst',
+    'infraNodeP', 'infraLeafS', 'infraNodeBlk', 'infraAccPortP', 'infraRtAccPortP', 'infraHPortS',
+    'infraPortBlk', 'infraSubPortBlk', 'infraRsAccBaseGrp', 'infraFexP', 'infraFexBndlGrp', 'infraRtAccBaseGrp',
+    'infraFuncP', 'infraAccPortGrp', 'infraAccBndlGrp', 'infraRsAttEntP', 'infraRsHIfPol', 'infraRsStpIfPol',
+    'infraRsMcpIfPol', 'infraRsCdpIfPol', 'infraRsL2IfPol', 'infraRsLldpIfPol', 'infraRsLacpPol',
+    'fvnsVlanInstP', 'fvnsEncapBlk', 'fvnsRtVlanNs', 'infraAttEntityP', 'infraRsDomP',
+    'l1PhysIf', 'ethpmPhysIf', 'configSnapshot', 'faultInst', 'eventRecord', 'fvCEp', 'fvIp', 'fvRsCEpToPathEp',
+    'eqptIngrTotal5min', 'eqptEgrTotal5min', 'healthInst',
+    'lldpAdjEp', 'cdpAdjEp', 'cdpMgmtAddr',
+]
+
+
+class OfflineResponse(object):
+    def __init__(self, status_code, body, cookies=None):
+        self.status_code = status_code
+        self.body = body
+        self.cookies = cookies or {}
+
+    def json(self):
+        return self.body
+
+    @property
+    def text(self):
+        return json.dumps(self.body)
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+
+class OfflineSession(object):
+    def __init__(self, mit):
+        self.mit = mit
+
+    @classmethod
+    def from_archive(cls, path):
+        return cls(Mit.load(path))
+
+    def get(self, uri, **kwargs):
+        url = urlsplit(uri)
+        path = unquote(url.path)
+        if not path.startswith('/api/'):
+            return OfflineResponse(400, error_body(400, 'unsupported url {0}'.format(path)))
+        if path == '/api/aaaRefresh.json':
+            return OfflineResponse(200, {'totalCount': '0', 'imdata': []})
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        status, body = self.mit.get(path[5:], params)
+        return OfflineResponse(status, body)
+
+    def post(self, uri, data=None, **kwargs):
+        path = unquote(urlsplit(uri).path)
+        if path == '/api/aaaLogin.json':
+            return OfflineResponse(200, {'totalCount': '0', 'imdata': []}, cookies={'APIC-cookie': 'offline'})
+        return OfflineResponse(400, error_body(400, 'offline fabric archive is read-only'))
+
+    def close(self):
+        pass
@@ -0,0 +1,115 @@
+"""
+Parsing of large interface responses in worker processes.
+
+The parse functions take one response page, either the raw JSON body or the
+decoded dict, and return compact tuples ready to merge into the interface
+table. Raw bodies are sent to the workers so JSON decoding runs there too.
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from aclilib import dn as dn_parser
+from aclilib import health
+
+# (key, node, pod, intf_id, portT, usage, descr)
+L1_PHYS_IF_FIELDS = ('key', 'node', 'pod', 'intf_id', 'portT', 'usage', 'descr')
+# L1_PHYS_IF_FIELDS and the health score, None without one
+L1_PHYS_IF_HEALTH_FIELDS = L1_PHYS_IF_FIELDS + ('health', )
+# (key, node, operSt, operSpeed, operDuplex)
+ETHPM_PHYS_IF_FIELDS = ('key', 'node', 'operSt', 'operSpeed', 'operDuplex')
+# (key, node, bytes per second, packets per second), 5 minute averages
+EQPT_TOTAL_FIELDS = ('key', 'node', 'bytesRateAvg', 'pktsRateAvg')
+# (key, protocol, sysName, neighbour port, management address), the fields of neighbors.Neighbor
+NEIGHBOR_FIELDS = ('key', 'protocol', 'sysName', 'portId', 'mgmtIp')
+
+
+def _imdata(page):
+    if isinstance(page, (bytes, str)):
+        page = json.loads(page)
+    return page['imdata']
+
+
+def parse_l1_phys_if(page):
+    rows = []
+    for mo in _imdata(page):
+        intf = mo['l1PhysIf']['attributes']
+        intf_dn = dn_parser.parse(intf['dn'])
+        if intf_dn.port:
+            rows.append((intf_dn.key, intf_dn.node, intf_dn.pod, intf_dn.intf_id, intf['portT'], intf['usage'],
+                         intf['descr']))
+    return rows
+
+
+def parse_l1_phys_if_health(page):
+    rows = []
+    for mo in _imdata(page):
+        intf = mo['l1PhysIf']['attributes']
+        intf_dn = dn_parser.parse(intf['dn'])
+        if intf_dn.port:
+            rows.append((intf_dn.key, intf_dn.node, intf_dn.pod, intf_dn.intf_id, intf['portT'], intf['usage'],
+                         intf['descr'], health.score(mo['l1PhysIf'])))
+    return rows
+
+
+def parse_ethpm_phys_if(page):
+    rows = []
+    for mo in _imdata(page):
+        phy_intf = mo['ethpmPhysIf']['attributes']
+        phy_intf_dn = dn_parser.parse(phy_intf['dn'])
+        if phy_intf_dn.port:
+            rows.append((phy_intf_dn.key, phy_intf_dn.node, phy_intf['operSt'], phy_intf['operSpeed'],
+                         phy_intf['operDuplex']))
+    return rows
+
+
+def _parse_eqpt_total(page, mo_class):
+    rows = []
+    for mo in _imdata(page):
+        counters = mo[mo_class]['attributes']
+        counters_dn = dn_parser.parse(counters['dn'])
+        if counters_dn.port:
+            rows.append((counters_dn.key, counters_dn.node, float(counters['bytesRateAvg'] or 0),
+                         float(counters['pktsRateAvg'] or 0)))
+    return rows
+
+
+def parse_eqpt_ingr_total(page):
+    return _parse_eqpt_total(page, 'eqptIngrTotal5min')
+
+
+def parse_eqpt_egr_total(page):
+    return _parse_eqpt_total(page, 'eqptEgrTotal5min')
+
+
+def parse_lldp_adj_ep(page):
+    rows = []
+    for mo in _imdata(page):
+        adjacency = mo['lldpAdjEp']['attributes']
+        adjacency_dn = dn_parser.parse(adjacency['dn'])
+        if adjacency_dn.port:
+            rows.append((adjacency_dn.key, 'lldp', adjacency['sysName'], adjacency['portIdV'], adjacency['mgmtIp']))
+    return rows
+
+
+def parse_cdp_adj_ep(page):
+    """CDP has no management address attribute, it comes from a cdpMgmtAddr child when requested."""
+    rows = []
+    for mo in _imdata(page):
+        adjacency = mo['cdpAdjEp']['attributes']
+        adjacency_dn = dn_parser.parse(adjacency['dn'])
+        if adjacency_dn.port:
+            mgmt_ip = ''
+            for child in mo['cdpAdjEp'].get('children', ()):
+                if 'cdpMgmtAddr' in child:
+                    mgmt_ip = child['cdpMgmtAddr']['attributes']['addr']
+                    break
+            rows.append((adjacency_dn.key, 'cdp', adjacency['sysName'] or adjacency['devId'], adjacency['portId'],
+                         mgmt_ip))
+    return rows
+
+
+def create_pool(workers):
+    """Returns a process pool, None when workers <= 1 so callers parse in-process."""
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers)
@@ -0,0 +1,149 @@
+"""
+Merging of the APIC queries of a command.
+
+Collectors describe each query as a Query. A command declares the datasets
+it needs and merge() turns their queries into the smallest set of APIC
+queries: queries of the same class and target are answered by one query
+with the widest scope, the union of the subtree classes and the filters
+joined by or(). serve() then gives every consumer the objects of its own
+query from the merged result, applying its scope, filter and subtree
+locally, so each collector sees what its own query would have returned.
+"""
+from collections import OrderedDict, namedtuple
+
+from aclilib.mit import compile_filter
+
+# path is 'class/<class>', 'class/<scope>/<class>' or 'mo/<dn>', include is rsp-subtree-include, e.g. 'health'
+Query = namedtuple('Query', ['path', 'target', 'target_classes', 'subtree', 'subtree_classes', 'filter', 'include'])
+Query.__new__.__defaults__ = ('self', (), 'no', (), '', '')
+
+SUBTREE_DEPTH = {'no': 0, 'children': 1, 'full': None}
+
+
+def uri(query, address):
+    """Returns the URI of a query on the APIC at address."""
+    params = []
+    if query.target != 'self':
+        params.append('query-target=' + query.target)
+        if query.target_classes:
+            params.append('target-subtree-class=' + ','.join(query.target_classes))
+    if query.subtree != 'no':
+        params.append('rsp-subtree=' + query.subtree)
+        if query.subtree_classes:
+            params.append('rsp-subtree-class=' + ','.join(query.subtree_classes))
+    if query.filter:
+        params.append('query-target-filter=' + query.filter)
+    if query.include:
+        params.append('rsp-subtree-include=' + query.include)
+    base = 'https://{0}/api/{1}.json'.format(address, query.path)
+    return base + '?' + '&'.join(params) if params else base
+
+
+def scope(query):
+    """Returns (scope, class) of a class query, (dn, '') of a mo query."""
+    if query.path.startswith('class/'):
+        scope, _, mo_class = query.path[6:].rpartition('/')
+        return scope, mo_class
+    return query.path[3:], ''
+
+
+def merge_subtree(queries):
+    """Returns (subtree, subtree classes) covering the subtrees of queries."""
+    depths = [SUBTREE_DEPTH[query.subtree] for query in queries]
+    subtree = 'full' if None in depths else {0: 'no', 1: 'children'}[max(depths)]
+    if subtree == 'no' or any(not query.subtree_classes for query in queries if query.subtree != 'no'):
+        return subtree, ()
+    classes = OrderedDict()
+    for query in queries:
+        classes.update((mo_class, None) for mo_class in query.subtree_classes)
+    return subtree, tuple(classes)
+
+
+def merge_filter(queries):
+    filters = list(OrderedDict((query.filter, None) for query in queries))
+    if '' in filters:
+        return ''
+    if len(filters) == 1:
+        return filters[0]
+    return 'or({0})'.format(','.join(filters))
+
+
+def merge(queries):
+    """
+    Returns [(merged query, [queries it answers])] for queries.
+
+    Class queries of one class, target and include are merged, a class wide query answers
+    the queries of its class scoped to a node or pod. Mo queries are merged per DN.
+    """
+    groups = OrderedDict()
+    for query in OrderedDict((query, None) for query in queries):
+        query_scope, mo_class = scope(query)
+        key = (mo_class or query.path, query.target, query.target_classes, query.include)
+        groups.setdefault(key, []).append((query_scope, query))
+
+    plan = []
+    for (_, target, target_classes, include), members in groups.items():
+        scopes = {query_scope for query_scope, _ in members}
+        if '' in scopes or len(scopes) == 1:
+            by_scope = [members]
+        else:
+            by_scope = [[member for member in members if member[0] == item] for item in sorted(scopes)]
+        for group in by_scope:
+            group_queries = [query for _, query in group]
+            path = min((query.path for query in group_queries), key=len)
+            subtree, subtree_classes = merge_subtree(group_queries)
+            merged = Query(path, target, target_classes, subtree, subtree_classes, merge_filter(group_queries),
+                           include)
+            plan.append((merged, group_queries))
+    return plan
+
+
+def covers(merged, query):
+    """Returns True if the result of merged holds every object query returns."""
+    merged_scope, merged_class = scope(merged)
+    query_scope, query_class = scope(query)
+    if (merged_class or merged.path, merged.target, merged.target_classes, merged.include) != \
+            (query_class or query.path, query.target, query.target_classes, query.include):
+        return False
+    if merged_scope not in ('', query_scope) or merged.filter not in ('', query.filter):
+        return False
+    return merge_subtree([merged, query]) == (merged.subtree, merged.subtree_classes)
+
+
+def trim(mo, depth, classes):
+    """Returns mo with the children below depth or not in classes removed, mo itself if nothing is removed."""
+    mo_class, body = next(iter(mo.items()))
+    children = body.get('children')
+    if not children:
+        return mo
+    if depth == 0:
+        kept = []
+    else:
+        kept = [trim(child, None if depth is None else depth - 1, classes) for child in children
+                if not classes or next(iter(child)) in classes]
+    if len(kept) == len(children) and all(new is old for new, old in zip(kept, children)):
+        return mo
+    body = dict(body)
+    if kept:
+        body['children'] = kept
+    else:
+        del body['children']
+    return {mo_class: body}
+
+
+def serve(query, merged, mos):
+    """Yields the objects of mos, the result of merged, that query would have returned."""
+    query_scope, _ = scope(query)
+    merged_scope, _ = scope(merged)
+    prefix = query_scope + '/' if query.path.startswith('class/') and query_scope != merged_scope else ''
+    predicate = compile_filter(query.filter) if query.filter and query.filter != merged.filter else None
+    reshape = (query.subtree, query.subtree_classes) != (merged.subtree, merged.subtree_classes)
+    for mo in mos:
+        attributes = next(iter(mo.values()))['attributes']
+        if prefix and not attributes['dn'].startswith(prefix):
+            continue
+        if predicate and not predicate(attributes):
+            continue
+        if reshape:
+            mo = trim(mo, SUBTREE_DEPTH[query.subtree], query.subtree_classes)
+        yield mo
@@ -0,0 +1,215 @@
+"""
+Client side rate limiting of APIC requests.
+
+Each controller gets a ControllerLimiter with two token buckets, one for
+aaaLogin/aaaRefresh and one for all other requests, and an AIMD window that
+bounds the requests in flight. The window grows by one per window of
+successful responses, is halved on a throttling response (HTTP 429 or 503)
+and cut by a quarter when the latency exceeds the target, at most once per
+round trip. Throttled requests are retried after a backoff, POSTs only on a
+429 as a 503 does not tell whether the APIC applied them.
+
+The limiter only keeps state and computes delays: RateLimitedSession waits
+on it with threads for requests.Session, aclilib.aio with asyncio.
+"""
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+# APIC throttles aaaLogin/aaaRefresh to 2 requests/s and the API to 10000 requests/min by default
+LOGIN_RATE = 2.0
+LOGIN_BURST = 2
+QUERY_RATE = 150.0
+QUERY_BURST = 300
+MAX_CONCURRENCY = 8
+MIN_CONCURRENCY = 1
+# Seconds
+TARGET_LATENCY = 2.0
+RETRY_DELAY = 0.5
+RATE_WINDOW = 10.0
+
+THROTTLE_STATUS = (429, 503)
+# A 503 may come after the APIC applied the request, so only a 429 is retried for a non idempotent POST
+POST_RETRY_STATUS = (429, )
+MAX_RETRIES = 3
+
+
+def request_kind(path):
+    """Returns the token bucket of a request path, 'login' or 'query'."""
+    if '/aaaLogin' in path or '/aaaRefresh' in path:
+        return 'login'
+    return 'query'
+
+
+def retryable(method, status_code):
+    """Returns True if a request answered with status_code is retried."""
+    if method.lower() == 'get':
+        return status_code in THROTTLE_STATUS
+    return status_code in POST_RETRY_STATUS
+
+
+def retry_delay(headers, attempt):
+    """Returns the seconds to wait before retrying a throttled request, from Retry-After if present."""
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return RETRY_DELAY * 2 ** attempt
+
+
+class TokenBucket(object):
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+
+    def fill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self):
+        """Takes a token, returns the seconds to wait before using it."""
+        self.fill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def take(self):
+        """Takes a token if one is available now, returns False otherwise."""
+        self.fill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AimdWindow(object):
+    def __init__(self, maximum=MAX_CONCURRENCY, minimum=MIN_CONCURRENCY, target_latency=TARGET_LATENCY):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.target_latency = target_latency
+        self.limit = float(maximum)
+        self.decreased = 0.0
+
+    @property
+    def size(self):
+        return max(self.minimum, int(self.limit))
+
+    def update(self, latency, throttled):
+        if throttled or latency > self.target_latency:
+            now = time.monotonic()
+            # Responses of requests sent before the last decrease do not count again
+            if now - self.decreased >= latency:
+                self.limit = max(self.minimum, self.limit * (0.5 if throttled else 0.75))
+                self.decreased = now
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+
+class ControllerLimiter(object):
+    def __init__(self, address, login_rate=LOGIN_RATE, login_burst=LOGIN_BURST, query_rate=QUERY_RATE,
+                 query_burst=QUERY_BURST, max_concurrency=MAX_CONCURRENCY, target_latency=TARGET_LATENCY):
+        self.address = address
+        self.buckets = {'login': TokenBucket(login_rate, login_burst), 'query': TokenBucket(query_rate, query_burst)}
+        self.window = AimdWindow(max_concurrency, target_latency=target_latency)
+        self.in_flight = 0
+        self.queued = 0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.latency = 0.0
+        self.completed = deque()
+
+    def reserve(self, kind):
+        return self.buckets[kind].reserve()
+
+    def can_start(self):
+        return self.in_flight < self.window.size
+
+    def started(self):
+        self.in_flight += 1
+
+    def finished(self, latency, status_code):
+        self.in_flight -= 1
+        self.requests += 1
+        throttled = status_code in THROTTLE_STATUS
+        if throttled:
+            self.throttled += 1
+        self.window.update(latency, throttled)
+        self.latency = latency if self.requests == 1 else 0.8 * self.latency + 0.2 * latency
+        self.completed.append(time.monotonic())
+
+    def rate(self):
+        """Returns the responses per second over the last RATE_WINDOW seconds."""
+        horizon = time.monotonic() - RATE_WINDOW
+        while self.completed and self.completed[0] < horizon:
+            self.completed.popleft()
+        return len(self.completed) / RATE_WINDOW
+
+    def diagnostics(self):
+        return {'address': self.address, 'concurrency': self.window.size, 'max_concurrency': self.window.maximum,
+                'in_flight': self.in_flight, 'queued': self.queued, 'rate': self.rate(), 'latency': self.latency,
+                'requests': self.requests, 'throttled': self.throttled, 'retries': self.retries}
+
+
+class RateLimitedSession(object):
+    """Wraps a requests.Session like object, limiting the requests per controller."""
+
+    def __init__(self, session, **limits):
+        self.session = session
+        self.limits = limits
+        self.limiters = {}
+        self.condition = threading.Condition()
+
+    def limiter(self, netloc):
+        with self.condition:
+            if netloc not in self.limiters:
+                self.limiters[netloc] = ControllerLimiter(netloc, **self.limits)
+            return self.limiters[netloc]
+
+    def request(self, method, uri, **kwargs):
+        url = urlsplit(uri)
+        limiter = self.limiter(url.netloc)
+        kind = request_kind(url.path)
+        for attempt in range(MAX_RETRIES + 1):
+            with self.condition:
+                limiter.queued += 1
+            try:
+                with self.condition:
+                    delay = limiter.reserve(kind)
+                if delay:
+                    time.sleep(delay)
+                with self.condition:
+                    self.condition.wait_for(limiter.can_start)
+                    limiter.started()
+            finally:
+                with self.condition:
+                    limiter.queued -= 1
+
+            start = time.monotonic()
+            status_code = 0
+            try:
+                response = getattr(self.session, method)(uri, **kwargs)
+                status_code = response.status_code
+            finally:
+                with self.condition:
+                    limiter.finished(time.monotonic() - start, status_code)
+                    self.condition.notify_all()
+
+            if not retryable(method, status_code) or attempt == MAX_RETRIES:
+                return response
+            with self.condition:
+                limiter.retries += 1
+            time.sleep(retry_delay(response.headers, attempt))
+
+    def get(self, uri, **kwargs):
+        return self.request('get', uri, **kwargs)
+
+    def post(self, uri, **kwargs):
+        return self.request('post', uri, **kwargs)
+
+    def close(self):
+        self.session.close()
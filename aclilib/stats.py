@@ -0,0 +1,62 @@
+"""
+Interface traffic rates and utilisation.
+
+eqptIngrTotal5min and eqptEgrTotal5min hold the 5 minute averages of the
+bytes and packets per second each interface received and sent. rates()
+joins them to the interface table by packed interface key and computes the
+utilisation from the operational speed; top() ranks the interfaces with a
+heap of N entries, so only those N are ever sorted.
+"""
+import heapq
+from collections import namedtuple
+
+# util is the busier direction in percent of the speed, None if the speed is unknown
+InterfaceRate = namedtuple('InterfaceRate', ['key', 'rx_bps', 'tx_bps', 'rx_pps', 'tx_pps', 'util'])
+
+SPEED_UNITS = {'M': 10 ** 6, 'G': 10 ** 9}
+RATE_UNITS = ((10 ** 9, 'G'), (10 ** 6, 'M'), (10 ** 3, 'K'))
+
+
+def speed_bps(oper_speed):
+    """Returns the bits per second of an operSpeed such as '10G' or '100M', 0 if unknown."""
+    unit = SPEED_UNITS.get(oper_speed[-1:], 0)
+    try:
+        return int(float(oper_speed[:-1]) * unit)
+    except ValueError:
+        return 0
+
+
+def rates(ingress_rows, egress_rows, idict):
+    """
+    Returns {key: InterfaceRate} of the interfaces in idict with counters.
+
+    The rows are parallel.EQPT_TOTAL_FIELDS tuples of the ingress and egress counters.
+    """
+    egress = {row[0]: row for row in egress_rows}
+    found = {}
+    for key, _, rx_bytes, rx_pps in ingress_rows:
+        if key not in idict:
+            continue
+        _, _, tx_bytes, tx_pps = egress.get(key, (key, '', 0.0, 0.0))
+        rx_bps, tx_bps = rx_bytes * 8, tx_bytes * 8
+        speed = speed_bps(idict[key]['operSpeed'])
+        util = max(rx_bps, tx_bps) * 100.0 / speed if speed else None
+        found[key] = InterfaceRate(key, rx_bps, tx_bps, rx_pps, tx_pps, util)
+    return found
+
+
+def rank_key(rate):
+    return (-1.0 if rate.util is None else rate.util, rate.rx_bps + rate.tx_bps)
+
+
+def top(interface_rates, count):
+    """Returns the count InterfaceRates with the highest utilisation, then traffic, highest first."""
+    return heapq.nlargest(count, interface_rates, key=rank_key)
+
+
+def format_rate(value):
+    """Returns a rate with a K, M or G suffix, e.g. 1.25G."""
+    for scale, suffix in RATE_UNITS:
+        if value >= scale:
+            return '{0:.2f}{1}'.format(value / scale, suffix)
+    return '{0:.0f}'.format(value)
@@ -0,0 +1,238 @@
+"""
+Interface table joining access policies with l1PhysIf and ethpmPhysIf state.
+
+build() returns a columnar InterfaceTable when NumPy is installed and a plain
+dict of row dicts otherwise. Both map the packed interface key to a row with
+the INTERFACE_COLUMNS fields, so the shell reads them the same way.
+
+InterfaceTable keeps the keys in a sorted int64 array and every other column
+dictionary encoded: an int32 array of codes into a list of distinct values.
+Joins are sorted merges on the keys and filters are boolean masks computed
+once per distinct value, e.g.
+
+    mask = table.equals('operSt', 'down') & ~table.equals('policy_group', '')
+"""
+from collections.abc import Mapping
+from operator import itemgetter
+
+from aclilib.parallel import ETHPM_PHYS_IF_FIELDS, L1_PHYS_IF_FIELDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+INTERFACE_COLUMNS = ('node', 'intf_id', 'pod', 'portT', 'usage', 'descr', 'operSt', 'operSpeed', 'operDuplex',
+                     'port_sr_name', 'policy_group')
+
+# Selector expansion rows: (key, node, intf_id, port_sr_name, policy_group)
+SELECTOR_FIELDS = ('key', 'node', 'intf_id', 'port_sr_name', 'policy_group')
+
+
+def build(selector_rows, l1_rows, ethpm_rows, leaf_nodes, columnar=HAVE_NUMPY):
+    """
+    Joins selector expansions with interface state of the leaf_nodes.
+
+    l1_rows and ethpm_rows are the tuples of aclilib.parallel. Selector rows
+    define the policy of an interface, l1PhysIf rows add the interfaces
+    without a selector, ethpmPhysIf rows set the operational state. Later
+    rows for the same key replace earlier ones.
+    """
+    if columnar:
+        return InterfaceTable.build(selector_rows, l1_rows, ethpm_rows, leaf_nodes)
+    return build_dict(selector_rows, l1_rows, ethpm_rows, leaf_nodes)
+
+
+def build_dict(selector_rows, l1_rows, ethpm_rows, leaf_nodes):
+    leaf_nodes = set(leaf_nodes)
+    idict = {}
+    for key, node, intf_id, port_sr_name, policy_group in selector_rows:
+        idict[key] = {'policy_group': policy_group, 'port_sr_name': port_sr_name, 'intf_id': intf_id, 'node': node,
+                      'descr': '', 'portT': '-', 'usage': '-', 'operSt': '-', 'operSpeed': '-', 'operDuplex': '-'}
+
+    for key, node, pod, intf_id, port_t, usage, descr in l1_rows:
+        if node in leaf_nodes:
+            if key in idict:
+                idict[key].update({'portT': port_t, 'usage': usage, 'descr': descr, 'pod': pod,
+                                   'operSt': '-', 'operSpeed': '-', 'operDuplex': '-'})
+            else:
+                idict[key] = {'node': node, 'intf_id': intf_id, 'portT': port_t, 'usage': usage, 'descr': descr,
+                              'pod': pod, 'operSt': '-', 'operSpeed': '-', 'operDuplex': '-', 'port_sr_name': '',
+                              'policy_group': ''}
+
+    for key, node, oper_st, oper_speed, oper_duplex in ethpm_rows:
+        if node in leaf_nodes and key in idict:
+            idict[key]['operSt'] = oper_st
+            idict[key]['operSpeed'] = oper_speed
+            idict[key]['operDuplex'] = oper_duplex
+    return idict
+
+
+def select(table, policy_group, node_match):
+    """Returns the sorted keys of interfaces in policy_group whose node satisfies node_match(node)."""
+    if isinstance(table, InterfaceTable):
+        return table.keys_where(table.equals('policy_group', policy_group) & table.matches('node', node_match))
+    return sorted(key for key, row in table.items() if row['policy_group'] == policy_group and node_match(row['node']))
+
+
+def _last(keys):
+    """Returns the sorted distinct keys and the position of the last occurrence of each."""
+    distinct, first = np.unique(keys[::-1], return_index=True)
+    return distinct, len(keys) - 1 - first
+
+
+def _match(levels, codes, predicate):
+    hits = np.fromiter(map(bool, map(predicate, levels)), dtype=bool, count=len(levels))
+    return hits[codes]
+
+
+class InterfaceTable(Mapping):
+    def __init__(self, keys, codes, levels):
+        self.keys_array = keys
+        self.codes = codes
+        self.levels = levels
+        self._index = {name: {value: code for code, value in enumerate(values)} for name, values in levels.items()}
+
+    @classmethod
+    def empty(cls, size=0):
+        codes = {name: np.zeros(size, dtype=np.int32) for name in INTERFACE_COLUMNS}
+        levels = {name: [''] for name in INTERFACE_COLUMNS}
+        return cls(np.zeros(size, dtype=np.int64), codes, levels)
+
+    @classmethod
+    def build(cls, selector_rows, l1_rows, ethpm_rows, leaf_nodes):
+        leaf_nodes = set(leaf_nodes)
+        sel = _Frame.from_rows(selector_rows, SELECTOR_FIELDS)
+        l1 = _Frame.from_rows(l1_rows, L1_PHYS_IF_FIELDS)
+        ethpm = _Frame.from_rows(ethpm_rows, ETHPM_PHYS_IF_FIELDS)
+        l1 = l1.take(l1.matches('node', leaf_nodes.__contains__))
+        ethpm = ethpm.take(ethpm.matches('node', leaf_nodes.__contains__))
+
+        sel_keys, sel_last = _last(sel.keys)
+        l1_keys, l1_last = _last(l1.keys)
+        keys = np.union1d(sel_keys, l1_keys)
+        table = cls.empty(len(keys))
+        table.keys_array = keys
+
+        for name in ('portT', 'usage', 'operSt', 'operSpeed', 'operDuplex'):
+            table.codes[name][:] = table.code(name, '-')
+
+        # Interfaces of the selectors keep the node and interface of the selector
+        sel_pos = np.searchsorted(keys, sel_keys)
+        for name in SELECTOR_FIELDS[1:]:
+            table.assign(name, sel_pos, sel, name, sel_last)
+
+        l1_pos = np.searchsorted(keys, l1_keys)
+        for name in ('pod', 'portT', 'usage', 'descr'):
+            table.assign(name, l1_pos, l1, name, l1_last)
+        new = ~np.isin(l1_keys, sel_keys, assume_unique=True)
+        for name in ('node', 'intf_id'):
+            table.assign(name, l1_pos[new], l1, name, l1_last[new])
+
+        ethpm_keys, ethpm_last = _last(ethpm.keys)
+        found = table.contains(ethpm_keys)
+        ethpm_pos = np.searchsorted(keys, ethpm_keys[found])
+        for name in ('operSt', 'operSpeed', 'operDuplex'):
+            table.assign(name, ethpm_pos, ethpm, name, ethpm_last[found])
+        return table
+
+    def code(self, name, value):
+        """Returns the code of value in column name, adding it if not present."""
+        return self.encode(name, [value])[0]
+
+    def encode(self, name, values):
+        """Returns the codes of values in column name as an array, adding the values not present."""
+        index = self._index[name]
+        levels = self.levels[name]
+        for value in values:
+            if value not in index:
+                index[value] = len(levels)
+                levels.append(value)
+        return np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def assign(self, name, positions, frame, field, rows):
+        """Sets column name at positions to frame[field] of rows."""
+        self.codes[name][positions] = self.encode(name, frame.levels[field])[frame.codes[field][rows]]
+
+    def contains(self, keys):
+        """Returns a mask of the keys present in the table."""
+        if not len(self.keys_array):
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(self.keys_array, keys)
+        pos[pos == len(self.keys_array)] = 0
+        return self.keys_array[pos] == keys
+
+    def equals(self, name, value):
+        """Returns a mask of the rows where column name equals value."""
+        code = self._index[name].get(value)
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.codes[name] == code
+
+    def matches(self, name, predicate):
+        """Returns a mask of the rows where predicate(value) is true, evaluated once per distinct value."""
+        return _match(self.levels[name], self.codes[name], predicate)
+
+    def keys_where(self, mask):
+        return self.keys_array[mask].tolist()
+
+    def column(self, name, mask=None):
+        """Returns the values of column name as a list, for the rows in mask if given."""
+        codes = self.codes[name] if mask is None else self.codes[name][mask]
+        values = self.levels[name]
+        return [values[code] for code in codes.tolist()]
+
+    def rows(self, mask=None):
+        """Yields (key, row) in key order, for the rows in mask if given."""
+        keys = self.keys_array.tolist() if mask is None else self.keys_where(mask)
+        columns = [self.column(name, mask) for name in INTERFACE_COLUMNS]
+        for key, values in zip(keys, zip(*columns)):
+            yield key, dict(zip(INTERFACE_COLUMNS, values))
+
+    def items(self):
+        return self.rows()
+
+    def __getitem__(self, key):
+        pos = int(np.searchsorted(self.keys_array, key))
+        if pos == len(self.keys_array) or self.keys_array[pos] != key:
+            raise KeyError(key)
+        return {name: self.levels[name][self.codes[name][pos]] for name in INTERFACE_COLUMNS}
+
+    def __contains__(self, key):
+        pos = int(np.searchsorted(self.keys_array, key))
+        return pos < len(self.keys_array) and self.keys_array[pos] == key
+
+    def __iter__(self):
+        return iter(self.keys_array.tolist())
+
+    def __len__(self):
+        return len(self.keys_array)
+
+
+class _Frame(object):
+    """Rows of tuples as a key array and dictionary encoded columns."""
+
+    def __init__(self, keys, codes, levels):
+        self.keys = keys
+        self.codes = codes
+        self.levels = levels
+
+    @classmethod
+    def from_rows(cls, rows, fields):
+        keys = np.fromiter(map(itemgetter(0), rows), dtype=np.int64, count=len(rows))
+        codes = {}
+        levels = {}
+        for pos, name in enumerate(fields[1:], 1):
+            values = list(map(itemgetter(pos), rows))
+            levels[name] = list(dict.fromkeys(values))
+            index = {value: code for code, value in enumerate(levels[name])}
+            codes[name] = np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+        return cls(keys, codes, levels)
+
+    def matches(self, name, predicate):
+        return _match(self.levels[name], self.codes[name], predicate)
+
+    def take(self, mask):
+        return _Frame(self.keys[mask], {name: codes[mask] for name, codes in self.codes.items()}, self.levels)
@@ -0,0 +1,28 @@
+"""
+Change detection for the watch command.
+
+StateDiff keeps one hash per record, e.g. per interface the tuple of its
+state, speed and duplex, and reports which records changed between two
+refreshes. Only the hashes are kept, not the records.
+"""
+
+# Seconds between refreshes when not given
+DEFAULT_INTERVAL = 5.0
+MIN_INTERVAL = 1.0
+
+
+class StateDiff(object):
+    def __init__(self):
+        self.hashes = {}
+
+    def update(self, records):
+        """
+        Stores the hashes of records ({key: tuple}), returns (changed, removed) key lists.
+
+        Keys seen for the first time count as changed.
+        """
+        hashes = {key: hash(record) for key, record in records.items()}
+        changed = [key for key, value in hashes.items() if self.hashes.get(key) != value]
+        removed = [key for key in self.hashes if key not in hashes]
+        self.hashes = hashes
+        return changed, removed
@@ -0,0 +1,7 @@
+"""
+Benchmark tooling for ACLI: synthetic fabric generator, mock APIC and runner.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.run --size medium --output results.json
+"""
@@ -0,0 +1,63 @@
+"""
+Batch lookups of the query library against one lookup per item.
+
+Logs an ApicClient in to a mock APIC and resolves --count VLANs and leaf
+ports one at a time with bindings(vlan=...) and interfaces(node=...), then
+with lookup_bindings() and lookup_interfaces(), reporting the time and the
+requests seen by the APIC.
+
+Usage:
+    python -m benchmarks.bench_client [--size medium] [--count 20]
+"""
+import argparse
+import time
+
+import requests
+
+from aclilib.client import ApicClient
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+
+
+def measure(mock, func):
+    before = mock.stats()
+    start = time.perf_counter()
+    found = func()
+    elapsed = time.perf_counter() - start
+    return elapsed, mock.stats()['requests'] - before['requests'], found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare batch and single lookups of the query library')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--count', type=int, default=20, help='VLANs and ports looked up')
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    try:
+        client = ApicClient(mock.address, mock.username, mock.password)
+        client.login()
+        vlans = sorted({binding.encap for binding in client.bindings()})[:args.count]
+        ports = [(intf.node, intf.interface) for intf in client.interfaces()][::97][:args.count]
+
+        results = [
+            ('bindings(vlan=...)', measure(mock, lambda: {vlan: list(client.bindings(vlan=vlan)) for vlan in vlans})),
+            ('lookup_bindings()', measure(mock, lambda: client.lookup_bindings(vlans))),
+            ('interfaces(node=...)', measure(mock, lambda: {
+                (node, port): [intf for intf in client.interfaces(node) if intf.interface == port]
+                for node, port in ports})),
+            ('lookup_interfaces()', measure(mock, lambda: client.lookup_interfaces(ports))),
+        ]
+        print('{0} VLANs, {1} ports'.format(len(vlans), len(ports)))
+        for name, (elapsed, count, found) in results:
+            print('{0:<22} {1:8.3f}s  {2:5d} requests  {3:5d} found'.format(
+                name, elapsed, count, sum(1 for value in found.values() if value)))
+        client.close()
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
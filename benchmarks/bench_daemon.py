@@ -0,0 +1,120 @@
+"""
+Load test of the ACLI daemon with many concurrent clients.
+
+Starts a mock APIC and runs the show commands of benchmarks.run from
+--clients concurrent clients, first with one logged in shell per client as
+separate ACLI processes would, then through an AcliDaemon on a temporary
+Unix socket. Reports the elapsed time, the requests seen by the APIC, the
+latency of the daemon replies and the requests of one delta refresh of the
+datasets the daemon holds.
+
+Usage:
+    python -m benchmarks.bench_daemon [--size small] [--clients 10] [--rounds 3]
+"""
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import requests
+
+from aclilib import daemon
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import COMMANDS, login, sample_arguments
+
+
+def commands(mit):
+    arguments = sample_arguments(mit)
+    result = []
+    for template in COMMANDS:
+        if template.split(' ', 1)[0] not in daemon.SERVED_COMMANDS:
+            continue
+        try:
+            result.append(template.format(**arguments))
+        except KeyError:
+            continue
+    return result
+
+
+def run_direct(mock, command_list, clients, rounds):
+    def client(_):
+        shell = login(mock.address, mock.username, mock.password)
+        for _ in range(rounds):
+            for command in command_list:
+                shell.onecmd(command)
+        shell.disconnect()
+
+    with redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+
+
+def run_daemon(socket_path, command_list, clients, rounds, latencies):
+    def client(_):
+        with daemon.DaemonClient(socket_path) as connection:
+            for _ in range(rounds):
+                for command in command_list:
+                    start = time.perf_counter()
+                    reply = connection.request('BENCH', command)
+                    latencies.append((time.perf_counter() - start, reply['cached']))
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+
+
+def measure(mock, func, *args):
+    before = mock.stats()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    return elapsed, mock.stats()['requests'] - before['requests']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the ACLI daemon with concurrent clients')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=3, help='times each client runs every command')
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    command_list = commands(mit)
+    mock = MockApic(mit).start()
+    socket_path = os.path.join(tempfile.mkdtemp(), 'acli.sock')
+    server = daemon.AcliDaemon(lambda fabric: login(mock.address, mock.username, mock.password), socket_path)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    try:
+        print('{0} clients, {1} commands x {2} rounds each'.format(args.clients, len(command_list), args.rounds))
+        elapsed, count = measure(mock, run_direct, mock, command_list, args.clients, args.rounds)
+        print('{0:<20} {1:8.3f}s  {2:6d} APIC requests'.format('shell per client', elapsed, count))
+
+        thread.start()
+        latencies = []
+        elapsed, count = measure(mock, run_daemon, socket_path, command_list, args.clients, args.rounds, latencies)
+        print('{0:<20} {1:8.3f}s  {2:6d} APIC requests'.format('daemon', elapsed, count))
+        for name, cached in (('cold', False), ('cached', True)):
+            values = sorted(latency for latency, hit in latencies if hit == cached)
+            if values:
+                print('  {0:<8} {1:5d} replies  median {2:8.2f}ms  p95 {3:8.2f}ms'.format(
+                    name, len(values), statistics.median(values) * 1000, values[int(len(values) * 0.95)] * 1000))
+        state = server.fabric('BENCH')
+        with state.lock:
+            elapsed, count = measure(mock, state.cache.refresh)
+        print('{0:<20} {1:8.3f}s  {2:6d} APIC requests  {3}'.format(
+            'refresh', elapsed, count, ', '.join(sorted(state.cache.datasets))))
+    finally:
+        if thread.is_alive():
+            server.stop()
+            thread.join()
+        os.rmdir(os.path.dirname(socket_path))
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark of DN parsing over 1M DNs.
+
+Compares the string operations the collectors used before aclilib.dn with
+aclilib.dn.parse on a cold and on a warm cache. The DN population mixes
+l1PhysIf, ethpmPhysIf, EPG and fvRsPathAtt target DNs, each seen several
+times as during a refresh.
+
+Usage:
+    python -m benchmarks.bench_dn [--count 1000000] [--leafs 200]
+"""
+import argparse
+import random
+import re
+import time
+
+from aclilib import dn as dn_parser
+
+
+def legacy_parse(dn):
+    """String operations used by the collectors before aclilib.dn."""
+    if dn.startswith('uni/'):
+        tn = dn.split('/')[1].replace('tn-', '')
+        ap = dn.split('/')[2].replace('ap-', '')
+        epg = dn.split('/')[3].replace('epg-', '')
+        return tn, ap, epg
+    if '/pathep-' in dn:
+        match = re.findall(r'\[.*\]', dn)
+        pathep = match[0].strip('[]')
+        if 'protpaths' in dn:
+            return dn.split('/')[2], dn.split('/')[-1].split('[')[-1][:-1]
+        node = dn.split('/')[2].replace('paths-', '')
+        fex = dn.split('/')[3].replace('extpaths-', '') if 'extpaths-' in dn else 0
+        intf_id = pathep.replace('eth', '')
+        return int(node) * 1000000 + int(fex) * 1000 + int(intf_id.split('/')[0]) * 100 + int(intf_id.split('/')[-1])
+    node = dn.split('/')[2].replace('node-', '')
+    match = re.findall(r'\[eth.*\]', dn)
+    intf_id = match[0].strip('[eth]')
+    parts = intf_id.split('/')
+    if len(parts) == 3:
+        fex, module, port = parts
+    else:
+        fex, module, port = '0', parts[0], parts[1]
+    return int(node) * 1000000 + int(fex) * 1000 + int(module) * 100 + int(port)
+
+
+def population(leafs, ports):
+    dns = []
+    for leaf in range(101, 101 + leafs):
+        for port in range(1, ports + 1):
+            phys = 'topology/pod-1/node-{0}/sys/phys-[eth1/{1}]'.format(leaf, port)
+            dns.append(phys)
+            dns.append(phys + '/phys')
+            dns.append('topology/pod-1/paths-{0}/pathep-[eth1/{1}]'.format(leaf, port))
+        dns.append('topology/pod-1/paths-{0}/extpaths-101/pathep-[eth1/7]'.format(leaf))
+        dns.append('topology/pod-1/protpaths-{0}-{1}/pathep-[VPC_{0}]'.format(leaf, leaf + 1))
+        dns.append('uni/tn-TN_{0}/ap-AP_0/epg-EPG_{1}'.format(leaf % 20, leaf))
+    return dns
+
+
+def measure(func, dns):
+    start = time.perf_counter()
+    for dn in dns:
+        func(dn)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DN parsing')
+    parser.add_argument('--count', type=int, default=1000000, help='DNs parsed per run')
+    parser.add_argument('--leafs', type=int, default=200)
+    parser.add_argument('--ports', type=int, default=48)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    unique = population(args.leafs, args.ports)
+    rng = random.Random(args.seed)
+    # Each DN is seen several times, in roughly the order collectors read them
+    dns = []
+    while len(dns) < args.count:
+        block = unique[:]
+        rng.shuffle(block)
+        dns.extend(block)
+    dns = dns[:args.count]
+    print('{0} DNs, {1} unique, cache size {2}'.format(len(dns), len(unique), dn_parser.DN_CACHE_SIZE))
+
+    legacy = measure(legacy_parse, dns)
+    dn_parser.parse.cache_clear()
+    cold = measure(dn_parser.parse, dns)
+    info = dn_parser.parse.cache_info()
+    warm = measure(dn_parser.parse, dns)
+
+    for name, elapsed in (('legacy string ops', legacy), ('parse, cold cache', cold), ('parse, warm cache', warm)):
+        print('{0:<20} {1:7.3f}s  {2:10.0f} DN/s  {3:5.2f}x'.format(name, elapsed, len(dns) / elapsed, legacy / elapsed))
+    print('cold run cache hits {0}, misses {1}'.format(info.hits, info.misses))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Encap audit of the static bindings.
+
+Logs the shell in to a mock APIC and times collecting the interface table,
+policy groups, AEPs, VLAN pools and EPGs for the encap audit, then the
+audit alone on the collected data: building the EncapGraph and checking
+every binding.
+
+Usage:
+    python -m benchmarks.bench_encap [--size large] [--repeat 3]
+"""
+import argparse
+import time
+
+import requests
+
+from aclilib import encap
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+
+def measure(mock, func, repeat):
+    before = mock.stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    after = mock.stats()
+    return result, elapsed, (after['requests'] - before['requests']) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the encap audit of the static bindings')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+
+        def collect():
+            with shell.client.planned('interfaces', 'ipgs', 'aeps', 'vlan_pools', 'epgs'):
+                client = shell.client
+                return (client.interface_table(), client.get_ipgs(), client.get_aeps(), client.get_vlan_pools(),
+                        list(client.iter_epgs('ALL')))
+
+        data, elapsed, count = measure(mock, collect, args.repeat)
+        print('collect {0:8.3f}s  {1:6.1f} requests'.format(elapsed, count))
+        idict, ipgs, aeps, vlan_pools, epgs = data
+        graph, elapsed, _ = measure(mock, lambda: encap.EncapGraph(idict, ipgs, aeps, vlan_pools), args.repeat)
+        print('graph   {0:8.4f}s  {1} interfaces'.format(elapsed, len(graph.interface_groups)))
+        (checked, findings), elapsed, _ = measure(
+            mock, lambda: shell.client.audit_encap(idict, ipgs, aeps, vlan_pools, epgs), args.repeat)
+        print('audit   {0:8.4f}s  {1} bindings, {2} findings'.format(elapsed, checked, len(findings)))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Endpoint lookups: filtered APIC queries against the local endpoint table.
+
+Logs the shell in to a mock APIC and times MAC and IP lookups answered by
+filtered queries, the first load of the endpoint table, a modTs delta
+refresh after --moves endpoints moved to another path, lookups answered by
+the table after such a refresh, and a refresh after --removals endpoints
+were removed.
+
+Usage:
+    python -m benchmarks.bench_endpoints [--size large] [--lookups 100] [--moves 100] [--removals 100]
+"""
+import argparse
+import datetime
+import random
+import time
+
+import requests
+
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+
+def measure(mock, func, repeat=1):
+    before = mock.stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    after = mock.stats()
+    return elapsed, (after['requests'] - before['requests']) / repeat, (after['bytes'] - before['bytes']) / repeat
+
+
+def move_endpoints(mit, count, rng):
+    """Moves count endpoints to the path of another endpoint, with a newer modTs."""
+    dns = mit.class_dns('fvCEp')
+    t_dns = [mit.objects[dn][1]['tDn'] for dn in mit.class_dns('fvRsCEpToPathEp')]
+    stamp = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.000+00:00')
+    for endpoint_dn in rng.sample(dns, min(count, len(dns))):
+        for child_dn in mit.class_dns('fvRsCEpToPathEp', endpoint_dn):
+            mit.remove(child_dn)
+        t_dn = rng.choice(t_dns)
+        mit.add('fvRsCEpToPathEp', {'dn': '{0}/rscEpToPathEp-[{1}]'.format(endpoint_dn, t_dn), 'tDn': t_dn})
+        mit.add('fvCEp', {'dn': endpoint_dn, 'modTs': stamp})
+
+
+def remove_endpoints(mit, count, rng):
+    dns = mit.class_dns('fvCEp')
+    for endpoint_dn in rng.sample(dns, min(count, len(dns))):
+        mit.remove(endpoint_dn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare filtered endpoint queries with the endpoint table')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--lookups', type=int, default=100)
+    parser.add_argument('--moves', type=int, default=100)
+    parser.add_argument('--removals', type=int, default=100)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    rng = random.Random(args.seed)
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        endpoint_dns = mit.class_dns('fvCEp')
+        sample = [mit.objects[dn][1] for dn in rng.sample(endpoint_dns, min(args.lookups, len(endpoint_dns)))]
+        macs = [attributes['mac'] for attributes in sample]
+        ips = [attributes['ip'] for attributes in sample]
+
+        def lookups(lookup, addresses):
+            return lambda: [lookup(address) for address in addresses]
+
+        results = [
+            ('MAC lookups, filtered', measure(mock, lookups(shell.client.lookup_endpoints, macs))),
+            ('IP lookups, filtered', measure(mock, lookups(shell.client.lookup_endpoints, ips))),
+            ('table load', measure(mock, shell.client.load_endpoints)),
+        ]
+        move_endpoints(mit, args.moves, rng)
+        results.append(('delta refresh', measure(mock, shell.client.load_endpoints)))
+        results.append(('MAC lookups, table', measure(mock, lookups(shell.client.endpoint_table.lookup, macs))))
+        results.append(('IP lookups, table', measure(mock, lookups(shell.client.endpoint_table.lookup, ips))))
+        remove_endpoints(mit, args.removals, rng)
+        results.append(('refresh after removals', measure(mock, shell.client.load_endpoints)))
+        assert len(shell.client.endpoint_table) == len(mit.class_dns('fvCEp'))
+
+        print('{0} endpoints, {1} lookups, {2} moved, {3} removed'.format(len(endpoint_dns), len(sample), args.moves,
+                                                                          args.removals))
+        for name, (elapsed, count, size) in results:
+            print('{0:<24} {1:8.3f}s  {2:6.0f} requests  {3:12.0f} bytes'.format(name, elapsed, count, size))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+APIC side against local filtering of faults and events.
+
+Logs the shell in to a mock APIC and reads the major and critical faults of
+the last day and the events of the last hour twice: fetching the whole class
+and filtering locally, and with the severity and time filters applied by the
+APIC. Prints requests, bytes and time of each, and the time to the first
+page, when the streamed output starts.
+
+Usage:
+    python -m benchmarks.bench_faults [--size large] [--repeat 3]
+"""
+import argparse
+import time
+
+import requests
+
+from aclilib import faults
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+
+def measure(mock, pages, repeat):
+    """Returns (seconds, seconds to the first page, records, requests, bytes) per run of pages()."""
+    before = mock.stats()
+    elapsed = first = 0.0
+    records = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = 0
+        for index, page in enumerate(pages()):
+            if index == 0:
+                first += time.perf_counter() - start
+            records += len(page)
+        elapsed += time.perf_counter() - start
+    after = mock.stats()
+    return (elapsed / repeat, first / repeat, records, (after['requests'] - before['requests']) / repeat,
+            (after['bytes'] - before['bytes']) / repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare APIC side and local filtering of faults and events')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        fault_since = shell.client.since_time('faultInst', faults.FAULT_TIME, '1d')
+        event_since = shell.client.since_time('eventRecord', faults.EVENT_TIME, '1h')
+
+        def local(mo_class, predicate):
+            def pages():
+                uri = 'https://{0}/api/node/class/{1}.json'.format(shell.client.apic_address, mo_class)
+                for page in shell.client.iter_pages(uri, faults.PAGE_SIZE):
+                    yield [mo[mo_class]['attributes'] for mo in page['imdata']
+                           if predicate(mo[mo_class]['attributes'])]
+            return pages
+
+        cases = [('faults major since 1d',
+                  local('faultInst', lambda fault: fault['severity'] in ('critical', 'major') and
+                        fault[faults.FAULT_TIME] >= fault_since),
+                  lambda: shell.client.iter_faults('major', '', '1d')),
+                 ('events since 1h',
+                  local('eventRecord', lambda event: event[faults.EVENT_TIME] >= event_since),
+                  lambda: shell.client.iter_events('1h'))]
+        for name, local_pages, apic_pages in cases:
+            for method, pages in (('local', local_pages), ('apic', apic_pages)):
+                elapsed, first, records, count, size = measure(mock, pages, args.repeat)
+                print('{0:<24} {1:<6} {2:8.3f}s  first page {3:7.3f}s  {4:6} records  {5:5.1f} requests  '
+                      '{6:10.0f} bytes'.format(name, method, elapsed, first, records, count, size))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
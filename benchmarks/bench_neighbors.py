@@ -0,0 +1,71 @@
+"""
+LLDP/CDP neighbour join and name lookups.
+
+Logs the shell in to a mock APIC and times the interface table alone and
+with the neighbours fetched alongside, then looks up --lookups neighbour
+names in the NeighborIndex against scanning every interface.
+
+Usage:
+    python -m benchmarks.bench_neighbors [--size large] [--lookups 1000] [--repeat 3]
+"""
+import argparse
+import random
+import time
+
+import requests
+
+from aclilib import neighbors
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+
+def measure(mock, func, repeat):
+    before = mock.stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    after = mock.stats()
+    return result, elapsed, (after['requests'] - before['requests']) / repeat
+
+
+def scan(interface_neighbors, name):
+    name = name.lower()
+    return [neighbor for found in interface_neighbors.values() for neighbor in found
+            if neighbor.sys_name.lower() == name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the LLDP/CDP neighbour join and name lookups')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        for with_neighbors in (False, True):
+            _, elapsed, count = measure(mock, lambda: shell.get_interface_data(with_neighbors=with_neighbors),
+                                        args.repeat)
+            print('interface table, neighbors {0!s:<5} {1:8.3f}s  {2:6.1f} requests'.format(
+                with_neighbors, elapsed, count))
+        print('{0} interfaces, {1} with neighbors'.format(len(shell.idict), len(shell.interface_neighbors)))
+
+        index, elapsed, _ = measure(mock, lambda: neighbors.NeighborIndex(shell.interface_neighbors), args.repeat)
+        print('index build {0:8.4f}s  {1} names'.format(elapsed, len(index)))
+        rng = random.Random(args.seed)
+        names = [rng.choice(list(index.by_name)) for _ in range(args.lookups)] if len(index) else []
+        indexed, index_elapsed, _ = measure(mock, lambda: [index.find(name) for name in names], 1)
+        scanned, scan_elapsed, _ = measure(mock, lambda: [scan(shell.interface_neighbors, name) for name in names], 1)
+        assert [len(found) for found in indexed] == [len(found) for found in scanned]
+        print('{0} lookups, index {1:8.4f}s  scan {2:8.4f}s'.format(len(names), index_elapsed, scan_elapsed))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Sequential against parallel page fetching of large class queries.
+
+Logs the shell in to a mock APIC with --latency seconds added to every
+request and times fetching all pages of l1PhysIf and fvRsPathAtt at
+--page-size objects per page, with 1 to --max-parallelism pages in flight.
+
+Usage:
+    python -m benchmarks.bench_paging [--size medium] [--page-size 500] [--latency 0.1]
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+QUERY_CLASSES = ['l1PhysIf', 'fvRsPathAtt']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel page fetching')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds added to every request')
+    parser.add_argument('--max-parallelism', type=int, default=8)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit, latency=args.latency).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        for mo_class in QUERY_CLASSES:
+            uri = 'https://{0}/api/class/{1}.json'.format(mock.address, mo_class)
+            parallelism = 1
+            while parallelism <= args.max_parallelism:
+                if shell.client.page_pool:
+                    shell.client.page_pool.shutdown()
+                    shell.client.page_pool = None
+                shell.client.page_parallelism = parallelism
+                start = time.perf_counter()
+                pages = list(shell.client.iter_pages(uri, args.page_size))
+                elapsed = time.perf_counter() - start
+                count = sum(len(page['imdata']) for page in pages)
+                print('{0:<12} {1:2d} in flight {2:8.3f}s  {3:4d} pages  {4:7d} objects'.format(
+                    mo_class, parallelism, elapsed, len(pages), count))
+                parallelism *= 2
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark of l1PhysIf/ethpmPhysIf page parsing with 1, 2, 4 and 8 workers.
+
+Builds raw JSON pages for a large fabric and times decoding, parsing and
+merging them into an interface table, in-process for one worker and through
+aclilib.parallel's process pool otherwise. Speedup is bounded by the number
+of cores available.
+
+Usage:
+    python -m benchmarks.bench_parse [--ports 60000] [--page-size 5000]
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+
+from aclilib import parallel
+
+
+def build_pages(ports, page_size):
+    l1_objects = []
+    ethpm_objects = []
+    for index in range(ports):
+        node = 101 + index // 48
+        dn = 'topology/pod-1/node-{0}/sys/phys-[eth1/{1}]'.format(node, index % 48 + 1)
+        l1_objects.append({'l1PhysIf': {'attributes': {
+            'dn': dn, 'id': 'eth1/{0}'.format(index % 48 + 1), 'portT': 'leaf', 'usage': 'epg',
+            'descr': 'server {0}'.format(index), 'adminSt': 'up', 'mode': 'trunk', 'mtu': '9000',
+            'speed': 'inherit', 'layer': 'Layer2', 'autoNeg': 'on', 'modTs': '2020-06-01T02:00:00.000+00:00'}}})
+        ethpm_objects.append({'ethpmPhysIf': {'attributes': {
+            'dn': dn + '/phys', 'operSt': 'up', 'operSpeed': '10G', 'operDuplex': 'full', 'operMode': 'trunk',
+            'operVlans': '100-120,200', 'bundleIndex': 'unspecified', 'lastLinkStChg': '2020-06-01T02:00:00.000+00:00'}}})
+
+    pages = []
+    for objects, parse_func in ((l1_objects, parallel.parse_l1_phys_if),
+                                (ethpm_objects, parallel.parse_ethpm_phys_if)):
+        for start in range(0, len(objects), page_size):
+            body = {'totalCount': str(len(objects)), 'imdata': objects[start:start + page_size]}
+            pages.append((parse_func, json.dumps(body).encode('utf-8')))
+    return pages
+
+
+def run(pages, pool):
+    table = {}
+    start = time.perf_counter()
+    if pool is None:
+        results = (parse_func(page) for parse_func, page in pages)
+    else:
+        pending = deque(pool.submit(parse_func, page) for parse_func, page in pages)
+        results = (pending.popleft().result() for _ in range(len(pending)))
+    for rows in results:
+        for row in rows:
+            table.setdefault(row[0], []).append(row)
+    return time.perf_counter() - start, len(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark interface parsing with a process pool')
+    parser.add_argument('--ports', type=int, default=60000)
+    parser.add_argument('--page-size', type=int, default=5000)
+    parser.add_argument('--workers', default='1,2,4,8', help='comma separated worker counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = build_pages(args.ports, args.page_size)
+    size = sum(len(page) for _, page in pages)
+    print('{0} ports, {1} pages, {2:.1f} MB, {3} CPUs'.format(args.ports, len(pages), size / 1e6, os.cpu_count()))
+
+    baseline = None
+    for workers in [int(item) for item in args.workers.split(',')]:
+        pool = parallel.create_pool(workers)
+        if pool:
+            # Start the workers before timing
+            list(pool.map(abs, range(workers * 4)))
+        elapsed = min(run(pages, pool)[0] for _ in range(args.repeat))
+        if pool:
+            pool.shutdown()
+        baseline = baseline or elapsed
+        print('{0} workers  {1:7.3f}s  {2:5.2f}x'.format(workers, elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Planned against one by one collection of the datasets of composite commands.
+
+Logs the shell in to a mock APIC with a per request latency and runs the
+collectors of each composite command twice: one after the other as before
+and inside planned(), which merges their queries and runs them at once.
+Prints time and requests per run of each.
+
+Usage:
+    python -m benchmarks.bench_planner [--size medium] [--latency 0.05] [--repeat 3]
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stdout
+
+import requests
+
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+
+def measure(mock, func, repeat):
+    before = mock.stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            func()
+    elapsed = (time.perf_counter() - start) / repeat
+    after = mock.stats()
+    return elapsed, (after['requests'] - before['requests']) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare planned and one by one collection of composite commands')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every mock APIC request')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit, latency=args.latency).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+
+        def connect():
+            shell.collect_epgs()
+            shell.collect_leafs()
+
+        def show_vlan():
+            shell.get_epg_data('ALL')
+            shell.get_vlan_pool()
+
+        def show_port():
+            shell.get_interface_data()
+            shell.get_epg_data('ALL')
+
+        def import_plan():
+            shell.get_interface_data()
+            shell.get_ipg_data()
+            shell.get_vlan_pool()
+            shell.get_epg_data('ALL')
+            shell.client.get_node_dns(set(shell.leafs))
+
+        commands = [('login', connect, ('epg_names', 'leafs')),
+                    ('show vlan <id>', show_vlan, ('epgs', 'vlan_pools')),
+                    ('show interface <n> <p>', show_port, ('epgs', 'interfaces')),
+                    ('config binding import', import_plan, ('epgs', 'nodes', 'interfaces', 'ipgs', 'vlan_pools'))]
+        for name, func, datasets in commands:
+            def planned():
+                with shell.client.planned(*datasets):
+                    func()
+
+            elapsed, count = measure(mock, func, args.repeat)
+            planned_elapsed, planned_count = measure(mock, planned, args.repeat)
+            print('{0:<24} one by one {1:7.3f}s {2:5.1f} requests   planned {3:7.3f}s {4:5.1f} requests'.format(
+                name, elapsed, count, planned_elapsed, planned_count))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Client side rate limiting against a throttling mock APIC.
+
+The mock APIC answers 429 above --server-rate queries per second. A thread
+pool sends --requests queries with --concurrency in flight, first without a
+limiter, then through aclilib.ratelimit with the default budget (above the
+server rate, so the AIMD window and retries have to adapt) and with a budget
+below the server rate, then on the asyncio transport.
+
+Usage:
+    python -m benchmarks.bench_ratelimit [--server-rate 100] [--requests 400] [--concurrency 16]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from aclilib import aio
+from aclilib import ratelimit
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+
+
+def login(session, address, username, password):
+    payload = {'aaaUser': {'attributes': {'name': username, 'pwd': password}}}
+    response = session.post('https://{0}/api/aaaLogin.json'.format(address), data=json.dumps(payload), verify=False)
+    return {'APIC-cookie': response.cookies['APIC-cookie']}
+
+
+def run(mock, session, count, concurrency):
+    uri = 'https://{0}/api/class/fabricNode.json'.format(mock.address)
+    cookies = login(session, mock.address, mock.username, mock.password)
+    before = mock.stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(lambda _: session.get(uri, cookies=cookies, verify=False).status_code,
+                                 range(count)))
+    elapsed = time.perf_counter() - start
+    return elapsed, statuses.count(200), mock.stats()['throttled'] - before['throttled']
+
+
+def requests_session(concurrency):
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the client side rate limiter')
+    parser.add_argument('--server-rate', type=float, default=100.0, help='queries per second before the mock throttles')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.FabricGenerator(**fabric_gen.SIZES['small']).generate()
+    mock = MockApic(mit, query_rate=args.server_rate).start()
+    print('{0} queries, {1} in flight, mock APIC throttles above {2:g}/s'.format(args.requests, args.concurrency,
+                                                                                 args.server_rate))
+    sessions = [
+        ('no limiter', lambda: requests_session(args.concurrency)),
+        ('limiter {0:g}/s'.format(ratelimit.QUERY_RATE),
+         lambda: ratelimit.RateLimitedSession(requests_session(args.concurrency), max_concurrency=args.concurrency)),
+        ('limiter {0:g}/s'.format(args.server_rate * 0.9),
+         lambda: ratelimit.RateLimitedSession(requests_session(args.concurrency), max_concurrency=args.concurrency,
+                                              query_rate=args.server_rate * 0.9, query_burst=args.server_rate / 10)),
+    ]
+    if aio.HAVE_AIOHTTP:
+        sessions.append(('asyncio, limiter {0:g}/s'.format(ratelimit.QUERY_RATE),
+                         lambda: aio.AsyncSession(limit=args.concurrency)))
+    try:
+        for name, factory in sessions:
+            time.sleep(1)
+            session = factory()
+            elapsed, ok, throttled = run(mock, session, args.requests, args.concurrency)
+            line = '{0:<26} {1:6.2f}s  {2:4d} ok  {3:4d} throttled by the APIC'.format(name, elapsed, ok, throttled)
+            limiters = getattr(session, 'limiters', {})
+            for limiter in limiters.values():
+                stats = limiter.diagnostics()
+                line += '  window {0}/{1}, {2} retries'.format(stats['concurrency'], stats['max_concurrency'],
+                                                               stats['retries'])
+            print(line)
+            session.close()
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Fabric wide against per-leaf (node sharded) queries of l1PhysIf and ethpmPhysIf.
+
+The mock APIC adds --latency seconds to every request and --scan-latency
+seconds per object matched by a query, so a fabric wide class query slows
+down with the size of the fabric while node scoped queries only pay for
+their leaf. For each scan latency the benchmark times fetching both classes
+for all leaves with 'class' and 'node' sharding.
+
+Usage:
+    python -m benchmarks.bench_sharding [--size medium] [--latency 0.02] [--scan-latency 0 0.0001 0.0005]
+"""
+import argparse
+import time
+
+import requests
+
+from aclilib import parallel
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+QUERIES = [('l1PhysIf', parallel.parse_l1_phys_if), ('ethpmPhysIf', parallel.parse_ethpm_phys_if)]
+
+
+def fetch(shell, leaf_nodes):
+    count = 0
+    for mo_class, parse_func in QUERIES:
+        for rows in shell.client.iter_leaf_rows(mo_class, parse_func, leaf_nodes):
+            count += len(rows)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark node sharded interface queries')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every request')
+    parser.add_argument('--scan-latency', type=float, nargs='+', default=[0.0, 0.0001, 0.0005],
+                        help='seconds added per object matched by a query')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit, latency=args.latency).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        leaf_nodes = shell.client.get_leaf_nodes()
+        print('{0} leaves, {1:g}s per request'.format(len(leaf_nodes), args.latency))
+        for scan_latency in args.scan_latency:
+            mock.scan_latency = scan_latency
+            for shard_by in ('class', 'node'):
+                shell.client.shard_by = shard_by
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    count = fetch(shell, leaf_nodes)
+                elapsed = (time.perf_counter() - start) / args.repeat
+                print('scan {0:8.5f}s/object  {1:<6} {2:8.3f}s  {3:6d} objects'.format(
+                    scan_latency, shard_by, elapsed, count))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
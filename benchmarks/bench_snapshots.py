@@ -0,0 +1,55 @@
+"""
+APIC load of listing the last snapshots against listing all of them.
+
+Logs the shell in to a mock APIC and compares the requests, bytes and time
+of 'show snapshot', which fetches every configSnapshot, with 'show snapshot
+last <N>', sorted and limited by the APIC.
+
+Usage:
+    python -m benchmarks.bench_snapshots [--size large] [--last 10] [--repeat 5]
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stdout
+
+import requests
+
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+
+def measure(mock, func, repeat):
+    before = mock.stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            func()
+    elapsed = (time.perf_counter() - start) / repeat
+    after = mock.stats()
+    return elapsed, (after['requests'] - before['requests']) / repeat, (after['bytes'] - before['bytes']) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare listing the last snapshots with listing all of them')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--last', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        commands = ['show snapshot', 'show snapshot last {0}'.format(args.last)]
+        for command in commands:
+            elapsed, count, size = measure(mock, lambda: shell.onecmd(command), args.repeat)
+            print('{0:<24} {1:8.3f}s  {2:5.1f} requests  {3:10.0f} bytes'.format(command, elapsed, count, size))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Interface traffic statistics and top N ranking.
+
+Logs the shell in to a mock APIC and times reading the 5 minute ingress and
+egress counters of every interface, fabric wide and sharded per leaf, then
+ranks the interfaces with stats.top(), a heap, against a full sort.
+
+Usage:
+    python -m benchmarks.bench_stats [--size large] [--top 20] [--repeat 3]
+"""
+import argparse
+import time
+
+import requests
+
+from aclilib import stats
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login
+
+
+def measure(mock, func, repeat):
+    before = mock.stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    after = mock.stats()
+    return result, elapsed, (after['requests'] - before['requests']) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time interface statistics collection and top N ranking')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        shell.get_interface_data()
+        print('{0} interfaces'.format(len(shell.idict)))
+        for shard_by in ('class', 'node'):
+            shell.client.shard_by = shard_by
+            rates, elapsed, count = measure(mock, lambda: shell.client.get_interface_rates(shell.idict), args.repeat)
+            print('counters, shard by {0:<6} {1:8.3f}s  {2:6.1f} requests  {3} rates'.format(
+                shard_by, elapsed, count, len(rates)))
+
+        values = list(rates.values())
+        heap_top, heap_elapsed, _ = measure(mock, lambda: stats.top(values, args.top), args.repeat * 10)
+        sort_top, sort_elapsed, _ = measure(
+            mock, lambda: sorted(values, key=stats.rank_key, reverse=True)[:args.top], args.repeat * 10)
+        assert [rate.key for rate in heap_top] == [rate.key for rate in sort_top]
+        print('top {0:<4} heap {1:8.4f}s  full sort {2:8.4f}s'.format(args.top, heap_elapsed, sort_elapsed))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
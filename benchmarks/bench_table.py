@@ -0,0 +1,93 @@
+"""
+Benchmark of the interface table on a large fabric.
+
+Builds the selector, l1PhysIf and ethpmPhysIf rows of --ports interfaces and
+times the join into a dict and into the columnar InterfaceTable, then the
+filters used by the shell: down ports with a policy group and the members of
+a vPC policy group.
+
+Usage:
+    python -m benchmarks.bench_table [--ports 200000]
+"""
+import argparse
+import random
+import time
+
+from aclilib import dn as dn_parser
+from aclilib import table
+
+PORTS_PER_LEAF = 48
+
+
+def build_rows(ports, seed):
+    rng = random.Random(seed)
+    selector_rows = []
+    l1_rows = []
+    ethpm_rows = []
+    leaf_nodes = []
+    for index in range(ports):
+        node = str(101 + index // PORTS_PER_LEAF)
+        port = index % PORTS_PER_LEAF + 1
+        if port == 1:
+            leaf_nodes.append(node)
+        key = dn_parser.interface_key(node, 0, 1, port)
+        intf_id = '1/{0}'.format(port)
+        # Three quarters of the ports have a selector, vPC pairs on the first eight ports
+        if port <= 8:
+            pair = int(node) - (int(node) - 101) % 2
+            policy_group = 'VPC_{0}_{1}_{2}'.format(pair, pair + 1, port)
+            selector_rows.append((key, node, intf_id, policy_group, policy_group))
+        elif port <= 36:
+            selector_rows.append((key, node, intf_id, 'ACC_{0}_{1}'.format(node, port), 'ACC_PG_{0}'.format(port % 20)))
+        l1_rows.append((key, node, '1', intf_id, 'leaf', 'epg', ''))
+        ethpm_rows.append((key, node, rng.choice(('up', 'up', 'up', 'down')), '10G', 'full'))
+    return selector_rows, l1_rows, ethpm_rows, leaf_nodes
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the interface table')
+    parser.add_argument('--ports', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if not table.HAVE_NUMPY:
+        parser.exit(1, 'NumPy is not installed, the columnar table is not available\n')
+
+    rows = build_rows(args.ports, args.seed)
+    print('{0} ports, {1} selector rows'.format(args.ports, len(rows[0])))
+
+    protpaths = 'protpaths-101-102'
+    tables = {'dict': table.build_dict(*rows), 'columnar': table.InterfaceTable.build(*rows)}
+    timings = {
+        'build': {'dict': lambda: table.build_dict(*rows), 'columnar': lambda: table.InterfaceTable.build(*rows)},
+        'down with policy group': {
+            'dict': lambda: [key for key, row in tables['dict'].items()
+                             if row['operSt'] == 'down' and row['policy_group']],
+            'columnar': lambda: tables['columnar'].keys_where(tables['columnar'].equals('operSt', 'down') &
+                                                              ~tables['columnar'].equals('policy_group', ''))},
+        'vpc members': {
+            'dict': lambda: table.select(tables['dict'], 'VPC_101_102_1', protpaths.__contains__),
+            'columnar': lambda: table.select(tables['columnar'], 'VPC_101_102_1', protpaths.__contains__)},
+    }
+
+    for name, funcs in timings.items():
+        dict_time, dict_result = measure(funcs['dict'], args.repeat)
+        columnar_time, columnar_result = measure(funcs['columnar'], args.repeat)
+        if name != 'build':
+            assert sorted(dict_result) == sorted(columnar_result), name
+        print('{0:<24} dict {1:8.2f}ms  columnar {2:8.2f}ms  {3:6.1f}x'.format(
+            name, dict_time * 1000, columnar_time * 1000, dict_time / columnar_time))
+
+
+if __name__ == '__main__':
+    main()
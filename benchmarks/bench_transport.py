@@ -0,0 +1,93 @@
+"""
+Throughput of the requests thread-pool and asyncio transports against a mock APIC.
+
+Both transports log in and fetch the l1PhysIf table page by page, --requests
+pages per run, with 1 to N requests in flight: the requests transport with a
+thread pool sharing one requests.Session, the asyncio transport with one
+AsyncApic limited to the same number of requests. The mock APIC adds
+--latency seconds to every request, standing in for a remote controller.
+
+Usage:
+    python -m benchmarks.bench_transport [--size small] [--latency 0.02] [--requests 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from aclilib import aio
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+
+
+def page_paths(count, page_size):
+    return ['/api/class/l1PhysIf.json?page={0}&page-size={1}'.format(page, page_size) for page in range(count)]
+
+
+def run_threads(address, username, password, paths, concurrency):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('https://', adapter)
+    payload = {'aaaUser': {'attributes': {'name': username, 'pwd': password}}}
+    response = session.post('https://{0}/api/aaaLogin.json'.format(address), data=json.dumps(payload), verify=False)
+    cookies = {'APIC-cookie': response.cookies['APIC-cookie']}
+
+    def fetch(path):
+        return len(session.get('https://{0}{1}'.format(address, path), cookies=cookies, verify=False).json()['imdata'])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        objects = sum(pool.map(fetch, paths))
+    elapsed = time.perf_counter() - start
+    session.close()
+    return elapsed, objects
+
+
+def run_asyncio(address, username, password, paths, concurrency):
+    async def main():
+        client = aio.AsyncApic(address, limit=concurrency, query_rate=1e6, query_burst=1e6)
+        await client.login(username, password)
+        start = time.perf_counter()
+        pages = await asyncio.gather(*[client.query(path) for path in paths])
+        elapsed = time.perf_counter() - start
+        await client.close()
+        return elapsed, sum(len(page) for page in pages)
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the requests and asyncio transports')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every mock APIC request')
+    parser.add_argument('--requests', type=int, default=200, help='pages fetched per run')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--concurrency', default='1,4,8,16', help='comma separated requests in flight')
+    args = parser.parse_args()
+    if not aio.HAVE_AIOHTTP:
+        parser.exit(1, 'aiohttp is not installed, the asyncio transport is not available\n')
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit, latency=args.latency).start()
+    paths = page_paths(args.requests, args.page_size)
+    print('{0} requests of {1} l1PhysIf objects, {2:.0f}ms latency'.format(len(paths), args.page_size,
+                                                                          args.latency * 1000))
+    try:
+        for concurrency in [int(item) for item in args.concurrency.split(',')]:
+            results = {}
+            for name, func in (('threads', run_threads), ('asyncio', run_asyncio)):
+                results[name] = func(mock.address, mock.username, mock.password, paths, concurrency)
+            assert results['threads'][1] == results['asyncio'][1]
+            print('{0:>3} in flight  threads {1:7.1f} req/s  asyncio {2:7.1f} req/s'.format(
+                concurrency, len(paths) / results['threads'][0], len(paths) / results['asyncio'][0]))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
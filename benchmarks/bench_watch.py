@@ -0,0 +1,63 @@
+"""
+APIC load of a watch refresh against rerunning show interface.
+
+Logs the shell in to a mock APIC and compares the requests, bytes and time
+of one 'show interface <node>' with one refresh of 'watch show interface
+<node>', which fetches the node scoped ethpmPhysIf state only.
+
+Usage:
+    python -m benchmarks.bench_watch [--size medium] [--repeat 5]
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stdout
+
+import requests
+
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+from benchmarks.run import login, sample_arguments
+
+
+def measure(mock, func, repeat):
+    before = mock.stats()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            func()
+    elapsed = (time.perf_counter() - start) / repeat
+    after = mock.stats()
+    return elapsed, (after['requests'] - before['requests']) / repeat, (after['bytes'] - before['bytes']) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare a watch refresh with rerunning show interface')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    requests.packages.urllib3.disable_warnings()
+    mit = fabric_gen.load_dataset(args)
+    mock = MockApic(mit).start()
+    try:
+        shell = login(mock.address, mock.username, mock.password)
+        node = sample_arguments(mit)['node']
+        shell.get_interface_data()
+        keys = [key for key, intf in shell.idict.items() if intf['node'] == node]
+        node_dns = shell.client.get_node_dns({node})
+
+        def show():
+            shell.get_interface_data()
+            shell.print_interface(node)
+
+        results = [('show interface {0}'.format(node), measure(mock, show, args.repeat)),
+                   ('watch refresh', measure(mock, lambda: shell.client.get_oper_state(keys, node_dns), args.repeat))]
+        for name, (elapsed, count, size) in results:
+            print('{0:<20} {1:8.3f}s  {2:5.1f} requests  {3:10.0f} bytes'.format(name, elapsed, count, size))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+"""
+Generates synthetic but realistic APIC datasets.
+
+The dataset contains the objects ACLI reads: pods and nodes, leaf and FEX
+interfaces with their operational state, switch/interface/FEX profiles with
+port selectors, interface policy groups, AEPs, physical domains, VLAN pools,
+tenants with EPGs and static bindings (access ports, PCs, vPCs and FEX ports),
+configuration snapshots, faults, events, learned endpoints, 5 minute
+interface traffic counters, health scores and LLDP/CDP neighbours.
+
+Usage:
+    python -m benchmarks.fabric_gen --size medium --output fabric.json.gz
+"""
+import argparse
+import datetime
+import random
+
+from aclilib import dn as dn_parser
+from aclilib import stats
+from aclilib.mit import Mit
+
+SIZES = {
+    'small': {'pods': 1, 'leafs': 4, 'spines': 2, 'ports': 48, 'fexes': 2, 'fex_ports': 48, 'tenants': 2,
+              'epgs': 20, 'bindings': 10, 'vpcs': 4, 'vlan_pools': 4, 'snapshots': 20, 'faults': 100,
+              'events': 1000, 'endpoints': 500},
+    'medium': {'pods': 2, 'leafs': 20, 'spines': 2, 'ports': 48, 'fexes': 10, 'fex_ports': 48, 'tenants': 8,
+               'epgs': 400, 'bindings': 20, 'vpcs': 8, 'vlan_pools': 8, 'snapshots': 365, 'faults': 2000,
+               'events': 20000, 'endpoints': 20000},
+    'large': {'pods': 4, 'leafs': 100, 'spines': 4, 'ports': 64, 'fexes': 100, 'fex_ports': 48, 'tenants': 20,
+              'epgs': 3000, 'bindings': 30, 'vpcs': 12, 'vlan_pools': 16, 'snapshots': 1500, 'faults': 10000,
+              'events': 100000, 'endpoints': 200000},
+}
+
+SPEEDS = ['10G', '25G', '10G', '1G']
+LINK_LEVEL_POLICIES = ['10G', '25G', '1G', 'AUTO']
+SNAPSHOT_TRIGGERS = ['defaultAuto', 'DailyAuto', 'defaultOneTime']
+# (code, severity, cause, raised on, description)
+FAULT_TYPES = [
+    ('F0532', 'warning', 'interface-physical-down', 'interface', 'Port is down, reason:sfpAbsent(connected)'),
+    ('F0546', 'minor', 'interface-physical-down', 'interface', 'Port is down, reason:notconnect(notconnect)'),
+    ('F1296', 'major', 'threshold-crossed', 'interface', 'CRC error rate above threshold'),
+    ('F1678', 'major', 'port-down', 'interface', 'Port is down, reason:err-disabled'),
+    ('F1394', 'critical', 'equipment-psu-failed', 'node', 'Power supply shutdown'),
+    ('F0411', 'warning', 'equipment-psu-missing', 'node', 'PSU is missing'),
+    ('F0467', 'minor', 'configuration-failed', 'epg', 'Configuration failed due to Invalid Path Configuration'),
+    ('F0956', 'cleared', 'port-down', 'interface', 'Port is down, reason:linkFlapErrDisabled'),
+]
+# (code, cause, raised on, description)
+EVENT_TYPES = [
+    ('E4205125', 'port-up', 'interface', 'Port is up'),
+    ('E4205126', 'port-down', 'interface', 'Port is down'),
+    ('E4204936', 'transition', 'node', 'Node state changed'),
+    ('E4205134', 'state-change', 'epg', 'EPG deployment updated'),
+]
+FAULT_DAYS = 30
+EVENT_DAYS = 7
+ENDPOINT_DAYS = 7
+# Endpoints with a second IP address
+SECONDARY_IP_RATIO = 0.2
+# Average packet size of the interface traffic counters
+PACKET_BYTES = 800
+# Neighbours also seen by CDP
+CDP_RATIO = 0.3
+VLANS_PER_POOL = 200
+
+
+class FabricGenerator(object):
+    def __init__(self, pods=1, leafs=4, spines=2, ports=48, fexes=2, fex_ports=48, tenants=2, epgs=20,
+                 bindings=10, vpcs=4, vlan_pools=4, snapshots=20, faults=100, events=1000, endpoints=500, access_ipgs=20, seed=1):
+        self.pods = pods
+        self.leafs = leafs
+        self.spines = spines
+        self.ports = ports
+        self.fexes = fexes
+        self.fex_ports = fex_ports
+        self.tenants = tenants
+        self.epgs = epgs
+        self.bindings = bindings
+        self.vpcs = vpcs
+        self.vlan_pools = vlan_pools
+        self.snapshots = snapshots
+        self.faults = faults
+        self.events = events
+        self.endpoints = endpoints
+        self.access_ipgs = access_ipgs
+        self.random = random.Random(seed)
+        self.mit = Mit()
+        # Static binding targets: (kind, pod, tDn)
+        self.paths = []
+
+    def add(self, mo_class, dn, **attributes):
+        attributes['dn'] = dn
+        self.mit.add(mo_class, attributes)
+
+    def generate(self):
+        self.add('polUni', 'uni')
+        self.add('infraInfra', 'uni/infra')
+        self.add('infraFuncP', 'uni/infra/funcprof')
+        self.add('fabricTopology', 'topology')
+        self.add_domains()
+        self.add_ipgs()
+        self.add_nodes()
+        self.add_tenants()
+        self.add_snapshots()
+        self.add_faults()
+        self.add_events()
+        self.add_endpoints()
+        self.add_counters()
+        self.add_health()
+        self.add_neighbors()
+        return self.mit
+
+    def add_domains(self):
+        for pool in range(self.vlan_pools):
+            pool_name = 'POOL_{0}'.format(pool)
+            domain = 'PHYS_{0}'.format(pool)
+            aep = 'AEP_{0}'.format(pool)
+            pool_dn = 'uni/infra/vlanns-[{0}]-static'.format(pool_name)
+            from_vlan = 100 + pool * VLANS_PER_POOL
+            self.add('fvnsVlanInstP', pool_dn, name=pool_name, allocMode='static')
+            self.add('fvnsEncapBlk', '{0}/from-[vlan-{1}]-to-[vlan-{2}]'.format(pool_dn, from_vlan,
+                                                                              from_vlan + VLANS_PER_POOL - 1),
+                     **{'from': 'vlan-{0}'.format(from_vlan), 'to': 'vlan-{0}'.format(from_vlan + VLANS_PER_POOL - 1),
+                        'allocMode': 'inherit'})
+            self.add('fvnsRtVlanNs', '{0}/rtinfraVlanNs-[uni/phys-{1}]'.format(pool_dn, domain),
+                     tDn='uni/phys-{0}'.format(domain), tCl='physDomP')
+            self.add('physDomP', 'uni/phys-{0}'.format(domain), name=domain)
+            self.add('infraRsVlanNs', 'uni/phys-{0}/rsvlanNs'.format(domain), tDn=pool_dn, tCl='fvnsVlanInstP')
+            self.add('infraAttEntityP', 'uni/infra/attentp-{0}'.format(aep), name=aep)
+            self.add('infraRsDomP', 'uni/infra/attentp-{0}/rsdomP-[uni/phys-{1}]'.format(aep, domain),
+                     tDn='uni/phys-{0}'.format(domain), tCl='physDomP')
+        # All AEPs but the last carry every domain, so bindings on the last AEP's ports mostly fail the encap audit
+        for aep in range(self.vlan_pools - 1):
+            for pool in range(self.vlan_pools):
+                self.add('infraRsDomP', 'uni/infra/attentp-AEP_{0}/rsdomP-[uni/phys-PHYS_{1}]'.format(aep, pool),
+                         tDn='uni/phys-PHYS_{0}'.format(pool), tCl='physDomP')
+
+    def add_ipg_policies(self, dn, index):
+        self.add('infraRsAttEntP', dn + '/rsattEntP',
+                 tDn='uni/infra/attentp-AEP_{0}'.format(index % self.vlan_pools))
+        self.add('infraRsHIfPol', dn + '/rshIfPol',
+                 tnFabricHIfPolName=LINK_LEVEL_POLICIES[index % len(LINK_LEVEL_POLICIES)])
+        self.add('infraRsStpIfPol', dn + '/rsstpIfPol', tnStpIfPolName='BPDU_GUARD' if index % 3 else '')
+        self.add('infraRsMcpIfPol', dn + '/rsmcpIfPol', tnMcpIfPolName='MCP_ON')
+        self.add('infraRsCdpIfPol', dn + '/rscdpIfPol', tnCdpIfPolName='CDP_OFF' if index % 2 else 'CDP_ON')
+        self.add('infraRsL2IfPol', dn + '/rsl2IfPol', tnL2IfPolName='VLAN_GLOBAL')
+        self.add('infraRsLldpIfPol', dn + '/rslldpIfPol', tnLldpIfPolName='LLDP_ON')
+
+    def add_ipgs(self):
+        for index in range(self.access_ipgs):
+            name = 'ACC_PG_{0}'.format(index)
+            dn = 'uni/infra/funcprof/accportgrp-{0}'.format(name)
+            self.add('infraAccPortGrp', dn, name=name)
+            self.add_ipg_policies(dn, index)
+
+    def add_bundle(self, name, lag_t, index):
+        dn = 'uni/infra/funcprof/accbundle-{0}'.format(name)
+        self.add('infraAccBndlGrp', dn, name=name, lagT=lag_t)
+        self.add_ipg_policies(dn, index)
+        self.add('infraRsLacpPol', dn + '/rslacpPol', tnLacpLagPolName='LACP_ACTIVE')
+
+    def add_switch_profile(self, name, from_node, to_node):
+        dn = 'uni/infra/nprof-{0}'.format(name)
+        self.add('infraNodeP', dn, name=name)
+        self.add('infraLeafS', '{0}/leaves-{1}-typ-range'.format(dn, name), name=name, type='range')
+        self.add('infraNodeBlk', '{0}/leaves-{1}-typ-range/nodeblk-blk{2}'.format(dn, name, from_node),
+                 name='blk{0}'.format(from_node), from_=str(from_node), to_=str(to_node))
+
+    def add_interface_profile(self, name, switch_profile):
+        dn = 'uni/infra/accportprof-{0}'.format(name)
+        self.add('infraAccPortP', dn, name=name)
+        self.add('infraRtAccPortP', '{0}/rtaccPortP-[uni/infra/nprof-{1}]'.format(dn, switch_profile),
+                 tDn='uni/infra/nprof-{0}'.format(switch_profile))
+        return dn
+
+    def add_selector(self, profile_dn, name, from_port, to_port, group_dn, fex_id='101'):
+        dn = '{0}/hports-{1}-typ-range'.format(profile_dn, name)
+        self.add('infraHPortS', dn, name=name, type='range')
+        self.add('infraPortBlk', dn + '/portblk-block2', name='block2', fromCard='1', toCard='1',
+                 fromPort=str(from_port), toPort=str(to_port))
+        self.add('infraRsAccBaseGrp', dn + '/rsaccBaseGrp', tDn=group_dn, fexId=str(fex_id))
+        return dn
+
+    def add_interface(self, pod, node, intf_id, port_t='leaf', usage='discovery', descr=''):
+        dn = 'topology/pod-{0}/node-{1}/sys/phys-[eth{2}]'.format(pod, node, intf_id)
+        self.add('l1PhysIf', dn, id='eth' + intf_id, portT=port_t, usage=usage, descr=descr,
+                 adminSt='up', mode='trunk')
+        oper_st = 'up' if self.random.random() < 0.85 else 'down'
+        self.add('ethpmPhysIf', dn + '/phys', operSt=oper_st, operDuplex='full',
+                 operSpeed=self.random.choice(SPEEDS) if oper_st == 'up' else 'unknown')
+
+    def add_nodes(self):
+        leafs_by_pod = {}
+        for pod in range(1, self.pods + 1):
+            base = 100 if pod == 1 else pod * 1000 + 100
+            leafs_by_pod[pod] = [base + leaf + 1 for leaf in range(self.leafs)]
+
+        # FEXes are single homed and spread round-robin over all leafs
+        all_leafs = [node for pod in sorted(leafs_by_pod) for node in leafs_by_pod[pod]]
+        fex_counts = {}
+        for fex in range(self.fexes):
+            node = all_leafs[fex % len(all_leafs)]
+            fex_counts[node] = fex_counts.get(node, 0) + 1
+
+        fex_id = 101
+        vpc_index = 0
+        for pod in range(1, self.pods + 1):
+            self.add('fabricPod', 'topology/pod-{0}'.format(pod), id=str(pod), podType='physical')
+            if pod == 1:
+                for controller in range(1, 4):
+                    self.add('fabricNode', 'topology/pod-1/node-{0}'.format(controller), id=str(controller),
+                             name='APIC{0}'.format(controller), role='controller', fabricSt='unknown')
+            for spine in range(self.spines):
+                node = pod * 1000 + 200 + spine + 1
+                self.add('fabricNode', 'topology/pod-{0}/node-{1}'.format(pod, node), id=str(node),
+                         name='SPINE{0}'.format(node), role='spine', fabricSt='active', model='N9K-C9364C')
+
+            leafs = leafs_by_pod[pod]
+            for node in leafs:
+                self.add('fabricNode', 'topology/pod-{0}/node-{1}'.format(pod, node), id=str(node),
+                         name='LEAF{0}'.format(node), role='leaf', fabricSt='active', model='N9K-C93180YC-EX')
+                self.add_switch_profile('LF{0}'.format(node), node, node)
+                profile_dn = self.add_interface_profile('LF{0}_IFP'.format(node), 'LF{0}'.format(node))
+
+                # Fabric uplinks on the last two ports
+                for port in range(self.ports - 1, self.ports + 1):
+                    self.add_interface(pod, node, '1/{0}'.format(port), port_t='fab', usage='fabric')
+                last_port = self.ports - 2
+
+                # FEX uplinks below the fabric uplinks
+                for _ in range(fex_counts.get(node, 0)):
+                    self.add_fex(pod, node, fex_id, profile_dn, last_port - 1, last_port)
+                    last_port -= 2
+                    fex_id += 1
+
+                # Port-channels
+                first_port = self.vpcs + 1
+                for pc in range(2):
+                    name = 'PC_{0}_{1}'.format(node, pc)
+                    self.add_bundle(name, 'link', pc)
+                    self.add_selector(profile_dn, name, first_port, first_port + 1,
+                                      'uni/infra/funcprof/accbundle-{0}'.format(name))
+                    for port in (first_port, first_port + 1):
+                        self.add_interface(pod, node, '1/{0}'.format(port), usage='epg',
+                                           descr='{0} member'.format(name))
+                    self.paths.append(('pc', pod, 'topology/pod-{0}/paths-{1}/pathep-[{2}]'.format(pod, node, name)))
+                    first_port += 2
+
+                # Access ports, single port and 4 port selectors, a few left unconfigured
+                port = first_port
+                while port <= last_port:
+                    width = 4 if self.random.random() < 0.3 else 1
+                    width = min(width, last_port - port + 1)
+                    if self.random.random() < 0.15:
+                        for unused in range(port, port + width):
+                            self.add_interface(pod, node, '1/{0}'.format(unused))
+                    else:
+                        ipg = 'ACC_PG_{0}'.format(self.random.randrange(self.access_ipgs))
+                        name = 'ACC_{0}_{1}'.format(node, port)
+                        self.add_selector(profile_dn, name, port, port + width - 1,
+                                          'uni/infra/funcprof/accportgrp-{0}'.format(ipg))
+                        for access_port in range(port, port + width):
+                            self.add_interface(pod, node, '1/{0}'.format(access_port), usage='epg',
+                                               descr='server {0}-{1}'.format(node, access_port))
+                            self.paths.append(('port', pod, 'topology/pod-{0}/paths-{1}/pathep-[eth1/{2}]'.format(
+                                pod, node, access_port)))
+                    port += width
+
+            # vPC pairs share ports 1..vpcs on both leafs
+            for left, right in zip(leafs[0::2], leafs[1::2]):
+                pair = 'LF{0}-{1}'.format(left, right)
+                self.add_switch_profile(pair, left, right)
+                profile_dn = self.add_interface_profile(pair + '_IFP', pair)
+                for port in range(1, self.vpcs + 1):
+                    name = 'VPC_{0}_{1}_{2}'.format(left, right, port)
+                    self.add_bundle(name, 'node', vpc_index)
+                    vpc_index += 1
+                    self.add_selector(profile_dn, name, port, port,
+                                      'uni/infra/funcprof/accbundle-{0}'.format(name))
+                    for node in (left, right):
+                        self.add_interface(pod, node, '1/{0}'.format(port), usage='epg',
+                                           descr='{0} member'.format(name))
+                    self.paths.append(('vpc', pod, 'topology/pod-{0}/protpaths-{1}-{2}/pathep-[{3}]'.format(
+                        pod, left, right, name)))
+            if len(leafs) % 2:
+                for port in range(1, self.vpcs + 1):
+                    self.add_interface(pod, leafs[-1], '1/{0}'.format(port))
+
+    def add_fex(self, pod, node, fex_id, profile_dn, from_port, to_port):
+        name = 'FEX{0}_{1}'.format(fex_id, node)
+        fex_dn = 'uni/infra/fexprof-{0}'.format(name)
+        bundle_dn = '{0}/fexbundle-{1}'.format(fex_dn, name)
+        self.add('infraFexP', fex_dn, name=name)
+        self.add('infraFexBndlGrp', bundle_dn, name=name)
+        selector_dn = self.add_selector(profile_dn, name, from_port, to_port, bundle_dn, fex_id)
+        self.add('infraRtAccBaseGrp', '{0}/rtaccBaseGrp-[{1}/rsaccBaseGrp]'.format(bundle_dn, selector_dn),
+                 tDn=selector_dn + '/rsaccBaseGrp')
+        for port in (from_port, to_port):
+            self.add_interface(pod, node, '1/{0}'.format(port), port_t='leaf', usage='fabric,fabric-ext')
+
+        for port in range(1, self.fex_ports + 1):
+            intf_id = '{0}/1/{1}'.format(fex_id, port)
+            if port % 8 == 0:
+                self.add_interface(pod, node, intf_id)
+                continue
+            ipg = 'ACC_PG_{0}'.format(self.random.randrange(self.access_ipgs))
+            self.add_selector(fex_dn, 'FEX_{0}_{1}'.format(fex_id, port), port, port,
+                              'uni/infra/funcprof/accportgrp-{0}'.format(ipg), fex_id)
+            self.add_interface(pod, node, intf_id, usage='epg', descr='fex host {0}'.format(port))
+            self.paths.append(('fex', pod, 'topology/pod-{0}/paths-{1}/extpaths-{2}/pathep-[eth1/{3}]'.format(
+                pod, node, fex_id, port)))
+
+    def add_tenants(self):
+        for tenant in range(self.tenants):
+            self.add('fvTenant', 'uni/tn-TN_{0}'.format(tenant), name='TN_{0}'.format(tenant))
+
+        for index in range(self.epgs):
+            tenant = 'TN_{0}'.format(index % self.tenants)
+            ap = 'AP_{0}'.format((index // self.tenants) % 4)
+            name = 'EPG_{0}'.format(index)
+            bd = 'BD_{0}'.format(index)
+            pool = index % self.vlan_pools
+            encap = 100 + pool * VLANS_PER_POOL + (index // self.vlan_pools) % VLANS_PER_POOL
+            ap_dn = 'uni/tn-{0}/ap-{1}'.format(tenant, ap)
+            epg_dn = '{0}/epg-{1}'.format(ap_dn, name)
+            self.add('fvAp', ap_dn, name=ap)
+            self.add('fvBD', 'uni/tn-{0}/BD-{1}'.format(tenant, bd), name=bd)
+            self.add('fvAEPg', epg_dn, name=name, pcEnfPref='unenforced')
+            self.add('fvRsBd', epg_dn + '/rsbd', tnFvBDName=bd, tDn='uni/tn-{0}/BD-{1}'.format(tenant, bd))
+            self.add('fvRsDomAtt', '{0}/rsdomAtt-[uni/phys-PHYS_{1}]'.format(epg_dn, pool),
+                     tDn='uni/phys-PHYS_{0}'.format(pool))
+            if index % 3 == 0:
+                self.add('tagInst', epg_dn + '/tag-prod', name='prod')
+
+            if not self.paths:
+                continue
+            for _, pod, t_dn in self.random.sample(self.paths, min(self.bindings, len(self.paths))):
+                self.add('fvRsPathAtt', '{0}/rspathAtt-[{1}]'.format(epg_dn, t_dn), tDn=t_dn,
+                         encap='vlan-{0}'.format(encap), mode='regular', instrImedcy='lazy')
+
+    def add_snapshots(self):
+        start = datetime.datetime(2020, 6, 1, 2, 0, 0)
+        for index in range(self.snapshots):
+            trigger = SNAPSHOT_TRIGGERS[index % len(SNAPSHOT_TRIGGERS)]
+            created = start - datetime.timedelta(days=self.snapshots - index)
+            stamp = created.strftime('%Y-%m-%dT%H-%M-%S')
+            self.add('configSnapshot',
+                     'uni/backupst/snapshots-[uni/fabric/configexp-{0}]/snapshot-run-{1}'.format(trigger, stamp),
+                     name='run-{0}'.format(stamp), fileName='ce2_{0}-{1}.tar.gz'.format(trigger, stamp),
+                     createTime=created.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'),
+                     descr='snapshot {0}'.format(index) if index % 5 == 0 else '')
+
+
+    def affected_dn(self, target):
+        """Returns the DN of a random interface, leaf node or EPG a fault or an event is raised on."""
+        if target == 'interface':
+            return self.random.choice(self.interface_dns)
+        if target == 'node':
+            return self.random.choice(self.leaf_dns)
+        return self.random.choice(self.epg_dns)
+
+    def add_faults(self):
+        self.interface_dns = self.mit.class_dns('l1PhysIf')
+        self.leaf_dns = [dn for dn in self.mit.class_dns('fabricNode') if self.mit.objects[dn][1]['role'] == 'leaf']
+        self.epg_dns = self.mit.class_dns('fvAEPg')
+        end = datetime.datetime(2020, 6, 1, 2, 0, 0)
+        for _ in range(self.faults):
+            code, severity, cause, target, descr = self.random.choice(FAULT_TYPES)
+            dn = '{0}/fault-{1}'.format(self.affected_dn(target), code)
+            created = end - datetime.timedelta(seconds=self.random.randrange(FAULT_DAYS * 86400))
+            age = int((end - created).total_seconds())
+            changed = created + datetime.timedelta(seconds=self.random.randrange(age + 1))
+            self.add('faultInst', dn, code=code, severity=severity, cause=cause, descr=descr,
+                     lc='retaining' if severity == 'cleared' else 'raised', ack='no', domain='infra',
+                     type='operational',
+                     created=created.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'),
+                     lastTransition=changed.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'))
+
+    def add_events(self):
+        stamp = datetime.datetime(2020, 6, 1, 2, 0, 0) - datetime.timedelta(days=EVENT_DAYS)
+        step = EVENT_DAYS * 86400.0 / max(1, self.events)
+        for index in range(self.events):
+            code, cause, target, descr = self.random.choice(EVENT_TYPES)
+            affected = self.affected_dn(target)
+            record_id = 4294967296 + index
+            stamp += datetime.timedelta(seconds=self.random.uniform(0, 2 * step))
+            self.add('eventRecord', 'subj-[{0}]/rec-{1}'.format(affected, record_id), id=str(record_id), code=code,
+                     cause=cause, severity='info', ind='state-transition', user='internal', affected=affected,
+                     descr=descr, created=stamp.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'))
+
+    def add_endpoints(self):
+        """Adds fvCEp endpoints learned on the static bindings of the EPGs, with their IPs and path."""
+        path_atts = [self.mit.objects[dn][1] for dn in self.mit.class_dns('fvRsPathAtt')]
+        if not path_atts:
+            return
+        end = datetime.datetime(2020, 6, 1, 2, 0, 0)
+        for index in range(self.endpoints):
+            path_att = self.random.choice(path_atts)
+            epg_dn = path_att['dn'].split('/rspathAtt-', 1)[0]
+            mac = '00:50:56:{0:02X}:{1:02X}:{2:02X}'.format(index >> 16 & 0xff, index >> 8 & 0xff, index & 0xff)
+            ips = ['10.{0}.{1}.{2}'.format(index >> 16 & 0xff, index >> 8 & 0xff, index & 0xff)]
+            if self.random.random() < SECONDARY_IP_RATIO:
+                ips.append('172.{0}.{1}.{2}'.format(16 + (index >> 16 & 0xf), index >> 8 & 0xff, index & 0xff))
+            changed = end - datetime.timedelta(seconds=self.random.randrange(ENDPOINT_DAYS * 86400))
+            ep_dn = '{0}/cep-{1}'.format(epg_dn, mac)
+            self.add('fvCEp', ep_dn, name=mac, mac=mac, ip=ips[0], encap=path_att['encap'], lcC='learned',
+                     modTs=changed.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'))
+            for ip in ips:
+                self.add('fvIp', '{0}/ip-[{1}]'.format(ep_dn, ip), addr=ip)
+            self.add('fvRsCEpToPathEp', '{0}/rscEpToPathEp-[{1}]'.format(ep_dn, path_att['tDn']),
+                     tDn=path_att['tDn'])
+
+    def add_counters(self):
+        """Adds eqptIngrTotal5min and eqptEgrTotal5min to every interface, mostly lightly loaded."""
+        for dn in self.mit.class_dns('ethpmPhysIf'):
+            oper = self.mit.objects[dn][1]
+            intf_dn = dn[:-len('/phys')]
+            speed = stats.speed_bps(oper['operSpeed'])
+            for mo_class in ('eqptIngrTotal5min', 'eqptEgrTotal5min'):
+                util = self.random.random() ** 4 if oper['operSt'] == 'up' else 0.0
+                bytes_rate = util * speed / 8
+                self.add(mo_class, '{0}/CD{1}'.format(intf_dn, mo_class), bytesRateAvg='{0:.3f}'.format(bytes_rate),
+                         pktsRateAvg='{0:.3f}'.format(bytes_rate / PACKET_BYTES), utilAvg='{0:.0f}'.format(util * 100))
+
+    def add_health(self):
+        """Adds a healthInst to every EPG and leaf interface, mostly healthy."""
+        for mo_class in ('fvAEPg', 'l1PhysIf'):
+            for dn in self.mit.class_dns(mo_class):
+                score = 100 - int(self.random.random() ** 6 * 100)
+                self.add('healthInst', dn + '/health', cur=str(score), maxSev='cleared' if score == 100 else 'minor')
+
+    def add_neighbors(self):
+        """Adds lldpAdjEp to the connected EPG ports, mostly dual homed hosts, and cdpAdjEp to some of them."""
+        ports = [dn[:-len('/phys')] for dn in self.mit.class_dns('ethpmPhysIf')
+                 if self.mit.objects[dn][1]['operSt'] == 'up']
+        ports = [dn for dn in ports if 'epg' in self.mit.objects[dn][1]['usage']]
+        hosts = max(1, len(ports) // 2)
+        for dn in ports:
+            parts = dn_parser.parse(dn)
+            host = self.random.randrange(hosts)
+            sys_name = 'esx{0:04d}'.format(host)
+            port_id = 'vmnic{0}'.format(self.random.randrange(4))
+            mgmt_ip = '192.168.{0}.{1}'.format(host >> 8 & 0xff, host & 0xff)
+            if_dn = 'topology/pod-{0}/node-{1}/sys/{{0}}/inst/if-[eth{2}]'.format(parts.pod, parts.node, parts.intf_id)
+            self.add('lldpAdjEp', if_dn.format('lldp') + '/adj-1', sysName=sys_name, portIdV=port_id,
+                     mgmtIp=mgmt_ip, chassisIdV='00:25:b5:{0:02x}:{1:02x}:00'.format(host >> 8 & 0xff, host & 0xff))
+            if self.random.random() < CDP_RATIO:
+                adj_dn = if_dn.format('cdp') + '/adj-1'
+                self.add('cdpAdjEp', adj_dn, sysName='', devId=sys_name, portId=port_id, platId='VMware ESX')
+                self.add('cdpMgmtAddr', adj_dn + '/addr-[{0}]'.format(mgmt_ip), addr=mgmt_ip)
+
+
+def add_arguments(parser):
+    """Adds dataset options to an ArgumentParser, shared with the mock APIC and the runner."""
+    parser.add_argument('--size', choices=sorted(SIZES), default='small', help='dataset preset')
+    parser.add_argument('--dataset', help='load a dataset archive instead of generating one')
+    parser.add_argument('--seed', type=int, default=1)
+    for option in SIZES['small']:
+        parser.add_argument('--' + option.replace('_', '-'), dest=option, type=int,
+                            help='override the preset value')
+
+
+def dataset_options(args):
+    options = dict(SIZES[args.size])
+    for option in options:
+        if getattr(args, option, None) is not None:
+            options[option] = getattr(args, option)
+    options['seed'] = args.seed
+    return options
+
+
+def load_dataset(args):
+    if args.dataset:
+        return Mit.load(args.dataset)
+    return FabricGenerator(**dataset_options(args)).generate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic APIC dataset')
+    add_arguments(parser)
+    parser.add_argument('--output', '-o', required=True, help='archive to write (.json.gz)')
+    args = parser.parse_args()
+    mit = load_dataset(args)
+    mit.dump(args.output)
+    counts = sorted(((len(dns), mo_class) for mo_class, dns in mit.classes.items()), reverse=True)
+    print('Wrote {0} objects to {1}'.format(len(mit), args.output))
+    for count, mo_class in counts[:10]:
+        print('  {0:<20} {1}'.format(mo_class, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Local mock APIC serving the REST API over HTTPS from an in-memory MIT.
+
+Implements aaaLogin/aaaRefresh/aaaLogout, class and mo queries with
+query-target, query-target-filter, rsp-subtree and paging, and POSTs to
+/api/mo. Triggering configExportP with snapshot=true creates a configSnapshot
+like the APIC does. With --query-rate/--login-rate requests above the rate
+are answered with 429, like the APIC request throttle. --scan-latency adds
+time per object matched by a query, before paging, to model APIC queries
+that slow down with the size of the class.
+
+The server certificate is a throwaway self-signed one generated by openssl
+for each instance.
+
+Usage:
+    python -m benchmarks.mock_apic --size medium --port 8443
+"""
+import argparse
+import datetime
+import json
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from aclilib.mit import error_body
+from aclilib.ratelimit import TokenBucket, request_kind
+from benchmarks import fabric_gen
+
+
+class MockApicHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.apic.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def send_json(self, status, body, cookie=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if cookie:
+            self.send_header('Set-Cookie', 'APIC-cookie={0}; path=/'.format(cookie))
+        self.end_headers()
+        self.server.apic.record(self.path, len(data))
+        self.wfile.write(data)
+
+    def throttled(self, path):
+        """Sends 429 and returns True when the request budget of path is exhausted."""
+        apic = self.server.apic
+        bucket = apic.buckets.get(request_kind(path))
+        if bucket is None:
+            return False
+        with apic.stats_lock:
+            if bucket.take():
+                return False
+            apic.throttled += 1
+        self.send_json(429, error_body(429, 'Too many requests, request throttled'))
+        return True
+
+    def token(self):
+        """Returns the session token from the APIC-cookie, sends 403 and returns None if it is not valid."""
+        cookies = self.headers.get('Cookie', '')
+        for cookie in cookies.split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == 'APIC-cookie' and value in self.server.apic.tokens:
+                return value
+        self.send_json(403, error_body(403, 'Token was invalid (Error: Token timeout)'))
+        return None
+
+    def do_GET(self):
+        apic = self.server.apic
+        if apic.latency:
+            time.sleep(apic.latency)
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if self.throttled(path):
+            return
+        token = self.token()
+        if not token:
+            return
+        if path == '/api/aaaRefresh.json':
+            self.send_json(200, apic.login_body(token))
+            return
+        if not path.startswith('/api/'):
+            self.send_json(400, error_body(400, 'unsupported url {0}'.format(path)))
+            return
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        with apic.lock:
+            status, body = apic.mit.get(path[5:], params)
+        if apic.scan_latency and status == 200:
+            time.sleep(apic.scan_latency * int(body['totalCount']))
+        self.send_json(status, body)
+
+    def do_POST(self):
+        apic = self.server.apic
+        if apic.latency:
+            time.sleep(apic.latency)
+        path = unquote(urlsplit(self.path).path)
+        length = int(self.headers.get('Content-Length', 0))
+        if self.throttled(path):
+            self.rfile.read(length)
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, error_body(400, 'malformed JSON payload'))
+            return
+
+        if path == '/api/aaaLogin.json':
+            attributes = payload.get('aaaUser', {}).get('attributes', {})
+            if attributes.get('name') != apic.username or attributes.get('pwd') != apic.password:
+                self.send_json(401, error_body(401, 'Username or password is incorrect - FAILED local authentication'))
+                return
+            token = uuid.uuid4().hex
+            apic.tokens.add(token)
+            self.send_json(200, apic.login_body(token), cookie=token)
+            return
+        if path == '/api/aaaLogout.json':
+            self.send_json(200, {'totalCount': '0', 'imdata': []})
+            return
+        if not self.token():
+            return
+
+        if path.startswith('/api/node/mo/'):
+            dn = path[len('/api/node/mo/'):]
+        elif path.startswith('/api/mo/'):
+            dn = path[len('/api/mo/'):]
+        else:
+            self.send_json(400, error_body(400, 'unsupported url {0}'.format(path)))
+            return
+        if dn.endswith('.json'):
+            dn = dn[:-5]
+        with apic.lock:
+            status, body = apic.mit.post(dn, payload)
+            if status == 200:
+                apic.after_post(dn, payload)
+        self.send_json(status, body)
+
+
+def self_signed_cert(directory, host):
+    """Writes a self-signed certificate and its key for host into directory, returns their paths."""
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN={0}'.format(host), '-keyout', keyfile, '-out', certfile],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
+
+
+class MockApic(object):
+    def __init__(self, mit, host='127.0.0.1', port=0, username='admin', password='password', latency=0.0,
+                 certfile=None, verbose=False, query_rate=0.0, login_rate=0.0,
+                 scan_latency=0.0):
+        self.mit = mit
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.scan_latency = scan_latency
+        self.verbose = verbose
+        self.tokens = set()
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.throttled = 0
+        # Server side throttling like the APIC's, off when the rate is 0
+        self.buckets = {}
+        if query_rate:
+            self.buckets['query'] = TokenBucket(query_rate, max(1, query_rate / 10))
+        if login_rate:
+            self.buckets['login'] = TokenBucket(login_rate, max(1, login_rate / 10))
+        self.server = ThreadingHTTPServer((host, port), MockApicHandler)
+        self.server.daemon_threads = True
+        self.server.apic = self
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        if certfile:
+            context.load_cert_chain(certfile)
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                context.load_cert_chain(*self_signed_cert(directory, host))
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return '{0}:{1}'.format(host, port)
+
+    def login_body(self, token):
+        return {'totalCount': '1', 'imdata': [{'aaaLogin': {'attributes': {
+            'token': token, 'refreshTimeoutSeconds': '600', 'userName': self.username}}}]}
+
+    def record(self, path, size):
+        with self.stats_lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def stats(self):
+        with self.stats_lock:
+            return {'requests': self.requests, 'bytes': self.bytes_sent, 'throttled': self.throttled}
+
+    def after_post(self, dn, payload):
+        mo_class, body = next(iter(payload.items()))
+        attributes = body.get('attributes', {})
+        if mo_class == 'configExportP' and attributes.get('adminSt') == 'triggered' and \
+                attributes.get('snapshot') == 'true':
+            now = datetime.datetime.utcnow()
+            stamp = now.strftime('%Y-%m-%dT%H-%M-%S')
+            self.mit.add('configSnapshot', {
+                'dn': 'uni/backupst/snapshots-[{0}]/snapshot-run-{1}'.format(dn, stamp),
+                'name': 'run-{0}'.format(stamp), 'fileName': 'ce2_{0}.tar.gz'.format(stamp),
+                'createTime': now.strftime('%Y-%m-%dT%H:%M:%S.000+00:00'),
+                'descr': attributes.get('descr', '')})
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='mock-apic')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic fabric through a mock APIC')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--scan-latency', type=float, default=0.0,
+                        help='seconds added per object matched by a query')
+    parser.add_argument('--query-rate', type=float, default=0.0, help='throttle queries above this rate per second')
+    parser.add_argument('--login-rate', type=float, default=0.0, help='throttle logins above this rate per second')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    mit = fabric_gen.load_dataset(args)
+    apic = MockApic(mit, host=args.host, port=args.port, username=args.username, password=args.password,
+                    latency=args.latency, verbose=args.verbose, query_rate=args.query_rate,
+                    login_rate=args.login_rate, scan_latency=args.scan_latency)
+    print('Mock APIC with {0} objects listening on https://{1}'.format(len(mit), apic.address))
+    try:
+        apic.server.serve_forever()
+    except KeyboardInterrupt:
+        apic.stop()
+
+
+if __name__ == '__main__':
+    main()
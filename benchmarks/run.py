@@ -0,0 +1,209 @@
+"""
+Times the ACLI show and audit commands against a local mock APIC.
+
+Generates (or loads) a dataset, starts the mock APIC in-process, logs the
+shell in and runs each command --repeat times with output discarded. Results
+are written as JSON; --compare flags commands whose median time regressed
+more than --threshold against a stored baseline.
+
+Usage:
+    python -m benchmarks.run --size medium --output results.json
+    python -m benchmarks.run --size medium --compare baseline.json
+    python -m benchmarks.run --results results.json --compare baseline.json
+"""
+import argparse
+import datetime
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+
+import requests
+from prettytable import PrettyTable
+
+from aclilib import aio
+from benchmarks import fabric_gen
+from benchmarks.mock_apic import MockApic
+
+# Command templates, placeholders are filled from the dataset
+COMMANDS = [
+    'show epg ALL',
+    'show epg {epg}',
+    'show epg {epg} health',
+    'show interface',
+    'show interface {node}',
+    'show interface {node} {port}',
+    'show interface {node} health',
+    'show interface {node} neighbor',
+    'show interface stats',
+    'show interface stats {node}',
+    'show vlan pools',
+    'show vlan {vlan}',
+    'show ipg',
+    'show ipg {ipg}',
+    'show snapshot',
+    'show faults',
+    'show faults summary',
+    'show events',
+    'show events summary',
+    'show endpoint {mac}',
+    'show endpoint {ip}',
+    'show endpoint table',
+    'show endpoint epg {epg}',
+    'show endpoint interface {node} {port}',
+    'show health worst 10',
+    'show neighbor {neighbor}',
+    'audit encap',
+]
+
+
+def sample_arguments(mit):
+    """Picks a leaf, a bound leaf port, an EPG, a VLAN, an IPG, an endpoint and a neighbour present in the dataset."""
+    arguments = {}
+    for dn in mit.class_dns('fvRsPathAtt'):
+        attributes = mit.objects[dn][1]
+        t_dn = attributes['tDn']
+        if '/paths-' in t_dn and 'pathep-[eth' in t_dn and 'extpaths-' not in t_dn:
+            arguments['node'] = t_dn.split('/paths-')[1].split('/')[0]
+            arguments['port'] = t_dn.split('pathep-[eth')[1].rstrip(']')
+            arguments['epg'] = dn.split('/epg-')[1].split('/')[0]
+            arguments['vlan'] = attributes['encap'].replace('vlan-', '')
+            break
+    for dn in mit.class_dns('infraAccPortGrp'):
+        arguments['ipg'] = mit.objects[dn][1]['name']
+        break
+    for dn in mit.class_dns('fvCEp'):
+        attributes = mit.objects[dn][1]
+        if attributes.get('ip'):
+            arguments['mac'] = attributes['mac']
+            arguments['ip'] = attributes['ip']
+            break
+    for dn in mit.class_dns('lldpAdjEp'):
+        arguments['neighbor'] = mit.objects[dn][1]['sysName']
+        break
+    return arguments
+
+
+def login(address, username, password, transport='requests'):
+    # Imported here as acli3 reads config.yml from the working directory on import
+    import acli3
+    shell = acli3.Apic()
+    if transport == 'asyncio':
+        shell.client.session = aio.AsyncSession()
+    shell.client.address = address
+    shell.client.username = username
+    shell.client.password = password
+    result = shell.connect()
+    if result['rc'] != 0:
+        sys.exit('ERROR: {0}'.format(result['error_msg']))
+    shell.can_connect = 'BENCH'
+    shell.collect_ipgs()
+    return shell
+
+
+def run(mock, arguments, repeat, transport='requests'):
+    shell = login(mock.address, mock.username, mock.password, transport)
+    results = {}
+    for template in COMMANDS:
+        try:
+            command = template.format(**arguments)
+        except KeyError:
+            continue
+        timings = []
+        before = mock.stats()
+        for _ in range(repeat):
+            with redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                shell.onecmd(command)
+                timings.append(time.perf_counter() - start)
+        after = mock.stats()
+        results[template] = {
+            'command': command,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'max': max(timings),
+            'requests': (after['requests'] - before['requests']) / float(repeat),
+            'bytes': (after['bytes'] - before['bytes']) / float(repeat),
+        }
+        print('{0:<32} median {1:8.3f}s  {2:6.1f} requests'.format(command, results[template]['median'],
+                                                                   results[template]['requests']))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Prints results against a baseline, returns the list of regressed commands."""
+    y = PrettyTable(['F', 'COMMAND', 'BASELINE', 'CURRENT', 'RATIO', 'REQUESTS'])
+    y.align = 'l'
+    y.vertical_char = ' '
+    y.junction_char = ' '
+
+    regressions = []
+    for template in COMMANDS:
+        if template not in results['results'] or template not in baseline['results']:
+            continue
+        current = results['results'][template]
+        base = baseline['results'][template]
+        ratio = current['median'] / base['median'] if base['median'] else 0.0
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '!'
+            regressions.append(template)
+        y.add_row([flag, template, '{0:.3f}s'.format(base['median']), '{0:.3f}s'.format(current['median']),
+                   '{0:.2f}'.format(ratio), '{0:g} -> {1:g}'.format(base['requests'], current['requests'])])
+    print('! - flag indicates median time regressed more than {0:.0%}'.format(threshold))
+    print(y)
+    if results.get('dataset') != baseline.get('dataset'):
+        print('WARNING: baseline was recorded with a different dataset')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ACLI show commands against a mock APIC')
+    fabric_gen.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per command')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every mock APIC request')
+    parser.add_argument('--transport', choices=['requests', 'asyncio'], default='requests',
+                        help='HTTP client used by the shell')
+    parser.add_argument('--output', '-o', help='write results to this JSON file')
+    parser.add_argument('--results', help='compare an existing results file instead of running')
+    parser.add_argument('--compare', metavar='BASELINE', help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown ratio, default 0.25')
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as fh:
+            results = json.load(fh)
+    else:
+        requests.packages.urllib3.disable_warnings()
+        mit = fabric_gen.load_dataset(args)
+        mock = MockApic(mit, latency=args.latency).start()
+        try:
+            results = {
+                'created': datetime.datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'dataset': args.dataset or dict(fabric_gen.dataset_options(args), objects=len(mit)),
+                'latency': args.latency,
+                'repeat': args.repeat,
+                'transport': args.transport,
+                'results': run(mock, sample_arguments(mit), args.repeat, args.transport),
+            }
+        finally:
+            mock.stop()
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
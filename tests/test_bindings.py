@@ -0,0 +1,93 @@
+from aclilib import bindings
+
+INTERFACES = {('101', '1/10'), ('101', '1/11'), ('102', '1/10')}
+IPGS = {'VPC_1': {'link_agg': 'vpc'}, 'PC_1': {'link_agg': 'pc'}}
+VLAN_POOLS = [{'name': 'POOL', 'alloc': 'static', 'domains': ['phys-PHYS'], 'from_vlan': 100, 'to_vlan': 199}]
+EPGS = {('T1', 'AP', 'WEB'): ['phys-PHYS'], ('T1', 'AP', 'DB'): []}
+PODS = {'101': '1', '102': '1'}
+
+
+def row(**columns):
+    values = {'tenant': 'T1', 'app_profile': 'AP', 'epg': 'WEB', 'path_type': 'port', 'node': '101',
+              'interface': '1/10', 'policy_group': '', 'encap': '100'}
+    values.update(columns)
+    return values
+
+
+def plan(rows, existing=None):
+    numbered = [(line, values) for line, values in enumerate(rows, 2)]
+    return bindings.plan(numbered, INTERFACES, IPGS, VLAN_POOLS, EPGS, existing or {}, PODS)
+
+
+def test_add():
+    change, = plan([row()])
+    assert change.action == bindings.ADD
+    assert change.t_dn == 'topology/pod-1/paths-101/pathep-[eth1/10]'
+    assert (change.encap, change.mode, change.message) == ('100', 'regular', '')
+
+
+def test_add_vpc():
+    change, = plan([row(path_type='vpc', node='101-102', interface='', policy_group='VPC_1', encap='vlan-150')])
+    assert change.action == bindings.ADD
+    assert change.t_dn == 'topology/pod-1/protpaths-101-102/pathep-[VPC_1]'
+    assert change.encap == '150'
+
+
+def test_breakout_and_fex_ports():
+    assert bindings.path_dn(row(interface='1/49/2'), PODS) == 'topology/pod-1/paths-101/pathep-[eth1/49/2]'
+    assert bindings.path_dn(row(interface='101/1/3'), PODS) == \
+        'topology/pod-1/paths-101/extpaths-101/pathep-[eth1/3]'
+
+
+def test_unchanged():
+    existing = {bindings.identity(row()): ('100', 'regular')}
+    change, = plan([row()], existing)
+    assert change.action == bindings.UNCHANGED
+
+
+def test_modify_encap_and_mode():
+    key = bindings.identity(row())
+    change, = plan([row(encap='101')], {key: ('100', 'regular')})
+    assert change.action == bindings.MODIFY
+    assert change.message == 'encap 100 -> 101'
+
+    change, = plan([row(mode='untagged')], {key: ('100', 'regular')})
+    assert change.action == bindings.MODIFY
+    assert change.message == 'mode regular -> untagged'
+
+
+def test_errors():
+    cases = [
+        (row(path_type='fex'), 'path_type must be one of port, pc, vpc'),
+        (row(mode='trunk'), 'mode must be one of regular, native, untagged'),
+        (row(epg='APP'), 'EPG T1/AP/APP not found'),
+        (row(node='103'), 'node 103 not found'),
+        (row(interface='1/12'), 'interface 1/12 not found on node 101'),
+        (row(path_type='pc', interface='', policy_group='VPC_1'), 'policy group VPC_1 is not a pc policy group'),
+        (row(path_type='vpc', node='101'), 'node must be <node>-<node> for a vpc path'),
+        (row(encap='5000'), 'encap must be a VLAN id 1-4094'),
+        (row(encap='200'), 'VLAN 200 is not in a pool of the EPG domains'),
+        (row(epg='DB'), 'VLAN 100 is not in a pool of the EPG domains'),
+    ]
+    changes = plan([values for values, _ in cases])
+    assert [change.action for change in changes] == [bindings.ERROR] * len(cases)
+    assert [change.message for change in changes] == [message for _, message in cases]
+    assert all(change.t_dn == '' for change in changes)
+
+
+def test_duplicate():
+    first, second, other = plan([row(), row(encap='101'), row(interface='1/11')])
+    assert first.action == bindings.ADD
+    assert (second.action, second.message) == (bindings.ERROR, 'duplicate of line 2')
+    assert other.action == bindings.ADD
+
+
+def test_payload_and_chunks():
+    changes = plan([row(), row(interface='1/11'), row(encap='999')])
+    chunks = list(bindings.chunks(changes, 1))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    tenant, = bindings.payload(changes)['polUni']['children']
+    epg, = tenant['fvTenant']['children'][0]['fvAp']['children']
+    assert epg['fvAEPg']['attributes']['name'] == 'WEB'
+    assert [path['fvRsPathAtt']['attributes']['tDn'] for path in epg['fvAEPg']['children']] == \
+        ['topology/pod-1/paths-101/pathep-[eth1/10]', 'topology/pod-1/paths-101/pathep-[eth1/11]']
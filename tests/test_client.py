@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+from aclilib import bindings, client, export, planner
+from aclilib.client import ApicClient, ApicError
+from aclilib.dn import interface_key
+from aclilib.mit import Mit
+from aclilib.offline import OfflineSession
+
+NODE_MOS = [{'fabricNode': {'attributes': {'dn': 'topology/pod-1/node-101', 'id': '101', 'role': 'leaf'}}},
+            {'fabricNode': {'attributes': {'dn': 'topology/pod-1/node-201', 'id': '201', 'role': 'spine'}}}]
+POD_MOS = [{'fabricPod': {'attributes': {'dn': 'topology/pod-1', 'id': '1'}}}]
+LEAF_MOS = [{'fabricNode': {'attributes': {'dn': 'topology/pod-1/node-{0}'.format(node), 'id': node, 'role': 'leaf'}}}
+            for node in ('101', '102')]
+
+PORT_SELECTOR = 'uni/infra/accportprof-LF101/hports-BREAKOUT-typ-range'
+# Leaf 101 with port 1/49 broken out into four sub-ports by an interface selector
+BREAKOUT_MOS = [
+    ('polUni', {'dn': 'uni'}),
+    ('infraInfra', {'dn': 'uni/infra'}),
+    ('infraNodeP', {'dn': 'uni/infra/nprof-LF101', 'name': 'LF101'}),
+    ('infraLeafS', {'dn': 'uni/infra/nprof-LF101/leaves-LF101-typ-range', 'name': 'LF101'}),
+    ('infraNodeBlk', {'dn': 'uni/infra/nprof-LF101/leaves-LF101-typ-range/nodeblk-1', 'from_': '101', 'to_': '101'}),
+    ('infraAccPortP', {'dn': 'uni/infra/accportprof-LF101', 'name': 'LF101'}),
+    ('infraRtAccPortP', {'dn': 'uni/infra/accportprof-LF101/rtaccPortP-[uni/infra/nprof-LF101]',
+                         'tDn': 'uni/infra/nprof-LF101'}),
+    ('infraHPortS', {'dn': PORT_SELECTOR, 'name': 'BREAKOUT'}),
+    ('infraSubPortBlk', {'dn': PORT_SELECTOR + '/subportblk-block1', 'fromCard': '1', 'toCard': '1', 'fromPort': '49',
+                         'toPort': '49', 'fromSubPort': '1', 'toSubPort': '4'}),
+    ('infraRsAccBaseGrp', {'dn': PORT_SELECTOR + '/rsaccBaseGrp', 'tDn': 'uni/infra/funcprof/accportgrp-ACCESS'}),
+]
+
+
+class Response(object):
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Session(object):
+    """Answers GETs from {class: objects}, records the URIs and tells which were served from a plan."""
+
+    def __init__(self, classes, status_code=200):
+        self.classes = classes
+        self.status_code = status_code
+        self.uris = []
+        self.served_uris = []
+
+    def get(self, uri, **kwargs):
+        self.uris.append(uri)
+        mo_class = client.QUERY_CLASS.search(uri).group(1)
+        mos = self.classes.get(mo_class, [])
+        return Response(self.status_code, {'totalCount': str(len(mos)), 'imdata': mos})
+
+    def served(self, uri):
+        self.served_uris.append(uri)
+
+
+def logged_in(session):
+    apic = ApicClient(session=session)
+    apic.apic_address = 'apic'
+    apic.refresh = lambda: None
+    return apic
+
+
+def test_fetch_outside_the_plan_goes_to_the_apic():
+    session = Session({'fabricNode': NODE_MOS, 'fabricPod': POD_MOS})
+    apic = logged_in(session)
+    with apic.planned('nodes'):
+        assert len(session.uris) == 1
+        assert len(list(apic.fetch(client.NODE_QUERY))) == 2
+        leaf = client.NODE_QUERY._replace(filter='eq(fabricNode.id,"101")')
+        assert [mo['fabricNode']['attributes']['id'] for mo in apic.fetch(leaf)] == ['101']
+        assert len(session.uris) == 1
+        # Not in the plan and not covered by it
+        assert len(list(apic.fetch(client.POD_QUERY))) == 1
+        assert len(session.uris) == 2
+    assert len(session.served_uris) == 2
+    assert len(list(apic.fetch(client.NODE_QUERY))) == 2
+    assert len(session.uris) == 3
+
+
+def test_session_without_served_hook():
+    session = Session({'fabricNode': NODE_MOS})
+    session.served = None
+    apic = logged_in(session)
+    with apic.planned(client.NODE_QUERY):
+        assert len(list(apic.fetch(client.NODE_QUERY))) == 2
+
+
+def test_leaf_nodes_of_a_node_list():
+    node = {'fabricNode': {'attributes': {'dn': 'topology/pod-1/node-103', 'id': '103', 'role': 'leaf'}}}
+    session = Session({'fabricNode': LEAF_MOS + [node], 'fabricPod': POD_MOS})
+    apic = logged_in(session)
+    with apic.planned('nodes', client.POD_QUERY):
+        assert apic.get_leaf_nodes(['103', '101']) == ['101', '103']
+        assert apic.get_leaf_nodes('102') == ['102']
+        assert apic.get_leaf_nodes() == ['101', '102', '103']
+    assert len(session.uris) == 2
+
+
+def test_breakout_port_selector():
+    mit = Mit()
+    for mo_class, attributes in BREAKOUT_MOS:
+        mit.add(mo_class, attributes)
+    apic = ApicClient('offline', session=OfflineSession(mit))
+    assert apic.login()['rc'] == 0
+    rows = sorted(apic.get_selector_rows())
+    assert rows == [(interface_key('101', '0', '1', '49', sub_port), '101', '1/49/{0}'.format(sub_port), 'BREAKOUT',
+                     'ACCESS') for sub_port in range(1, 5)]
+
+
+def test_failed_query_raises():
+    apic = logged_in(Session({}, status_code=500))
+    with pytest.raises(ApicError):
+        list(apic.iter_query(planner.uri(client.NODE_QUERY, 'apic')))
+
+
+def test_exported_bindings_plan_unchanged():
+    apic = logged_in(Session({'fabricNode': LEAF_MOS}))
+    path_atts = [{'tDn': 'topology/pod-1/paths-101/pathep-[eth1/10]', 'encap': 'vlan-100', 'mode': 'native'},
+                 {'tDn': 'topology/pod-1/paths-101/pathep-[eth1/11]', 'encap': 'vlan-101', 'mode': 'regular'},
+                 {'tDn': 'topology/pod-1/protpaths-101-102/pathep-[VPC_1]', 'encap': 'vlan-102', 'mode': 'untagged'}]
+    epg = {'tn': 'T1', 'ap': 'AP', 'epg_name': 'WEB', 'bd': 'BD', 'domains': ['phys-PHYS'],
+           'paths': [apic.parse_path(path_att) for path_att in path_atts]}
+    idict = {path['idx']: {'node': '101', 'intf_id': path['intf_id']} for path in epg['paths'][:2]}
+    ipgs = {'VPC_1': {'link_agg': 'vpc'}}
+    vlan_pools = [{'from_vlan': 100, 'to_vlan': 199, 'domains': ['phys-PHYS']}]
+
+    names = [name for name, _ in export.BINDING_FIELDS]
+    rows = [dict(zip(names, row)) for row in apic.iter_path_rows(epg)]
+    assert [row['mode'] for row in rows] == ['native', 'regular', 'untagged']
+    changes = apic.plan_bindings(list(enumerate(rows, 2)), idict, ipgs, vlan_pools, [epg])
+    assert [change.action for change in changes] == [bindings.UNCHANGED] * 3
+
+    # Without the mode column the bindings keep their mode
+    for row in rows:
+        del row['mode']
+    changes = apic.plan_bindings(list(enumerate(rows, 2)), idict, ipgs, vlan_pools, [epg])
+    assert [change.action for change in changes] == [bindings.UNCHANGED] * 3
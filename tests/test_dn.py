@@ -0,0 +1,29 @@
+from aclilib import dn
+
+
+def test_leaf_port():
+    parts = dn.parse('topology/pod-1/node-101/sys/phys-[eth1/10]')
+    assert (parts.pod, parts.node) == ('1', '101')
+    assert (parts.fex, parts.module, parts.port, parts.sub_port) == ('0', '1', '10', '')
+    assert parts.intf_id == '1/10'
+    assert parts.key == dn.interface_key('101', '0', '1', '10')
+
+
+def test_fex_port():
+    parts = dn.parse('topology/pod-1/node-101/sys/phys-[eth101/1/3]')
+    assert (parts.fex, parts.module, parts.port, parts.sub_port) == ('101', '1', '3', '')
+    assert parts.key == dn.parse('topology/pod-1/paths-101/extpaths-101/pathep-[eth1/3]').key
+
+
+def test_breakout_port():
+    parts = dn.parse('topology/pod-1/node-101/sys/phys-[eth1/49/2]')
+    assert (parts.fex, parts.module, parts.port, parts.sub_port) == ('0', '1', '49', '2')
+    assert parts.intf_id == '1/49/2'
+    assert parts.key == dn.parse('topology/pod-1/paths-101/pathep-[eth1/49/2]').key
+    assert parts.key == dn.interface_key('101', '0', '1', '49', '2')
+
+
+def test_keys_are_distinct():
+    interfaces = ['eth1/1', 'eth1/49', 'eth1/49/1', 'eth1/49/2', 'eth101/1/1', 'eth101/1/49', 'eth199/1/1']
+    keys = {dn.parse('topology/pod-1/node-101/sys/phys-[{0}]'.format(intf)).key for intf in interfaces}
+    assert len(keys) == len(interfaces)
@@ -0,0 +1,93 @@
+from aclilib import encap
+from aclilib.client import ApicClient
+from aclilib.dn import interface_key
+from aclilib.mit import Mit
+from aclilib.offline import OfflineSession
+
+PORT = interface_key('101', '0', '1', '10')
+BARE_PORT = interface_key('101', '0', '1', '11')
+IDICT = {PORT: {'node': '101', 'intf_id': '1/10', 'policy_group': 'ACCESS'},
+         BARE_PORT: {'node': '101', 'intf_id': '1/11', 'policy_group': ''}}
+IPGS = {'ACCESS': {'aep': 'AEP_1'}, 'VPC_1': {'aep': 'AEP_1'}, 'NO_AEP': {'aep': '-'}, 'LOST': {'aep': 'AEP_2'}}
+AEPS = {'AEP_1': ['phys-PHYS_1', 'phys-PHYS_2']}
+VLAN_POOLS = [{'from_vlan': 100, 'to_vlan': 199, 'domains': ['phys-PHYS_1']},
+              {'from_vlan': 300, 'to_vlan': 300, 'domains': ['phys-PHYS_2', 'phys-OTHER']}]
+VMM_DOMAIN = 'uni/vmmp-VMware/dom-DVS1'
+# An EPG, AEP and dynamic VLAN pool on the VMM domain, as the APIC returns them
+VMM_MOS = [
+    ('polUni', {'dn': 'uni'}),
+    ('fvTenant', {'dn': 'uni/tn-T1', 'name': 'T1'}),
+    ('fvAp', {'dn': 'uni/tn-T1/ap-AP', 'name': 'AP'}),
+    ('fvAEPg', {'dn': 'uni/tn-T1/ap-AP/epg-WEB', 'name': 'WEB'}),
+    ('fvRsDomAtt', {'dn': 'uni/tn-T1/ap-AP/epg-WEB/rsdomAtt-[{0}]'.format(VMM_DOMAIN), 'tDn': VMM_DOMAIN}),
+    ('infraInfra', {'dn': 'uni/infra'}),
+    ('infraAttEntityP', {'dn': 'uni/infra/attentp-AEP_1', 'name': 'AEP_1'}),
+    ('infraRsDomP', {'dn': 'uni/infra/attentp-AEP_1/rsdomP-[{0}]'.format(VMM_DOMAIN), 'tDn': VMM_DOMAIN}),
+    ('fvnsVlanInstP', {'dn': 'uni/infra/vlanns-[VMM]-dynamic', 'name': 'VMM', 'allocMode': 'dynamic'}),
+    ('fvnsEncapBlk', {'dn': 'uni/infra/vlanns-[VMM]-dynamic/from-[vlan-400]-to-[vlan-499]', 'from': 'vlan-400',
+                      'to': 'vlan-499'}),
+    ('fvnsRtVlanNs', {'dn': 'uni/infra/vlanns-[VMM]-dynamic/rtinfraVlanNs-[{0}]'.format(VMM_DOMAIN),
+                      'tDn': VMM_DOMAIN}),
+]
+
+
+def port(encap_id, idx=PORT):
+    return {'idx': idx, 'node': '101', 'intf_id': '1/10', 'encap': encap_id}
+
+
+def epg(paths, domains=('phys-PHYS_1', )):
+    return {'tn': 'T1', 'ap': 'AP', 'epg_name': 'WEB', 'domains': list(domains), 'paths': paths}
+
+
+def check(path, domains=('phys-PHYS_1', )):
+    return encap.EncapGraph(IDICT, IPGS, AEPS, VLAN_POOLS).check(path, frozenset(domains))
+
+
+def test_vlan_mask():
+    mask = encap.vlan_mask(100, 102)
+    assert [vlan for vlan in range(98, 105) if mask >> vlan & 1] == [100, 101, 102]
+
+
+def test_check_resolves():
+    assert check(port('100')) == ('ACCESS', 'AEP_1', '')
+    assert check(port('199')) == ('ACCESS', 'AEP_1', '')
+    assert check(port('300'), ('phys-PHYS_2', )) == ('ACCESS', 'AEP_1', '')
+    vpc = {'idx': 0, 'vpc': 'VPC_1', 'protpaths': 'protpaths-101-102', 'encap': '150'}
+    assert check(vpc) == ('VPC_1', 'AEP_1', '')
+
+
+def test_check_problems():
+    assert check(port('100', interface_key('101', '0', '1', '48')))[2] == 'interface not found'
+    assert check(port('100', BARE_PORT))[2] == 'interface has no policy group'
+    assert check({'idx': 0, 'node': '101', 'pc': 'PC_9', 'encap': '100'})[2] == 'policy group not found'
+    assert check({'idx': 0, 'node': '101', 'pc': 'NO_AEP', 'encap': '100'})[2] == 'policy group has no AEP'
+    assert check({'idx': 0, 'node': '101', 'pc': 'LOST', 'encap': '100'})[2] == 'AEP not found'
+    assert check(port('100'), ())[2] == 'EPG has no domain'
+    assert check(port('vxlan-5000'))[2] == 'encap vxlan-5000 is not a VLAN'
+    assert check(port('100'), ('phys-OTHER', ))[2] == 'AEP has none of the EPG domains phys-OTHER'
+    assert check(port('200'))[2] == 'VLAN 200 is not in the pools of phys-PHYS_1'
+
+
+def test_audit():
+    graph = encap.EncapGraph(IDICT, IPGS, AEPS, VLAN_POOLS)
+    checked, findings = encap.audit(graph, [epg([port('100'), port('250')]), epg([port('100')], ())])
+    assert checked == 3
+    assert findings == [
+        encap.Finding('T1', 'AP', 'WEB', '101 1/10', '250', 'ACCESS', 'AEP_1',
+                      'VLAN 250 is not in the pools of phys-PHYS_1'),
+        encap.Finding('T1', 'AP', 'WEB', '101 1/10', '100', 'ACCESS', 'AEP_1', 'EPG has no domain'),
+    ]
+
+
+def test_vmm_domain_resolves():
+    mit = Mit()
+    for mo_class, attributes in VMM_MOS:
+        mit.add(mo_class, attributes)
+    apic = ApicClient('offline', session=OfflineSession(mit))
+    assert apic.login()['rc'] == 0
+    epgs = list(apic.iter_epgs('ALL'))
+    assert epgs[0]['domains'] == ['vmmp-VMware/dom-DVS1']
+    graph = encap.EncapGraph(IDICT, IPGS, apic.get_aeps(), apic.get_vlan_pools())
+    checked, findings = encap.audit(graph, [dict(epgs[0], paths=[port('450'), port('100')])])
+    assert checked == 2
+    assert [finding.problem for finding in findings] == ['VLAN 100 is not in the pools of vmmp-VMware/dom-DVS1']
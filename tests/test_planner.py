@@ -0,0 +1,95 @@
+from aclilib import planner
+from aclilib.planner import Query
+
+EPG = Query('class/fvAEPg', subtree='children', subtree_classes=('fvRsPathAtt', 'fvRsBd'))
+EPG_NAMED = Query('class/fvAEPg', filter='eq(fvAEPg.name,"WEB")')
+EPG_DOMAINS = Query('class/fvAEPg', subtree='children', subtree_classes=('fvRsDomAtt', ))
+NODES = Query('class/fabricNode')
+NODE_101 = Query('class/topology/pod-1/node-101/l1PhysIf')
+NODE_102 = Query('class/topology/pod-1/node-102/l1PhysIf')
+FABRIC_L1 = Query('class/l1PhysIf')
+
+EPG_MOS = [
+    {'fvAEPg': {'attributes': {'dn': 'uni/tn-T1/ap-A/epg-WEB', 'name': 'WEB'}, 'children': [
+        {'fvRsPathAtt': {'attributes': {'rn': 'rspathAtt-[x]'}}},
+        {'fvRsDomAtt': {'attributes': {'rn': 'rsdomAtt-[uni/phys-P]'}}},
+        {'fvRsBd': {'attributes': {'rn': 'rsbd'}}}]}},
+    {'fvAEPg': {'attributes': {'dn': 'uni/tn-T1/ap-A/epg-DB', 'name': 'DB'}}},
+]
+L1_MOS = [{'l1PhysIf': {'attributes': {'dn': 'topology/pod-1/node-{0}/sys/phys-[eth1/1]'.format(node)}}}
+          for node in ('101', '102', '103')]
+
+
+def names(mos):
+    return [next(iter(mo.values()))['attributes']['dn'] for mo in mos]
+
+
+def test_merge_filtered_and_unfiltered_queries_of_a_class():
+    plan = planner.merge([EPG_NAMED, EPG, EPG_DOMAINS])
+    assert len(plan) == 1
+    merged, members = plan[0]
+    assert members == [EPG_NAMED, EPG, EPG_DOMAINS]
+    # The unfiltered query takes every EPG, so the merged query has no filter
+    assert merged.filter == ''
+    assert merged.subtree == 'children'
+    assert merged.subtree_classes == ('fvRsPathAtt', 'fvRsBd', 'fvRsDomAtt')
+
+
+def test_merge_filtered_queries_join_their_filters():
+    other = Query('class/fvAEPg', filter='eq(fvAEPg.name,"DB")')
+    (merged, _), = planner.merge([EPG_NAMED, other])
+    assert merged.filter == 'or(eq(fvAEPg.name,"WEB"),eq(fvAEPg.name,"DB"))'
+
+
+def test_merge_keeps_different_classes_apart():
+    plan = planner.merge([EPG, NODES])
+    assert [merged.path for merged, _ in plan] == ['class/fvAEPg', 'class/fabricNode']
+
+
+def test_merge_scoped_queries_into_the_fabric_wide_query():
+    (merged, members), = planner.merge([NODE_101, FABRIC_L1, NODE_102])
+    assert merged.path == 'class/l1PhysIf'
+    assert members == [NODE_101, FABRIC_L1, NODE_102]
+
+
+def test_merge_scoped_queries_of_different_nodes_stay_apart():
+    plan = planner.merge([NODE_101, NODE_102])
+    assert [merged for merged, _ in plan] == [NODE_101, NODE_102]
+
+
+def test_covers():
+    (merged, _), = planner.merge([EPG, EPG_DOMAINS])
+    assert planner.covers(merged, EPG)
+    assert planner.covers(merged, EPG_NAMED)
+    assert planner.covers(FABRIC_L1, NODE_101)
+    assert not planner.covers(NODE_101, FABRIC_L1)
+    assert not planner.covers(NODE_101, NODE_102)
+    assert not planner.covers(EPG_NAMED, EPG)
+    # A query outside the plan: another class, or a deeper subtree than merged
+    assert not planner.covers(merged, NODES)
+    assert not planner.covers(merged, EPG._replace(subtree='full'))
+    assert not planner.covers(merged, EPG._replace(include='health'))
+
+
+def test_serve_filters_and_trims_for_each_query():
+    (merged, _), = planner.merge([EPG_NAMED, EPG, EPG_DOMAINS])
+    assert names(planner.serve(EPG, merged, EPG_MOS)) == ['uni/tn-T1/ap-A/epg-WEB', 'uni/tn-T1/ap-A/epg-DB']
+    assert names(planner.serve(EPG_NAMED, merged, EPG_MOS)) == ['uni/tn-T1/ap-A/epg-WEB']
+
+    web = list(planner.serve(EPG_DOMAINS, merged, EPG_MOS))[0]
+    assert [next(iter(child)) for child in web['fvAEPg']['children']] == ['fvRsDomAtt']
+    web = list(planner.serve(EPG_NAMED, merged, EPG_MOS))[0]
+    assert 'children' not in web['fvAEPg']
+    # The merged objects are not changed
+    assert len(EPG_MOS[0]['fvAEPg']['children']) == 3
+
+
+def test_serve_scoped_query_from_the_fabric_wide_query():
+    assert names(planner.serve(NODE_102, FABRIC_L1, L1_MOS)) == ['topology/pod-1/node-102/sys/phys-[eth1/1]']
+    assert len(list(planner.serve(FABRIC_L1, FABRIC_L1, L1_MOS))) == 3
+
+
+def test_uri():
+    assert planner.uri(EPG_NAMED, 'apic') == \
+        'https://apic/api/class/fvAEPg.json?query-target-filter=eq(fvAEPg.name,"WEB")'
+    assert planner.uri(NODES, 'apic') == 'https://apic/api/class/fabricNode.json'
@@ -0,0 +1,55 @@
+import pytest
+
+from aclilib import table
+from aclilib.dn import interface_key
+
+K1 = interface_key('101', '0', '1', '1')
+K2 = interface_key('101', '0', '1', '2')
+K3 = interface_key('101', '0', '1', '3')
+SPINE = interface_key('201', '0', '1', '1')
+
+SELECTOR_ROWS = [(K1, '101', '1/1', 'SEL_OLD', 'OLD'), (K1, '101', '1/1', 'SEL_1', 'ACCESS'),
+                 (K3, '101', '1/3', 'SEL_3', 'VPC_1')]
+L1_ROWS = [(K1, '101', '1', '1/1', 'leaf', 'epg', 'server 1'), (K2, '101', '1', '1/2', 'leaf', 'discovery', ''),
+           (SPINE, '201', '1', '1/1', 'fab', 'fabric', '')]
+ETHPM_ROWS = [(K1, '101', 'down', 'inherit', 'auto'), (K1, '101', 'up', '10G', 'full'),
+              (K2, '101', 'down', 'inherit', 'auto'), (SPINE, '201', 'up', '100G', 'full')]
+
+COLUMNAR = [False, pytest.param(True, marks=pytest.mark.skipif(not table.HAVE_NUMPY, reason='needs NumPy'))]
+
+
+@pytest.mark.parametrize('columnar', COLUMNAR)
+def test_build(columnar):
+    idict = table.build(SELECTOR_ROWS, L1_ROWS, ETHPM_ROWS, ['101'], columnar=columnar)
+    assert sorted(idict) == [K1, K2, K3]
+    assert SPINE not in idict
+
+    # Later rows replace earlier ones, l1PhysIf keeps the selector policy and ethpmPhysIf sets the state
+    row = idict[K1]
+    assert (row['policy_group'], row['port_sr_name'], row['descr']) == ('ACCESS', 'SEL_1', 'server 1')
+    assert (row['operSt'], row['operSpeed'], row['operDuplex']) == ('up', '10G', 'full')
+
+    # An interface without a selector and a selector without an interface
+    assert (idict[K2]['policy_group'], idict[K2]['usage'], idict[K2]['operSt']) == ('', 'discovery', 'down')
+    assert (idict[K3]['policy_group'], idict[K3]['portT'], idict[K3]['operSt']) == ('VPC_1', '-', '-')
+
+
+@pytest.mark.parametrize('columnar', COLUMNAR)
+def test_select(columnar):
+    idict = table.build(SELECTOR_ROWS, L1_ROWS, ETHPM_ROWS, ['101'], columnar=columnar)
+    assert table.select(idict, 'VPC_1', '101-102'.__contains__) == [K3]
+    assert table.select(idict, 'VPC_1', '102'.__eq__) == []
+    assert table.select(idict, 'MISSING', '101'.__eq__) == []
+
+
+@pytest.mark.skipif(not table.HAVE_NUMPY, reason='needs NumPy')
+def test_columnar_matches_dict():
+    rows = table.build(SELECTOR_ROWS, L1_ROWS, ETHPM_ROWS, ['101'], columnar=True)
+    plain = table.build(SELECTOR_ROWS, L1_ROWS, ETHPM_ROWS, ['101'], columnar=False)
+    for key in plain:
+        for name in table.INTERFACE_COLUMNS:
+            if name in plain[key]:
+                assert rows[key][name] == plain[key][name], (key, name)
+    mask = rows.equals('operSt', 'down') & ~rows.equals('policy_group', '')
+    assert rows.keys_where(mask) == []
+    assert rows.keys_where(rows.equals('operSt', 'down')) == [K2]